@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The slides import the library as `lc`, run from the slides directory
+# (see run.sh); benchmarks resolve it the same way.
+SLIDES = Path(__file__).resolve().parent.parent / "slides"
+if str(SLIDES) not in sys.path:
+    sys.path.insert(0, str(SLIDES))
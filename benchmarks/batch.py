@@ -0,0 +1,37 @@
+import argparse
+import os
+import time
+from . import SLIDES  # noqa: F401
+from lc.batch import evaluate_many
+from lc.debruijn import IDX, LAM, APP, FREE, church, to_debruijn
+from .suite import FACT, _lc
+
+def throughput(count: int, n: int, workers: int, method: str, chunksize: int) -> float:
+    """Terms normalized per second: FACT(0) to FACT(n), cycled.
+
+    Each term drops a distinct free name, K(FACT(i))(t_i), so that the
+    workers' memo of normal forms does not answer for them."""
+    fact = to_debruijn(_lc(FACT))
+    k = (LAM, (LAM, (IDX, 1)))
+    terms = ((APP, (APP, k, (APP, fact, church(i % (n + 1)))), (FREE, f"t{i}")) for i in range(count))
+    start = time.perf_counter()
+    for result in evaluate_many(terms, workers, method, chunksize=chunksize):
+        if result.term is None:
+            raise AssertionError(f"term {result.index} stopped: {result.error}")
+    return count / (time.perf_counter() - start)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of evaluate_many by number of workers.")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("-n", type=int, default=5, help="largest FACT argument")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({0, 1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--method", default="arith")
+    parser.add_argument("--chunksize", type=int, default=32)
+    args = parser.parse_args(argv)
+    print(f"{'workers':>8} {'terms/s':>12}")
+    for workers in args.workers:
+        rate = throughput(args.count, args.n, workers, args.method, args.chunksize)
+        print(f"{workers:>8} {rate:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import time
+from . import SLIDES  # noqa: F401
+from lc.lc import Term
+from lc.cache import BACKENDS, runtime
+from .memory import wide_term
+
+def compile_time(leaves: int, backend: str, binders: int = 8, repeat: int = 3) -> tuple[int, float | str]:
+    """Best time to compile a generated term and evaluate it to a function.
+
+    A backend that goes through Python's compiler can fail on nesting it
+    does not support; the error is returned instead of a time."""
+    body, nodes = wide_term(leaves, binders, "slots")
+    best = float("inf")
+    for _ in range(repeat):
+        term = Term(body=body)
+        start = time.perf_counter()
+        try:
+            eval(BACKENDS[backend](term), dict(runtime(backend)))
+        except (RecursionError, SyntaxError, MemoryError) as e:
+            return nodes, type(e).__name__
+        best = min(best, time.perf_counter() - start)
+    return nodes, best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile time of generated terms, by backend.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    print(f"{'leaves':>10} {'nodes':>10} " + " ".join(f"{backend + ' (s)':>14}" for backend in BACKENDS))
+    for leaves in args.sizes:
+        row = []
+        for backend in BACKENDS:
+            nodes, seconds = compile_time(leaves, backend, repeat=args.repeat)
+            row.append(seconds)
+        print(f"{leaves:>10} {nodes:>10} " + " ".join(f"{s:>14.4f}" if isinstance(s, float) else f"{s:>14}" for s in row))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import time
+from . import SLIDES  # noqa: F401
+from lc.arith import numeral
+from lc.debruijn import to_debruijn
+from lc.machine import STRATEGIES, Machine
+from lc.reduce import Reducer
+from .suite import cases
+
+def normalize_time(node, strategy: str, repeat: int) -> tuple[float, int, int]:
+    """Best time to the normal form on the machine, its steps and value."""
+    best = float("inf")
+    for _ in range(repeat):
+        machine = Machine(strategy)
+        start = time.perf_counter()
+        result = machine.normalize(node)
+        best = min(best, time.perf_counter() - start)
+    return best, machine.steps, numeral(result)  # type: ignore
+
+def reducer_time(node, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Reducer("normal").run(node)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="The Krivine and CEK machines against the normal order reducer.")
+    parser.add_argument("--quick", action="store_true", help="only the two smallest sizes of each case")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reducer", action="store_true", help="also time Reducer, minutes on SUB[n=50]")
+    args = parser.parse_args(argv)
+    reducer = f"{'reducer (ms)':>13} " if args.reducer else ""
+    print(f"{'case':<16} {reducer}" + " ".join(f"{s + ' (ms)':>12} {'steps':>9} {'Msteps/s':>9}" for s in STRATEGIES))
+    for case in cases(args.quick):
+        if case.source is None:
+            continue
+        node = to_debruijn(case.term)
+        row = [f"{reducer_time(node, args.repeat) * 1e3:>13.3f}"] if args.reducer else []
+        for strategy in STRATEGIES:
+            seconds, steps, value = normalize_time(node, strategy, args.repeat)
+            assert value == case.expected, f"{case.name} by {strategy} gave {value}"
+            row.append(f"{seconds * 1e3:>12.3f} {steps:>9} {steps / seconds / 1e6:>9.2f}")
+        print(f"{case.name:<16} " + " ".join(row))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import ast
+import argparse
+import gc
+import tracemalloc
+from . import SLIDES  # noqa: F401
+from lc.lc import Var, Lam, App
+
+# The term nodes as they were before the `__slots__` layout: `ast.expr`
+# subclasses, with the locations `fix_missing_locations` gives them.
+class AstVar(ast.expr):
+    def __init__(self, id: int):
+        self.id = id
+        self.name = f"x{id}"
+
+class AstLam(ast.expr):
+    _fields = ("var", "body")
+    def __init__(self, var, body):
+        self.var = var
+        self.body = body
+
+class AstApp(ast.expr):
+    _fields = ("func", "arg")
+    def __init__(self, func, arg):
+        self.func = func
+        self.arg = arg
+
+def located(node):
+    node.lineno = node.end_lineno = 1
+    node.col_offset = node.end_col_offset = 0
+    return node
+
+LAYOUTS = {
+    "ast.expr": (lambda id: located(AstVar(id)),
+                 lambda var, body: located(AstLam(var, body)),
+                 lambda func, arg: located(AstApp(func, arg))),
+    "slots": (Var, Lam, App),
+}
+
+def wide_term(leaves: int, binders: int, layout: str):
+    """λx0...λxk. a balanced tree of applications over `leaves` variables.
+
+    Returns the term and the number of nodes allocated for it."""
+    var, lam, app = LAYOUTS[layout]
+    params = [var(i) for i in range(binders)]
+    level = [params[i % binders] for i in range(leaves)]
+    nodes = binders
+    while len(level) > 1:
+        paired = [app(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        nodes += len(paired)
+        level = paired
+    body = level[0]
+    for param in reversed(params):
+        body = lam(param, body)
+    return body, nodes + binders
+
+def bytes_per_node(leaves: int, binders: int, layout: str) -> tuple[int, float]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        term, nodes = wide_term(leaves, binders, layout)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del term
+    return nodes, (after - before) / nodes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bytes per term node, by node layout.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--binders", type=int, default=8)
+    args = parser.parse_args(argv)
+    print(f"{'leaves':>10} {'nodes':>10} " + " ".join(f"{layout:>10}" for layout in LAYOUTS))
+    for leaves in args.sizes:
+        row = []
+        for layout in LAYOUTS:
+            nodes, per_node = bytes_per_node(leaves, args.binders, layout)
+            row.append(per_node)
+        print(f"{leaves:>10} {nodes:>10} " + " ".join(f"{b:>10.1f}" for b in row))
+
+if __name__ == "__main__":
+    main()
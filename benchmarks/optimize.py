@@ -0,0 +1,43 @@
+import argparse
+import sys
+from . import SLIDES  # noqa: F401
+from lc.cache import compile_ast
+from lc.optimize import PassReport, optimize
+from .suite import Case, best, cases, inc
+
+def calls(case: Case, code) -> int:
+    """Python calls made by evaluating a compiled case, `inc` included."""
+    count = 0
+    def profile(frame, event, arg):
+        nonlocal count
+        count += event == "call"
+    sys.setprofile(profile)
+    try:
+        case.run(eval(code, {"inc": inc}))
+    finally:
+        sys.setprofile(None)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calls and execution time of the slide programs before and after lc.optimize.")
+    parser.add_argument("--quick", action="store_true", help="only the two smallest sizes of each case")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--passes", action="store_true", help="also print the report of every pass")
+    args = parser.parse_args(argv)
+    print(f"{'case':<16} {'size':>11} {'calls':>15} {'execute (ms)':>17}")
+    for case in cases(args.quick):
+        if case.source is None:
+            continue
+        report: list[PassReport] = []
+        optimized = optimize(case.term, report=report)
+        before, after = compile_ast(case.term), compile_ast(optimized)
+        assert case.run(eval(after, {"inc": inc})) == case.expected
+        times = [best(lambda code=code: case.run(eval(code, {"inc": inc})), args.repeat) * 1e3 for code in (before, after)]
+        print(f"{case.name:<16} {report[0].before:>5}/{report[-1].after:<5} "
+              f"{calls(case, before):>7}/{calls(case, after):<7} {times[0]:>8.3f}/{times[1]:<8.3f}")
+        if args.passes:
+            for r in report:
+                print(f"  round {r.round} {r.name:<9} {r.before:>5} -> {r.after:<5} {r.seconds * 1e3:.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import time
+from . import SLIDES  # noqa: F401
+from lc.scope import Scope, FlatScope
+
+SCOPES = {
+    "Scope": Scope,
+    "FlatScope": FlatScope,
+}
+
+def convert_time(depth: int, kind: str, repeat: int = 3) -> float:
+    """Best time for the scope work of converting a `depth`-deep curried lambda.
+
+    The body of binder i uses x0, the outermost variable, the way
+    `CreateLambdaTerm.visit_Name` does: a membership test, a lookup and
+    a store; then a free name, which misses every level. Nesting this
+    deep does not parse, so the calls are replayed."""
+    best = float("inf")
+    for _ in range(repeat):
+        scope = SCOPES[kind]()
+        start = time.perf_counter()
+        for i in range(depth):
+            scope.enter()
+            scope[f"x{i}"] = i
+            if "x0" in scope:
+                scope["x0"] = scope["x0"]
+            if "inc" in scope:
+                raise AssertionError("inc is free")
+        for _ in range(depth):
+            scope.exit()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scope operations on deep synthetic lambdas.")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    print(f"{'depth':>10} " + " ".join(f"{kind + ' (s)':>14}" for kind in SCOPES))
+    for depth in args.depths:
+        row = [convert_time(depth, kind, args.repeat) for kind in SCOPES]
+        print(f"{depth:>10} " + " ".join(f"{s:>14.4f}" for s in row))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+from . import SLIDES  # noqa: F401
+from lc.lc import Term, unparse, lc_to_ast, _lc
+from lc.cache import compile_ast
+from lc.debruijn import APP, LAM, IDX, Node, to_debruijn, from_debruijn, church
+from lc.arith import EXP, PRED_PAIR, SUB
+from .memory import wide_term
+
+STAGES = ("lc", "unparse", "lc_to_ast", "compile", "execute")
+
+# Strict Python evaluates both branches of a Church boolean, so the
+# branches are delayed behind a dummy binder and forced with I.
+FACT = lambda: (lambda Z, IS_ZERO, ONE, MUL, PRED: Z(
+    lambda f: lambda n: IS_ZERO(n)(lambda _: ONE)(lambda _: MUL(n)(f(PRED(n))))(lambda i: i)
+))(
+    lambda f: (lambda x: f(lambda v: x(x)(v)))(lambda x: f(lambda v: x(x)(v))),
+    lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+    lambda f: lambda x: f(x),
+    lambda a: lambda b: lambda f: b(a(f)),
+    lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+)
+
+def inc(n):
+    return n + 1
+
+class Case(NamedTuple):
+    name: str
+    source: Callable | None  # what `lc` converts, None for generated terms
+    term: Term
+    run: Callable  # takes the evaluated term, returns a checkable result
+    expected: object
+
+def apply(f: Callable, *args: Node) -> Term:
+    node = to_debruijn(_lc(f))
+    for arg in args:
+        node = (APP, node, arg)
+    return from_debruijn(node)
+
+def count(value) -> int:
+    return value(inc)(0)
+
+def deep_binders(depth: int) -> Term:
+    """λx0.λx1...λxk.x0"""
+    node: Node = (IDX, depth - 1)
+    for _ in range(depth):
+        node = (LAM, node)
+    return from_debruijn(node)
+
+def cases(quick: bool = False) -> list[Case]:
+    def sizes(*ns):
+        return ns[:2] if quick else ns
+    out = []
+    for n in sizes(3, 5, 7):
+        out.append(Case(f"FACT[n={n}]", FACT, apply(FACT, church(n)), count, [1, 1, 2, 6, 24, 120, 720, 5040][n]))
+    for n in sizes(4, 8, 12):
+        out.append(Case(f"EXP[n={n}]", EXP, apply(EXP, church(2), church(n)), count, 2 ** n))
+    for n in sizes(10, 100, 500):
+        out.append(Case(f"PRED[n={n}]", PRED_PAIR, apply(PRED_PAIR, church(n)), count, n - 1))
+    for n in sizes(10, 50, 100):
+        out.append(Case(f"SUB[n={n}]", SUB, apply(SUB, church(2 * n), church(n)), count, n))
+    for depth in sizes(100, 500, 900):
+        out.append(Case(f"deep[n={depth}]", None, deep_binders(depth), lambda f, depth=depth: _call(f, depth, 0), 0))
+    for leaves in sizes(1_000, 10_000, 100_000):
+        body, _ = wide_term(leaves, 8, "slots")
+        out.append(Case(f"wide[n={leaves}]", None, Term(body=body), lambda f: _call(f, 8, _identity)(0), 0))
+    return out
+
+def _identity(v):
+    return v
+
+def _call(f, arity: int, first):
+    # the generated terms only apply their variables to each other
+    f = f(first)
+    for _ in range(arity - 1):
+        f = f(_identity)
+    return f
+
+def best(fn: Callable, repeat: int, min_time: float = 0.01) -> float:
+    """Best time of one call of `fn`, looped until a run takes `min_time`."""
+    timer = timeit.Timer(fn)
+    once = timer.timeit(1)
+    number = max(1, int(min_time / once)) if once else 1000
+    return min(timer.repeat(repeat, number)) / number
+
+def measure(case: Case, repeat: int = 3) -> dict[str, float | str]:
+    """Time every stage of a case; a stage that fails records its error."""
+    results: dict[str, float | str] = {}
+    stages: dict[str, Callable] = {
+        "unparse": lambda: unparse(case.term),
+        "lc_to_ast": lambda: lc_to_ast(case.term),
+        "compile": lambda: compile_ast(case.term),
+    }
+    if case.source is not None:
+        stages = {"lc": lambda: _lc(case.source), **stages}
+    for stage, fn in stages.items():
+        try:
+            results[stage] = best(fn, repeat)
+        except (RecursionError, MemoryError, SyntaxError) as e:
+            results[stage] = f"{type(e).__name__}: {e}"
+    try:
+        code = compile_ast(case.term)
+        value = case.run(eval(code, {"inc": inc}))
+        if value != case.expected:
+            raise AssertionError(f"{case.name} gave {value!r}, expected {case.expected!r}")
+        results["execute"] = best(lambda: case.run(eval(code, {"inc": inc})), repeat)
+    except (RecursionError, MemoryError, SyntaxError) as e:
+        results["execute"] = f"{type(e).__name__}: {e}"
+    return results
+
+def run(quick: bool = False, repeat: int = 3, only: str = "", log=sys.stderr) -> dict:
+    results = {}
+    for case in cases(quick):
+        if only and only not in case.name:
+            continue
+        start = time.perf_counter()
+        results[case.name] = measure(case, repeat)
+        print(f"{case.name}: {time.perf_counter() - start:.1f} s", file=log)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[tuple[str, str, float, float, float]]:
+    """(case, stage, baseline, current, ratio) of every stage slower than `threshold` times the baseline."""
+    regressions = []
+    for name, stages in results["results"].items():
+        old_stages = baseline["results"].get(name, {})
+        for stage, seconds in stages.items():
+            old = old_stages.get(stage)
+            if not isinstance(seconds, float) or not isinstance(old, float):
+                continue
+            ratio = seconds / old
+            if ratio > threshold:
+                regressions.append((name, stage, old, seconds, ratio))
+    return regressions
+
+def table(results: dict, baseline: dict | None = None) -> str:
+    lines = [f"{'case':<16} " + " ".join(f"{stage:>14}" for stage in STAGES)]
+    for name, stages in results["results"].items():
+        old_stages = baseline["results"].get(name, {}) if baseline else {}
+        cells = []
+        for stage in STAGES:
+            seconds = stages.get(stage)
+            old = old_stages.get(stage)
+            if seconds is None:
+                cell = "-"
+            elif isinstance(seconds, str):
+                cell = seconds.split(":")[0]
+            elif isinstance(old, float):
+                cell = f"{seconds * 1e3:.3f}ms x{seconds / old:.2f}"
+            else:
+                cell = f"{seconds * 1e3:.3f}ms"
+            cells.append(f"{cell:>14}")
+        lines.append(f"{name:<16} " + " ".join(cells))
+    return "\n".join(lines)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time lc, unparse, lc_to_ast, compile and execution of the slide programs and of generated terms.",
+        epilog="The other benchmarks run on their own: python -m benchmarks.memory, .compile, .scope, .trampoline, .batch, .optimize, .machine",
+    )
+    parser.add_argument("--quick", action="store_true", help="only the two smallest sizes of each case")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default="", help="only the cases whose name contains this")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+    results = run(args.quick, args.repeat, args.only)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print(table(results, baseline))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, stage, old, new, ratio in regressions:
+            print(f"regression: {name} {stage} {old * 1e3:.3f}ms -> {new * 1e3:.3f}ms (x{ratio:.2f})")
+        if regressions:
+            return 1
+    return 0
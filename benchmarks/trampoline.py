@@ -0,0 +1,53 @@
+import argparse
+from typing import Callable
+from . import SLIDES  # noqa: F401
+from lc.cache import runtime
+from lc.debruijn import APP, church, to_debruijn, from_debruijn
+from .suite import Case, _lc, best, cases, count, inc
+
+BACKENDS = ("ast", "trampoline")
+
+# n(TWO)(SUCC)(ZERO): 2^n successors built at run time, so counting them
+# nests 2^n calls however small the compiled code is
+SUCCESSORS = lambda: (lambda SUCC, ZERO, TWO: lambda n: n(TWO)(SUCC)(ZERO))(
+    lambda n: lambda f: lambda x: f(n(f)(x)),
+    lambda f: lambda x: x,
+    lambda f: lambda x: f(f(x)),
+)
+
+def successors(n: int) -> Case:
+    term = from_debruijn((APP, to_debruijn(_lc(SUCCESSORS)), church(n)))
+    return Case(f"SUCC[2^{n}]", SUCCESSORS, term, count, 2 ** n)
+
+def execute_time(case: Case, backend: str, repeat: int = 3) -> float | str:
+    """Best time to run the compiled case, or the error it stopped on."""
+    try:
+        code = case.term.compile(backend)
+        run: Callable = lambda: case.run(eval(code, {"inc": inc, **runtime(backend)}))
+        value = run()
+    except (RecursionError, MemoryError, SyntaxError) as e:
+        return type(e).__name__
+    if value != case.expected:
+        raise AssertionError(f"{case.name} gave {value!r} with {backend}, expected {case.expected!r}")
+    return best(run, repeat)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run time of the trampoline backend against direct calls.")
+    parser.add_argument("--quick", action="store_true", help="only the two smallest sizes of each case")
+    parser.add_argument("--successors", type=int, nargs="+", default=[8, 10, 14, 17],
+                        help="also count 2^n successors built at run time")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    # the generated wide terms nest too many continuations for Python's compiler
+    workloads = [case for case in cases(args.quick) if not case.name.startswith("wide")]
+    workloads += [successors(n) for n in args.successors]
+    print(f"{'case':<16} " + " ".join(f"{backend + ' (s)':>16}" for backend in BACKENDS) + f" {'overhead':>10}")
+    for case in workloads:
+        row = [execute_time(case, backend, args.repeat) for backend in BACKENDS]
+        cells = [f"{s:>16.6f}" if isinstance(s, float) else f"{s:>16}" for s in row]
+        direct, trampoline = row
+        ratio = f"x{trampoline / direct:.2f}" if isinstance(direct, float) and isinstance(trampoline, float) else "-"
+        print(f"{case.name:<16} " + " ".join(cells) + f" {ratio:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+from __future__ import annotations
+import ast
+from .lc import Term, lc
+from .debruijn import IDX, LAM, APP, Node, to_debruijn, from_debruijn, church
+from .hashcons import Shared, intern
+from .reduce import Reducer, rebuild
+from .stats import Stats
+from .limits import LimitExceeded
+
+# Closed leaves carrying native values, next to the tags of debruijn:
+#   (NUM, n)      the Church numeral n
+#   (BOOL, b)     TRUE or FALSE
+#   (PRIM, name)  one of the operators of PRIMITIVES
+NUM, BOOL, PRIM = 4, 5, 6
+
+TRUE: Node = (LAM, (LAM, (IDX, 1)))
+FALSE: Node = (LAM, (LAM, (IDX, 0)))
+
+# The usual definitions, and the ones of the slides with their helpers
+# inlined; each is recognized by its normal form.
+SUCC = lambda n: lambda f: lambda x: f(n(f)(x))
+SUCC_OUTER = lambda n: lambda f: lambda x: n(f)(f(x))
+ADD = lambda a: lambda b: lambda f: lambda x: a(f)(b(f)(x))
+ADD_SUCC = lambda: (lambda SUCC: lambda a: lambda b: a(SUCC)(b))(
+    lambda n: lambda f: lambda x: f(n(f)(x)),
+)
+MUL = lambda a: lambda b: lambda f: b(a(f))
+MUL_FLIP = lambda a: lambda b: lambda f: a(b(f))
+EXP = lambda a: lambda b: b(a)
+PRED = lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u)
+PRED_PAIR = lambda: (lambda PAIR, FIRST, SECOND, SUCC, ZERO: (
+    lambda PREV, START: lambda n: SECOND(n(PREV)(START))
+)(lambda p: PAIR(SUCC(FIRST(p)))(FIRST(p)), PAIR(ZERO)(ZERO)))(
+    lambda a: lambda b: lambda f: f(a)(b),
+    lambda p: p(lambda a: lambda b: a),
+    lambda p: p(lambda a: lambda b: b),
+    lambda n: lambda f: lambda x: f(n(f)(x)),
+    lambda f: lambda x: x,
+)
+SUB = lambda: (lambda PRED: lambda a: lambda b: b(PRED)(a))(
+    lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+)
+IS_ZERO = lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a)
+
+SHAPES = {
+    "SUCC": (1, [SUCC, SUCC_OUTER]),
+    "ADD": (2, [ADD, ADD_SUCC]),
+    "MUL": (2, [MUL, MUL_FLIP]),
+    "EXP": (2, [EXP]),
+    "PRED": (1, [PRED, PRED_PAIR]),
+    "SUB": (2, [SUB]),
+    "IS_ZERO": (1, [IS_ZERO]),
+}
+
+def _delta(name: str, values: list[int]) -> Node | None:
+    """The native result of an operator, or None where it would not be the
+    normal form the Church definition reduces to."""
+    if name == "IS_ZERO":
+        return (BOOL, values[0] == 0)
+    if name == "SUCC":
+        n = values[0] + 1
+    elif name == "PRED":
+        n = max(values[0] - 1, 0)
+    elif name == "ADD":
+        n = values[0] + values[1]
+    elif name == "SUB":
+        n = max(values[0] - values[1], 0)
+    elif name == "MUL":
+        n = values[0] * values[1]
+    elif values[1] == 0:
+        # EXP a ZERO reduces to ZERO(a) = λx.x, only eta-equal to ONE
+        return None
+    else:
+        n = values[0] ** values[1]
+    return (NUM, n)
+
+def numeral(node: Node) -> int | None:
+    """n if `node` is literally λf.λx.f(...f(x)), else None."""
+    if node[0] != LAM or node[1][0] != LAM:
+        return None
+    body = node[1][1]
+    n = 0
+    while body[0] == APP and body[1] == (IDX, 1):
+        n += 1
+        body = body[2]
+    return n if body == (IDX, 0) else None
+
+def decode(node: Node) -> int | bool | None:
+    """The native value of a reduced node, or None if it has none."""
+    tag = node[0]
+    if tag == NUM or tag == BOOL:
+        return node[1]
+    if node == TRUE:
+        return True
+    return numeral(node)
+
+class _OutOfFuel(Exception):
+    pass
+
+class _Bounded(Reducer):
+    fuel: int
+    def __init__(self, fuel: int):
+        super().__init__()
+        self.fuel = fuel
+
+    def beta(self, body: Node, arg: Node) -> Node:
+        if self.steps >= self.fuel:
+            raise _OutOfFuel
+        return super().beta(body, arg)
+
+def normal_form(node: Node, fuel: int = 64) -> Node | None:
+    """The normal form of `node` if normal order finds it within `fuel` steps."""
+    try:
+        return _Bounded(fuel).run(node)
+    except _OutOfFuel:
+        return None
+
+ARITY: dict[str, int] = {}
+DEFINITIONS: dict[str, Node] = {}
+PRIMITIVES: dict[Shared, str] = {}
+for _name, (_arity, _shapes) in SHAPES.items():
+    ARITY[_name] = _arity
+    for _shape in _shapes:
+        _node = Reducer().run(to_debruijn(lc(_shape)))
+        DEFINITIONS.setdefault(_name, _node)
+        PRIMITIVES[intern(_node)] = _name
+
+def _known(node: Shared, max_size: int, memo: dict[int, Node]) -> Node | None:
+    name = PRIMITIVES.get(node)
+    if name is not None:
+        return (PRIM, name)
+    tree = node.debruijn(memo)
+    n = numeral(tree)
+    if n is not None:
+        return (NUM, n)
+    if tree == TRUE:
+        return (BOOL, True)
+    if node.size > max_size:
+        return None
+    nf = normal_form(tree)
+    if nf is None:
+        return None
+    name = PRIMITIVES.get(intern(nf))
+    if name is not None:
+        return (PRIM, name)
+    n = numeral(nf)
+    if n is not None:
+        return (NUM, n)
+    return (BOOL, True) if nf == TRUE else None
+
+def recognize(term: ast.AST | Node, max_size: int = 256) -> Node:
+    """De Bruijn form of `term` with its numerals, booleans and operators made native.
+
+    Closed subterms are compared to the known shapes as they are and,
+    up to `max_size` nodes, by their normal form."""
+    root = intern(term)
+    # de Bruijn forms of the subterms, shared by all the calls to _known
+    memo: dict[int, Node] = {}
+    done: dict[int, Node] = {}
+    todo: list[tuple[Shared, bool]] = [(root, False)]
+    while todo:
+        node, ready = todo.pop()
+        if id(node) in done:
+            continue
+        tag = node.tag
+        if not ready and node.free == 0 and (tag == LAM or tag == APP):
+            known = _known(node, max_size, memo)
+            if known is not None:
+                done[id(node)] = known
+                continue
+        if tag != LAM and tag != APP:
+            done[id(node)] = (tag, node.a)
+        elif not ready:
+            todo.append((node, True))
+            if node.b is not None:
+                todo.append((node.b, False))
+            todo.append((node.a, False))  # type: ignore
+        elif tag == LAM:
+            done[id(node)] = (LAM, done[id(node.a)])
+        else:
+            done[id(node)] = (APP, done[id(node.a)], done[id(node.b)])
+    return done[id(root)]
+
+def expand(node: Node) -> Node:
+    """Replace native values by their Church form."""
+    out: list[Node] = []
+    todo: list[tuple[Node, bool]] = [(node, False)]
+    while todo:
+        n, ready = todo.pop()
+        tag = n[0]
+        if tag == NUM:
+            out.append(church(n[1]))
+        elif tag == BOOL:
+            out.append(TRUE if n[1] else FALSE)
+        elif tag == PRIM:
+            out.append(DEFINITIONS[n[1]])
+        elif tag != LAM and tag != APP:
+            out.append(n)
+        elif not ready:
+            todo.append((n, True))
+            todo.extend((child, False) for child in n[:0:-1])
+        elif tag == LAM:
+            body = out.pop()
+            out.append(n if body is n[1] else (LAM, body))
+        else:
+            arg = out.pop()
+            func = out.pop()
+            out.append(n if func is n[1] and arg is n[2] else (APP, func, arg))
+    return out[0]
+
+class ArithReducer(Reducer):
+    """A `Reducer` that computes on recognized numerals and booleans natively.
+
+    Operators reduce their arguments to weak head normal form, and fall
+    back to their Church definition when one of them is not a numeral.
+    They only reduce the arguments normal order would: MUL and EXP look
+    at their exponent first and leave the base alone when it is ZERO, so
+    MUL(Ω)(ZERO) and EXP(Ω)(ZERO) have the normal forms normal order
+    finds. Native values only turn back into Church terms when they are
+    applied."""
+    deltas: int
+    def __init__(self, strategy: str = "normal", stats: Stats | None = None):
+        if strategy == "applicative":
+            raise ValueError("ArithReducer only reduces in normal or head order")
+        super().__init__(strategy, stats)
+        self.deltas = 0
+
+    def delta(self):
+        self.deltas += 1
+        if self.stats is not None:
+            self.stats.deltas += 1
+            self.stats.step("delta")
+
+    def number(self, args: list[Node], i: int) -> int | None:
+        """Reduce args[i] in place and return its value if it is a numeral."""
+        head, rest = self.whnf(args[i])
+        if rest:
+            args[i] = rebuild(head, rest)
+            return None
+        args[i] = head
+        tag = head[0]
+        if tag == NUM:
+            return head[1]
+        if tag == BOOL:
+            return None if head[1] else 0
+        n = numeral(head)
+        if n is not None:
+            args[i] = (NUM, n)
+        return n
+
+    def operands(self, name: str, args: list[Node]) -> list[int] | None:
+        """The values of the arguments of operator `name`, at the end of
+        `args`, or None when one that is needed is not a numeral."""
+        first = len(args) - 1
+        if name == "MUL" or name == "EXP":
+            # b(a(f)) and b(a): with b = ZERO, a is never used
+            b = self.number(args, first - 1)
+            if b is None:
+                return None
+            if b == 0:
+                return [0, 0] if name == "MUL" else None
+            a = self.number(args, first)
+            return None if a is None else [a, b]
+        values = []
+        for i in range(first, first - ARITY[name], -1):
+            value = self.number(args, i)
+            if value is None:
+                return None
+            values.append(value)
+        return values
+
+    def whnf(self, node: Node) -> tuple[Node, list[Node]]:
+        args = []
+        try:
+            while True:
+                tag = node[0]
+                if tag == APP:
+                    args.append(node[2])
+                    node = node[1]
+                elif tag == LAM and args:
+                    node = self.beta(node[1], args[-1])
+                    args.pop()
+                elif tag == PRIM and args:
+                    name = node[1]
+                    arity = ARITY[name]
+                    values = self.operands(name, args) if len(args) >= arity else None
+                    result = _delta(name, values) if values is not None else None
+                    if result is not None:
+                        self.delta()
+                        del args[len(args) - arity:]
+                        node = result
+                    else:
+                        node = DEFINITIONS[name]
+                elif tag == NUM and args:
+                    node = self.iterate(node[1], args)
+                elif tag == BOOL and args:
+                    node = TRUE if node[1] else FALSE
+                else:
+                    break
+        except LimitExceeded as e:
+            e.partial = rebuild(node, args[::-1])
+            raise
+        args.reverse()
+        return node, args
+
+    def iterate(self, n: int, args: list[Node]) -> Node:
+        """n(f)(x) without unfolding n when f is SUCC or PRED and x a numeral.
+
+        ZERO never uses f, it is not reduced then."""
+        if n and len(args) >= 2:
+            f, rest = self.whnf(args[-1])
+            if not rest and f[0] == PRIM and f[1] in ("SUCC", "PRED"):
+                m = self.number(args, -2)
+                if m is not None:
+                    self.delta()
+                    del args[-2:]
+                    return (NUM, m + n if f[1] == "SUCC" else max(m - n, 0))
+        return church(n)
+
+def evaluate(term: ast.AST | Node, strategy: str = "normal", stats: Stats | None = None) -> Node:
+    """Reduce a term with native arithmetic, leaving native values in the result."""
+    return ArithReducer(strategy, stats).run(recognize(term))
+
+def normalize(term: ast.AST | Node, strategy: str = "normal", stats: Stats | None = None) -> Term:
+    """Like `reduce.normalize`, with native arithmetic on the way."""
+    return from_debruijn(expand(evaluate(term, strategy, stats)))
+
+def value(term: ast.AST | Node, stats: Stats | None = None) -> int | bool | None:
+    """The number or boolean a term reduces to, or None."""
+    return decode(evaluate(term, stats=stats))
+
+if __name__ == "__main__":
+    import time
+    ONE = lambda f: lambda x: f(x)
+    THREE = lambda f: lambda x: f(f(f(x)))
+    FOUR = lambda f: lambda x: f(f(f(f(x))))
+    FIVE = lambda f: lambda x: f(f(f(f(f(x)))))
+    FACT = lambda: (lambda Y, IS_ZERO, ONE, MUL, PRED: Y(lambda f: lambda n: IS_ZERO(n)(ONE)(MUL(n)(f(PRED(n))))))(
+        lambda f: (lambda x: f(x(x)))(lambda x: f(x(x))),
+        lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )
+    node = recognize(lc(FIVE))
+    assert node == (NUM, 5) and expand(node) == church(5)
+    assert recognize(lc(PRED_PAIR)) == (PRIM, "PRED")
+    fact = lc(FACT)
+    program = (APP, to_debruijn(fact), to_debruijn(lc(FIVE)))
+    start = time.perf_counter()
+    reducer = ArithReducer()
+    node = reducer.run(recognize(program))
+    native = time.perf_counter() - start
+    print(f"FACT(FIVE) = {node} in {reducer.steps} steps and {reducer.deltas} deltas, {native:.4f} s")
+    assert node == (NUM, 120) and decode(node) == 120
+    start = time.perf_counter()
+    church_reducer = Reducer()
+    assert church_reducer.run(program) == church(120)
+    print(f"Church FACT(FIVE): {church_reducer.steps} steps, {time.perf_counter() - start:.4f} s")
+    assert reducer.steps < church_reducer.steps
+    stats = Stats()
+    assert value((APP, to_debruijn(fact), church(20)), stats) == 2432902008176640000
+    print(stats)
+    assert stats.deltas > stats.betas
+    def apply(f, *args):
+        node = to_debruijn(lc(f))
+        for arg in args:
+            node = (APP, node, arg if isinstance(arg, tuple) else to_debruijn(lc(arg)))
+        return node
+    sub_exp = apply(SUB, apply(EXP, THREE, FOUR), apply(ADD_SUCC, ONE, FIVE))
+    assert value(sub_exp) == 75
+    assert value(apply(IS_ZERO, apply(PRED_PAIR, ONE))) is True
+    # THREE(SUCC)(FOUR) is added without unfolding THREE
+    reducer = ArithReducer()
+    assert reducer.run(recognize(apply(THREE, SUCC, FOUR))) == (NUM, 7) and reducer.steps == 0
+    # falls back to the Church definition on something that is not a numeral
+    MUL_F = lambda f: (lambda a: lambda b: lambda g: b(a(g)))(f)(lambda g: lambda x: g(x))
+    assert recognize(lc(MUL_F)) == (LAM, (APP, (APP, (PRIM, "MUL"), (IDX, 0)), (NUM, 1)))
+    assert to_debruijn(normalize(lc(MUL_F))) == (LAM, (LAM, (LAM, (APP, (APP, (IDX, 2), (IDX, 1)), (IDX, 0)))))
+    assert to_debruijn(normalize(sub_exp)) == church(75)
+    # the base is not reduced when the exponent is ZERO, as in normal order
+    OMEGA = (APP, (LAM, (APP, (IDX, 0), (IDX, 0))), (LAM, (APP, (IDX, 0), (IDX, 0))))
+    ZERO_NODE = church(0)
+    mul_omega = (APP, (APP, to_debruijn(lc(MUL)), OMEGA), ZERO_NODE)
+    exp_omega = (APP, (APP, to_debruijn(lc(EXP)), OMEGA), ZERO_NODE)
+    assert to_debruijn(normalize(mul_omega)) == Reducer().run(mul_omega) == church(0)
+    assert to_debruijn(normalize(exp_omega)) == Reducer().run(exp_omega) == (LAM, (IDX, 0))
+    assert to_debruijn(normalize((APP, (APP, ZERO_NODE, OMEGA), church(2)))) == church(2)
+    # every closed subterm of I(I(...(I))) is looked at, each converted once
+    I = (LAM, (IDX, 0))
+    deep = I
+    for _ in range(20_000):
+        deep = (APP, I, deep)
+    start = time.perf_counter()
+    assert intern(recognize(deep)) is intern(deep)
+    print(f"recognize, 20000 deep: {time.perf_counter() - start:.3f} s")
+    # a ** 0 is not ONE but its eta-expansion, as plain reduction finds
+    ZERO = lambda f: lambda x: x
+    exp_zero = apply(EXP, THREE, ZERO)
+    assert to_debruijn(normalize(exp_zero)) == Reducer().run(exp_zero) == (LAM, (IDX, 0))
+    print("All tests passed.")
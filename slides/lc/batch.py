@@ -0,0 +1,216 @@
+from __future__ import annotations
+import ast
+import os
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from typing import Iterable, Iterator, NamedTuple
+from .lc import Term
+from .debruijn import IDX, LAM, APP, Node, to_debruijn, from_debruijn
+from .hashcons import Shared, intern
+from .stats import Stats
+from .limits import METHODS, LimitExceeded, normalize
+
+# Terms cross process boundaries packed: a flat tuple of entries in
+# post-order, (IDX, i), (FREE, name), (LAM, body) or (APP, func, arg),
+# where body, func and arg are positions of earlier entries. Equal
+# subterms are packed once, and unlike nested tuples, pickling it does
+# not recurse as deep as the term.
+type Packed = tuple[tuple, ...]
+
+def pack(node: Node) -> Packed:
+    entries: list[tuple] = []
+    positions: dict[tuple, int] = {}
+    done: dict[int, int] = {}
+    todo: list[tuple[Node, bool]] = [(node, False)]
+    while todo:
+        n, ready = todo.pop()
+        if id(n) in done:
+            continue
+        tag = n[0]
+        if tag == LAM and not ready:
+            todo.append((n, True))
+            todo.append((n[1], False))
+            continue
+        if tag == APP and not ready:
+            todo.append((n, True))
+            todo.append((n[2], False))
+            todo.append((n[1], False))
+            continue
+        if tag == LAM:
+            entry = (LAM, done[id(n[1])])
+        elif tag == APP:
+            entry = (APP, done[id(n[1])], done[id(n[2])])
+        else:
+            entry = n
+        position = positions.get(entry)
+        if position is None:
+            position = positions[entry] = len(entries)
+            entries.append(entry)
+        done[id(n)] = position
+    return tuple(entries)
+
+def unpack(packed: Packed) -> Node:
+    nodes: list[Node] = []
+    for entry in packed:
+        tag = entry[0]
+        if tag == LAM:
+            nodes.append((LAM, nodes[entry[1]]))
+        elif tag == APP:
+            nodes.append((APP, nodes[entry[1]], nodes[entry[2]]))
+        else:
+            nodes.append(entry)
+    return nodes[-1]
+
+class Result(NamedTuple):
+    index: int  # position of the term in the input
+    term: Term | None  # the normal form, None when a limit or an error stopped it
+    error: dict | None  # LimitExceeded.diagnostics(), or see _failure
+    stats: dict[str, int]  # all zero when cached
+    cached: bool = False  # the normal form of an equal term, already computed
+
+def _failure(e: Exception) -> dict:
+    """What went wrong with a term, for Result.error."""
+    if isinstance(e, LimitExceeded):
+        return e.diagnostics()
+    return {"limit": None, "exception": type(e).__name__, "message": str(e)}
+
+# Per-process state, set up by _init: the evaluation settings and the
+# normal forms already computed, keyed by shared node so that
+# alpha-equivalent terms hit the same entry.
+_worker: dict = {}
+MEMO_SIZE = 4096
+
+def _init(method: str, fuel: int | None, timeout: float | None, max_nodes: int | None, warm: tuple[Packed, ...]):
+    _worker.update(method=method, fuel=fuel, timeout=timeout, max_nodes=max_nodes, memo=OrderedDict())
+    for packed in warm:
+        _evaluate_one(packed)
+
+def _evaluate_one(packed: Packed) -> tuple[Packed | None, dict | None, dict[str, int], bool]:
+    """Normal form, error, stats and whether it was cached. Any exception
+    is an error of this term only."""
+    memo: OrderedDict[Shared, Packed] = _worker["memo"]
+    stats = Stats()
+    try:
+        node = unpack(packed)
+        key = intern(node)
+        hit = memo.get(key)
+        if hit is not None:
+            memo.move_to_end(key)
+            return hit, None, stats.to_dict(), True
+        term = normalize(node, _worker["method"], _worker["fuel"], _worker["timeout"], _worker["max_nodes"], stats)
+        result = pack(to_debruijn(term))
+    except Exception as e:
+        # a deadline depends on the machine, so failures are not memoized
+        return None, _failure(e), stats.to_dict(), False
+    memo[key] = result
+    if len(memo) > MEMO_SIZE:
+        memo.popitem(last=False)
+    return result, None, stats.to_dict(), False
+
+def _evaluate(chunk: list[tuple[int, Packed | None, dict | None]]) -> list[tuple]:
+    return [(index, *_evaluate_one(packed)) if error is None else (index, None, error, Stats().to_dict(), False)
+            for index, packed, error in chunk]
+
+def _chunks(terms: Iterable[ast.AST | Node], size: int) -> Iterator[list[tuple[int, Packed | None, dict | None]]]:
+    chunk = []
+    for index, term in enumerate(terms):
+        try:
+            chunk.append((index, pack(term if isinstance(term, tuple) else to_debruijn(term)), None))
+        except Exception as e:
+            # not a term: reported with the results, in order with the others
+            chunk.append((index, None, _failure(e)))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _results(chunk: list) -> Iterator[Result]:
+    for index, packed, error, stats, cached in chunk:
+        term = from_debruijn(unpack(packed)) if packed is not None else None
+        yield Result(index, term, error, stats, cached)
+
+def evaluate_many(terms: Iterable[ast.AST | Node], workers: int | None = None, method: str = "normal",
+                  fuel: int | None = None, timeout: float | None = None, max_nodes: int | None = None,
+                  chunksize: int = 8, warm: Iterable[ast.AST | Node] = ()) -> Iterator[Result]:
+    """Normalize many terms on a process pool, yielding results as they finish.
+
+    Each term gets its own fuel, timeout and max_nodes, see
+    limits.normalize; one that exceeds them, or that raises, comes back
+    with `error` set instead of a term, and the others go on. Results arrive out of order, `index` tells which
+    term they belong to. `terms` is read lazily, a few chunks ahead of the
+    workers, so it can be a generator. Every worker first normalizes the
+    `warm` terms, typically shared definitions, and remembers normal forms
+    across chunks: a term found there is `cached`, with zero stats.
+    `workers=0` evaluates in this process."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    warmed = tuple(pack(t if isinstance(t, tuple) else to_debruijn(t)) for t in warm)
+    initargs = (method, fuel, timeout, max_nodes, warmed)
+    chunks = _chunks(terms, chunksize)
+    if workers == 0:
+        _init(*initargs)
+        for chunk in chunks:
+            yield from _results(_evaluate(chunk))
+        return
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers, initializer=_init, initargs=initargs)
+    try:
+        pending: set[Future] = set()
+        for chunk in chunks:
+            pending.add(pool.submit(_evaluate, chunk))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from _results(future.result())
+        for future in as_completed(pending):
+            yield from _results(future.result())
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    import time
+    from .lc import lc
+    from .debruijn import church
+    from .arith import numeral
+    # the pool pickles the functions of lc.batch, not of __main__
+    from .batch import evaluate_many  # type: ignore
+    node = (APP, (LAM, (APP, (IDX, 0), (IDX, 0))), (LAM, (IDX, 0)))
+    packed = pack((APP, node, node))
+    assert unpack(packed) == (APP, node, node) and len(packed) == 6
+    FACT = lambda: (lambda Y, IS_ZERO, ONE, MUL, PRED: Y(
+        lambda f: lambda n: IS_ZERO(n)(ONE)(MUL(n)(f(PRED(n))))
+    ))(
+        lambda f: (lambda x: f(x(x)))(lambda x: f(x(x))),
+        lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )
+    fact = to_debruijn(lc(FACT))
+    OMEGA = lambda: (lambda x: x(x))(lambda x: x(x))
+    APPLY_ONE = lambda f: f(1)
+    UNBOUND = (APP, (LAM, (IDX, 3)), (LAM, (IDX, 0)))  # an index past its binders
+    def terms():
+        for n in range(6):
+            yield (APP, fact, church(n))
+        yield to_debruijn(lc(OMEGA))
+        yield lc(APPLY_ONE)  # a host expression: TypeError
+        yield UNBOUND  # IndexError in the worker
+        yield (APP, fact, church(3))
+    for workers in (0, 2):
+        start = time.perf_counter()
+        results = sorted(evaluate_many(terms(), workers, "arith", fuel=2_000, chunksize=2, warm=[fact, (APP, fact, church(3))]))
+        print(f"workers={workers}: {time.perf_counter() - start:.3f} s")
+        assert [numeral(to_debruijn(r.term)) for r in results[:6]] == [1, 1, 2, 6, 24, 120]  # type: ignore
+        omega = results[6]
+        assert omega.term is None and omega.error["limit"] == "fuel"  # type: ignore
+        assert results[5].stats["betas"] > 0
+        assert results[7].error["exception"] == "TypeError"  # type: ignore
+        assert results[8].term is None and results[8].error["exception"] == "IndexError"  # type: ignore
+        # FACT(3) was warmed: every worker has it, with no steps of its own
+        for again in results[3], results[9]:
+            assert numeral(to_debruijn(again.term)) == 6 and again.cached  # type: ignore
+            assert again.stats["betas"] == 0
+        assert not results[5].cached
+    print("All tests passed.")
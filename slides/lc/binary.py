@@ -0,0 +1,288 @@
+from __future__ import annotations
+import array
+import ast
+import io
+import mmap
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterable, Iterator, Sequence
+from .lc import Term
+from .debruijn import IDX, LAM, APP, FREE, Node, to_debruijn, from_debruijn
+
+# A file of terms, version 1:
+#
+#   header   MAGIC, version byte, 3 reserved bytes
+#   entries  the de Bruijn nodes of all terms, children before parents,
+#            every distinct subterm once: a tag byte then varints,
+#              IDX  index
+#              LAM  distance back to the body's entry
+#              APP  distances back to the function's and argument's entries
+#              FREE length, then the name in UTF-8
+#   index    byte offset of every entry, little-endian uint64
+#   roots    entry of every term written, little-endian uint64
+#   footer   offset of the index, number of entries, number of roots, MAGIC
+#
+# Varints are unsigned LEB128. The fixed-width index and footer let a
+# reader open a file without reading the entries, and decode any of them
+# on demand.
+MAGIC = b"\x7fLCT"
+VERSION = 1
+_HEADER = MAGIC + bytes([VERSION, 0, 0, 0])
+_FOOTER = struct.Struct("<QQQ4s")
+
+def _varint(n: int, out: bytearray):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(buf, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+def _uint64s(view: memoryview) -> Sequence[int]:
+    """Little-endian uint64s; a view of them where the host agrees, a
+    byte-swapped copy where it does not."""
+    if sys.byteorder == "little":
+        return view.cast("Q")
+    values = array.array("Q")
+    values.frombytes(view)
+    values.byteswap()
+    return values
+
+def _node(term: ast.AST | Node) -> Node:
+    return term if isinstance(term, tuple) else to_debruijn(term)
+
+class Writer:
+    """Write terms to a binary file; subterms are shared across all of them.
+
+    Use as a context manager, or call `close`, which writes the index;
+    the file itself is left open."""
+    file: BinaryIO
+    offsets: list[int]
+    roots: list[int]
+    entries: dict[tuple, int]
+    position: int
+    closed: bool
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.offsets = []
+        self.roots = []
+        self.entries = {}
+        self.closed = False
+        file.write(_HEADER)
+        self.position = len(_HEADER)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def entry(self, key: tuple) -> int:
+        k = self.entries.get(key)
+        if k is not None:
+            return k
+        k = self.entries[key] = len(self.offsets)
+        data = bytearray((key[0],))
+        if key[0] == IDX:
+            _varint(key[1], data)
+        elif key[0] == FREE:
+            name = key[1].encode()
+            _varint(len(name), data)
+            data += name
+        else:
+            for child in key[1:]:
+                _varint(k - child, data)
+        self.offsets.append(self.position)
+        self.file.write(data)
+        self.position += len(data)
+        return k
+
+    def write(self, term: ast.AST | Node) -> int:
+        """Append a term; returns its number in the file."""
+        done: dict[int, int] = {}
+        root = _node(term)
+        todo: list[tuple[Node, bool]] = [(root, False)]
+        while todo:
+            n, ready = todo.pop()
+            if id(n) in done:
+                continue
+            tag = n[0]
+            if tag == IDX or tag == FREE:
+                done[id(n)] = self.entry(n)
+            elif not ready:
+                todo.append((n, True))
+                todo.extend((child, False) for child in n[:0:-1])
+            elif tag == LAM:
+                done[id(n)] = self.entry((LAM, done[id(n[1])]))
+            else:
+                done[id(n)] = self.entry((APP, done[id(n[1])], done[id(n[2])]))
+        self.roots.append(done[id(root)])
+        return len(self.roots) - 1
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        index = self.position
+        self.file.write(struct.pack(f"<{len(self.offsets)}Q", *self.offsets))
+        self.file.write(struct.pack(f"<{len(self.roots)}Q", *self.roots))
+        self.file.write(_FOOTER.pack(index, len(self.offsets), len(self.roots), MAGIC))
+
+class Reader:
+    """Terms of a binary file, decoded on demand.
+
+    Opening reads the header and footer only; `buf` can be bytes or a
+    memory map, see `open_terms`. Terms materialize when asked for, each entry
+    is decoded when first reached."""
+    buf: bytes | mmap.mmap | memoryview
+    offsets: Sequence[int]
+    roots: Sequence[int]
+    def __init__(self, buf: bytes | mmap.mmap | memoryview):
+        view = memoryview(buf)
+        if len(view) < len(_HEADER) + _FOOTER.size or bytes(view[:4]) != MAGIC:
+            raise ValueError("Not a binary lambda term file")
+        if view[4] != VERSION:
+            raise ValueError(f"Unsupported version {view[4]}, expected {VERSION}")
+        index, entries, roots, magic = _FOOTER.unpack_from(view, len(view) - _FOOTER.size)
+        if magic != MAGIC or index + 8 * (entries + roots) + _FOOTER.size != len(view):
+            raise ValueError("Truncated binary lambda term file")
+        self.buf = buf
+        self.offsets = _uint64s(view[index:index + 8 * entries])
+        self.roots = _uint64s(view[index + 8 * entries:index + 8 * (entries + roots)])
+
+    def __len__(self):
+        return len(self.roots)
+
+    def __getitem__(self, i: int) -> Term:
+        return from_debruijn(self.node(i))
+
+    def __iter__(self) -> Iterator[Term]:
+        return (self[i] for i in range(len(self)))
+
+    def entry(self, k: int) -> tuple:
+        """Entry k as (IDX, i), (FREE, name), (LAM, body) or (APP, func, arg),
+        where body, func and arg are entry numbers."""
+        buf = self.buf
+        pos = self.offsets[k]
+        tag = buf[pos]
+        if tag == IDX:
+            return (IDX, _read_varint(buf, pos + 1)[0])
+        if tag == FREE:
+            length, pos = _read_varint(buf, pos + 1)
+            return (FREE, bytes(buf[pos:pos + length]).decode())
+        if tag == LAM:
+            return (LAM, k - _read_varint(buf, pos + 1)[0])
+        if tag != APP:
+            raise ValueError(f"Unknown tag {tag} in entry {k}")
+        func, pos = _read_varint(buf, pos + 1)
+        return (APP, k - func, k - _read_varint(buf, pos)[0])
+
+    def node(self, i: int) -> Node:
+        """Term i as a de Bruijn tuple, with the sharing of the file."""
+        root = self.roots[i]
+        done: dict[int, Node] = {}
+        todo: list[tuple[int, tuple | None]] = [(root, None)]
+        while todo:
+            k, entry = todo.pop()
+            if k in done:
+                continue
+            if entry is None:
+                entry = self.entry(k)
+                if entry[0] == LAM or entry[0] == APP:
+                    todo.append((k, entry))
+                    todo.extend((child, None) for child in entry[1:])
+                    continue
+                done[k] = entry
+            elif entry[0] == LAM:
+                done[k] = (LAM, done[entry[1]])
+            else:
+                done[k] = (APP, done[entry[1]], done[entry[2]])
+        return done[root]
+
+    def close(self):
+        for values in self.offsets, self.roots:
+            if isinstance(values, memoryview):
+                values.release()
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def dump(terms: Iterable[ast.AST | Node], path: str | os.PathLike):
+    with open(path, "wb") as file, Writer(file) as writer:
+        for term in terms:
+            writer.write(term)
+
+def open_terms(path: str | os.PathLike) -> Reader:
+    """Memory-map a file of terms; nothing is decoded until asked for."""
+    with open(path, "rb") as file:
+        buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return Reader(buf)
+
+def load(path: str | os.PathLike) -> list[Term]:
+    with open_terms(path) as reader:
+        return list(reader)
+
+def dumps(term: ast.AST | Node) -> bytes:
+    stream = io.BytesIO()
+    with Writer(stream) as writer:
+        writer.write(term)
+    return stream.getvalue()
+
+def loads(data: bytes) -> Term:
+    return Reader(data)[0]
+
+if __name__ == "__main__":
+    import tempfile
+    from .lc import lc
+    from .debruijn import church
+    from .arith import numeral
+    TWO = lambda f: lambda x: f(f(x))
+    K_FREE = lambda x: lambda y: x(d)
+    data = dumps(lc(TWO))
+    print(f"TWO: {len(data)} bytes")
+    assert loads(data) == lc(TWO) and str(loads(dumps(lc(K_FREE)))) == str(lc(K_FREE))
+    # a numeral shares the body of the one before it: 2 new entries each
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "terms.lct")
+        dump([church(n) for n in range(100)] + [lc(K_FREE)], path)
+        with open_terms(path) as reader:
+            assert len(reader) == 101 and len(reader.offsets) == 2 + 99 + 200 + 4
+            assert reader.node(42) == church(42)
+            assert str(reader[100]) == str(lc(K_FREE))
+        assert load(path)[7] == from_debruijn(church(7))
+    # deep terms go through without recursion
+    assert numeral(Reader(dumps(church(100_000))).node(0)) == 100_000
+    for bad in (b"", b"\x7fLCT\x02\0\0\0" + bytes(_FOOTER.size), data[:-1]):
+        try:
+            Reader(bad)
+        except ValueError as e:
+            print(f"ValueError: {e}")
+        else:
+            raise AssertionError("expected a ValueError")
+    # an entry whose tag byte is not IDX, LAM, APP or FREE
+    corrupt = bytearray(data)
+    corrupt[len(_HEADER)] = 9
+    try:
+        loads(bytes(corrupt))
+    except ValueError as e:
+        print(f"ValueError: {e}")
+    else:
+        raise AssertionError("expected a ValueError")
+    # the index is little-endian whatever the host
+    index = struct.pack("<3Q", 1, 2**40, 3)
+    assert list(_uint64s(memoryview(index))) == [1, 2**40, 3]
+    print("All tests passed.")
@@ -0,0 +1,230 @@
+from __future__ import annotations
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from types import CodeType
+from typing import NamedTuple
+from .lc import Node, Term, lc_to_ast, _compile
+from .debruijn import IDX, LAM, FREE
+from .hashcons import Shared
+from .stats import Stats, counting
+
+class CacheInfo(NamedTuple):
+    hits: int
+    disk_hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+def compile_ast(term: Term, filename: str = "<lc>", mode: str = "eval", *args,
+                counted: bool = False, **kwargs) -> CodeType:
+    return _compile(lc_to_ast(term, counted=counted), filename, mode, *args, **kwargs)
+
+def compile_closure(term: Term, filename: str = "<lc>", mode: str = "eval", *args,
+                    counted: bool = False, **kwargs) -> CodeType:
+    from .closures import compile_closure
+    return compile_closure(term, filename, mode, *args, counted=counted, **kwargs)
+
+def compile_lazy(term: Term, filename: str = "<lc>", mode: str = "eval", *args,
+                 counted: bool = False, **kwargs) -> CodeType:
+    return _compile(lc_to_ast(term, lazy=True, counted=counted), filename, mode, *args, **kwargs)
+
+def compile_trampoline(term: Term, filename: str = "<lc>", mode: str = "eval", *args, **kwargs) -> CodeType:
+    from .trampoline import compile_cps
+    return compile_cps(term, filename, mode, *args, **kwargs)
+
+BACKENDS = {
+    "ast": compile_ast,
+    "closure": compile_closure,
+    "lazy": compile_lazy,
+    "trampoline": compile_trampoline,
+}
+
+# backends whose code only makes sense in the process that compiled it
+IN_MEMORY = ("closure",)
+
+def runtime(backend: str, stats: Stats | None = None) -> dict:
+    """The globals the code of a backend needs to run, counted in `stats`
+    when it was compiled with `counted`."""
+    names = {}
+    if backend == "lazy":
+        from .lazy import RUNTIME
+        names.update(RUNTIME)
+    elif backend == "trampoline":
+        from .trampoline import RUNTIME
+        names.update(RUNTIME)
+    if stats is not None:
+        names["__counted__"] = counting(stats)
+        names["__stats__"] = stats
+    return names
+
+def digest(node: Shared) -> str:
+    """A hash of the structure of a term that is stable across processes."""
+    done: dict[int, bytes] = {}
+    todo: list[tuple[Shared, bool]] = [(node, False)]
+    while todo:
+        n, ready = todo.pop()
+        if id(n) in done:
+            continue
+        tag = n.tag
+        if tag == IDX:
+            data = b"I%d" % n.a  # type: ignore
+        elif tag == FREE:
+            data = b"F" + n.a.encode()  # type: ignore
+        elif not ready:
+            todo.append((n, True))
+            todo.append((n.a, False))  # type: ignore
+            if n.b is not None:
+                todo.append((n.b, False))
+            continue
+        elif tag == LAM:
+            data = b"L" + done[id(n.a)]
+        else:
+            data = b"A" + done[id(n.a)] + done[id(n.b)]  # type: ignore
+        done[id(n)] = hashlib.blake2b(data, digest_size=16).digest()
+    return done[id(node)].hex()
+
+class CompileCache:
+    """Code objects of compiled terms, keyed by the structure of the term.
+
+    Alpha-equivalent terms share one entry. The least recently used entry
+    is evicted past `maxsize`. With a `directory`, code objects are also
+    written there with `marshal` and looked up there before compiling, so
+    a new process finds them already compiled.
+    """
+    entries: OrderedDict[tuple, CodeType]
+    maxsize: int
+    directory: Path | None
+    hits: int
+    disk_hits: int
+    misses: int
+    evictions: int
+    def __init__(self, maxsize: int = 1024, directory: str | os.PathLike | None = None):
+        self.entries = OrderedDict()
+        self.maxsize = maxsize
+        self.directory = Path(directory) if directory is not None else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"CompileCache({self.cache_info()})"
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.disk_hits, self.misses, self.evictions, len(self), self.maxsize)
+
+    def clear(self):
+        self.entries.clear()
+
+    def compile(self, term: Term | Node, filename: str = "<lc>", mode: str = "eval", *args,
+                backend: str = "ast", **kwargs) -> CodeType:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {tuple(BACKENDS)}")
+        if isinstance(term, Node):
+            term = Term(body=term)
+        try:
+            node = term.shared()
+        except TypeError:
+            # host expressions, like x + 1, have no structural key
+            self.misses += 1
+            return BACKENDS[backend](term, filename, mode, *args, **kwargs)
+        key = (node, backend, filename, mode, args, tuple(sorted(kwargs.items())))
+        code = self.entries.get(key)
+        if code is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return code
+        path = self.path(key)
+        code = self.load(path) if path is not None else None
+        if code is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            code = BACKENDS[backend](term, filename, mode, *args, **kwargs)
+            if path is not None:
+                self.store(path, code)
+        self.entries[key] = code
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return code
+
+    def path(self, key: tuple) -> Path | None:
+        node, *options = key
+        if self.directory is None or options[0] in IN_MEMORY:
+            return None
+        extra = hashlib.blake2b(repr(options).encode(), digest_size=8).hexdigest()
+        return self.directory / f"{digest(node)}-{extra}.{sys.implementation.cache_tag}.marshal"
+
+    @staticmethod
+    def load(path: Path) -> CodeType | None:
+        try:
+            with open(path, "rb") as file:
+                code = marshal.load(file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return code if isinstance(code, CodeType) else None
+
+    @staticmethod
+    def store(path: Path, code: CodeType):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                marshal.dump(code, file)
+            os.replace(tmp, path)
+        except (OSError, ValueError):
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+# LC_CACHE_DIR persists compiled terms across processes
+COMPILE_CACHE = CompileCache(directory=os.environ.get("LC_CACHE_DIR"))
+
+if __name__ == "__main__":
+    from .lc import lc
+    two = lambda f: lambda x: f(f(x))
+    deux = lambda g: lambda y: g(g(y))
+    cache = CompileCache(maxsize=2)
+    code = cache.compile(lc(two))
+    assert cache.compile(lc(deux)) is code
+    assert eval(code)(lambda n: n + 1)(0) == 2
+    print(cache)
+    assert cache.cache_info()[:3] == (1, 0, 1)
+    i = lambda x: x
+    k = lambda x: lambda y: x
+    cache.compile(lc(i))
+    cache.compile(lc(k))
+    assert cache.evictions == 1 and len(cache) == 2
+    assert lc(two).compile() is lc(deux).compile()
+    # a host expression is compiled, not cached
+    one = lambda f: f(1)
+    assert eval(cache.compile(lc(one)))(lambda n: n + 1) == 2 and len(cache) == 2
+    inc = lambda x: x + 1
+    assert callable(eval(lc(inc).compile()))
+    # every backend counts the calls of its lambdas, not those of inc
+    from .stats import Stats
+    for backend in BACKENDS:
+        stats = Stats()
+        assert lc(two).eval(inc, 0, backend=backend, stats=stats) == 2
+        assert (stats.betas, stats.allocations) == (2, 2), (backend, stats)
+    assert lc(two).compile(counted=True) is not lc(two).compile()
+    with tempfile.TemporaryDirectory() as tmp:
+        CompileCache(directory=tmp).compile(lc(two))
+        warm = CompileCache(directory=tmp)
+        code = warm.compile(lc(deux))
+        print(warm)
+        assert warm.cache_info()[:3] == (0, 1, 0)
+        assert eval(code)(lambda n: n + 1)(0) == 2
+        warm.compile(lc(two), backend="closure")
+        # closure code is only kept in memory
+        assert len(os.listdir(tmp)) == 1
+    print("All tests passed.")
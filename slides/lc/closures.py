@@ -0,0 +1,191 @@
+from __future__ import annotations
+import builtins
+import itertools
+import weakref
+from types import CodeType
+from .lc import Node, Term, lc_to_ast, _compile
+from .debruijn import IDX, LAM, APP, FREE
+from .hashcons import Shared
+from .stats import Stats, counting
+
+# Closure templates. A builder takes the environment, a linked list
+# (value, parent) of the arguments of the enclosing lambdas, innermost
+# first, and returns the value of its node.
+
+def _lam(body):
+    return lambda env: lambda x: body((x, env))
+
+def _counted_lam(body, counted):
+    return lambda env: counted(lambda x: body((x, env)))
+
+def _app(func, arg):
+    return lambda env: func(env)(arg(env))
+
+def _app_var0(arg):
+    return lambda env: env[0](arg(env))
+
+def _var(i: int):
+    def var(env):
+        for _ in range(i):
+            env = env[1]
+        return env[0]
+    return var
+
+_VARS = [
+    lambda env: env[0],
+    lambda env: env[1][0],
+    lambda env: env[1][1][0],
+    lambda env: env[1][1][1][0],
+]
+
+def _free(name: str, scope: dict):
+    # looked up when used, like LOAD_GLOBAL
+    def free(env):
+        try:
+            return scope[name]
+        except KeyError:
+            pass
+        module = scope.get("__builtins__", builtins)
+        try:
+            return module[name] if isinstance(module, dict) else getattr(module, name)
+        except (KeyError, AttributeError):
+            raise NameError(f"name {name!r} is not defined") from None
+    return free
+
+def builder(root: Shared, scope: dict | None = None, stats: Stats | None = None):
+    """The builder of a term; free names are read from `scope`.
+
+    With `stats`, the functions it builds count their calls as betas."""
+    counted = counting(stats) if stats is not None else None
+    done: dict[int, object] = {}
+    todo: list[tuple[Shared, bool]] = [(root, False)]
+    while todo:
+        node, ready = todo.pop()
+        if id(node) in done:
+            continue
+        tag = node.tag
+        if tag == IDX:
+            i: int = node.a  # type: ignore
+            done[id(node)] = _VARS[i] if i < len(_VARS) else _var(i)
+        elif tag == FREE:
+            if scope is None:
+                raise ValueError(f"Free name {node.a!r} needs a scope")
+            done[id(node)] = _free(node.a, scope)  # type: ignore
+        elif not ready:
+            todo.append((node, True))
+            if node.b is not None:
+                todo.append((node.b, False))
+            todo.append((node.a, False))  # type: ignore
+        elif tag == LAM:
+            body = done[id(node.a)]
+            done[id(node)] = _lam(body) if counted is None else _counted_lam(body, counted)
+        else:
+            func = node.a
+            arg = done[id(node.b)]
+            if func.tag == IDX and func.a == 0:  # type: ignore
+                done[id(node)] = _app_var0(arg)
+            else:
+                done[id(node)] = _app(done[id(func)], arg)
+    return done[id(root)]
+
+# The makers of the compiled terms, by key. The code of a term only holds
+# its key and finds this module through sys.modules; the maker goes away
+# with the code object.
+_MAKERS: dict[int, object] = {}
+_KEYS = itertools.count()
+
+def _template(key: int, filename: str) -> CodeType:
+    """Code that calls the maker of `key` with the globals of `eval`."""
+    source = f"__import__('sys').modules[{__name__!r}]._MAKERS[{key}](globals())"
+    return _compile(source, filename, "eval")
+
+def compile_closure(term: Term | Node, filename: str = "<lc>", mode: str = "eval",
+                    counted: bool = False) -> CodeType:
+    """Compile a term without going through Python's ast and compiler.
+
+    The code object evaluates to the same function as the one `Term.compile`
+    gives, built out of the closure templates above. Free names are looked
+    up in the globals of `eval` when they are used. With `counted`, the
+    functions count their calls in the Stats `__stats__` of the globals.
+    A term that embeds Python code, like x + 1, has no template and is
+    compiled through Python's ast instead."""
+    if mode != "eval":
+        raise ValueError(f"The closure backend only compiles in 'eval' mode, not {mode!r}")
+    if isinstance(term, Node):
+        term = Term(body=term)
+    try:
+        root = term.shared()
+    except TypeError:
+        return _compile(lc_to_ast(term, counted=counted), filename, mode)
+    if root.free:
+        raise ValueError("Cannot compile a term with unbound de Bruijn indices")
+    if counted:
+        make = lambda scope: builder(root, scope, scope["__stats__"])(None)
+    elif _is_closed(root):
+        build = builder(root)
+        make = lambda scope: build(None)
+    else:
+        make = lambda scope: builder(root, scope)(None)
+    key = next(_KEYS)
+    code = _template(key, filename)
+    _MAKERS[key] = make
+    weakref.finalize(code, _MAKERS.pop, key, None)
+    return code
+
+def _is_closed(root: Shared) -> bool:
+    seen: set[int] = set()
+    todo = [root]
+    while todo:
+        node = todo.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if node.tag == FREE:
+            return False
+        if node.tag == LAM:
+            todo.append(node.a)  # type: ignore
+        elif node.tag == APP:
+            todo.append(node.a)  # type: ignore
+            todo.append(node.b)  # type: ignore
+    return True
+
+if __name__ == "__main__":
+    from .lc import lc
+    inc = lambda n: n + 1
+    TWO = lambda f: lambda x: f(f(x))
+    EXP = lambda a: lambda b: b(a)
+    FIVE = lambda f: lambda x: f(f(f(f(f(x)))))
+    THREE = lambda f: lambda x: f(f(f(x)))
+    env = {"inc": inc, "zero": 0}
+    for f in (TWO, FIVE):
+        by_ast = eval(lc(f).compile(), env)
+        by_closure = eval(lc(f).compile(backend="closure"), env)
+        print(f"{lc(f)}: {by_closure(inc)(0)}")
+        assert by_ast(inc)(0) == by_closure(inc)(0)
+    two = eval(lc(TWO).compile(backend="closure"))
+    exp = eval(lc(EXP).compile(backend="closure"))
+    three = eval(lc(THREE).compile(backend="closure"))
+    assert exp(two)(three)(inc)(0) == 8
+    assert exp(three)(two)(inc)(0) == eval(lc(EXP).compile())(three)(two)(inc)(0) == 9
+    APPLY_INC = lambda n: n(inc)(zero)
+    apply_inc = eval(lc(APPLY_INC).compile(backend="closure"), env)
+    assert apply_inc(two) == 2
+    try:
+        eval(lc(APPLY_INC).compile(backend="closure"), {})(two)
+    except NameError as e:
+        print(f"NameError: {e}")
+    else:
+        raise AssertionError("expected a NameError")
+    # host expressions give the same results on every backend
+    from .cache import BACKENDS
+    APPLY_ONE = lambda f: lambda x: f(x)(1)
+    add = lambda a: lambda b: a + b
+    results = {backend: lc(APPLY_ONE).eval(add, 2, backend=backend) for backend in BACKENDS}
+    assert set(results.values()) == {3}, results
+    # the maker lives as long as its code object
+    code = compile_closure(lc(TWO), "<two>")
+    assert code.co_filename == "<two>" and eval(code)(inc)(0) == 2
+    keys = len(_MAKERS)
+    del code
+    assert len(_MAKERS) == keys - 1
+    print("All tests passed.")
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import ast
+from .lc import Var, Lam, App, Term
+
+# Nameless terms are plain tuples, cheap to build, hashable and picklable:
+#   (IDX, i)          variable bound i binders up
+#   (LAM, body)       abstraction
+#   (APP, func, arg)  application
+#   (FREE, name)      free name (a global `lc` could not resolve)
+IDX, LAM, APP, FREE = range(4)
+
+type Node = tuple
+
+_VISIT, _LAM, _APP = range(3)
+
+def to_debruijn(term: ast.AST) -> Node:
+    """Convert a named term (Term, Lam, App, Var or ast.Name) to de Bruijn form."""
+    if isinstance(term, ast.Expression):
+        term = term.body
+    levels: dict[str, list[int]] = {}
+    depth = 0
+    out: list[Node] = []
+    todo: list[tuple[int, object]] = [(_VISIT, term)]
+    while todo:
+        op, node = todo.pop()
+        if op == _VISIT:
+            if isinstance(node, Var):
+                bound = levels.get(node.name)
+                if bound:
+                    out.append((IDX, depth - bound[-1] - 1))
+                else:
+                    out.append((FREE, node.name))
+            elif isinstance(node, Lam):
+                levels.setdefault(node.var.name, []).append(depth)
+                depth += 1
+                todo.append((_LAM, node.var.name))
+                todo.append((_VISIT, node.body))
+            elif isinstance(node, App):
+                todo.append((_APP, None))
+                todo.append((_VISIT, node.arg))
+                todo.append((_VISIT, node.func))
+            elif isinstance(node, ast.Name):
+                out.append((FREE, node.id))
+            else:
+                raise TypeError(f"Not a lambda term: {ast.dump(node) if isinstance(node, ast.AST) else node!r}")
+        elif op == _LAM:
+            depth -= 1
+            levels[node].pop()  # type: ignore
+            out.append((LAM, out.pop()))
+        else:
+            arg = out.pop()
+            func = out.pop()
+            out.append((APP, func, arg))
+    return out[0]
+
+def from_debruijn(node: Node) -> Term:
+    """Convert a de Bruijn term back to a named Term.
+
+    Binders are numbered in pre-order, like `lc` does, so a term that is
+    already in normal form reads back exactly as `lc` printed it."""
+    names: list[Var] = []
+    counter = 0
+    out: list[ast.expr] = []
+    todo: list[tuple[int, object]] = [(_VISIT, node)]
+    while todo:
+        op, n = todo.pop()
+        if op == _VISIT:
+            tag = n[0]  # type: ignore
+            if tag == IDX:
+                out.append(names[-1 - n[1]])  # type: ignore
+            elif tag == FREE:
+                out.append(ast.Name(id=n[1], ctx=ast.Load()))  # type: ignore
+            elif tag == LAM:
+                var = Var(counter)
+                counter += 1
+                names.append(var)
+                todo.append((_LAM, var))
+                todo.append((_VISIT, n[1]))  # type: ignore
+            else:
+                todo.append((_APP, None))
+                todo.append((_VISIT, n[2]))  # type: ignore
+                todo.append((_VISIT, n[1]))  # type: ignore
+        elif op == _LAM:
+            names.pop()
+            out.append(Lam(n, out.pop()))  # type: ignore
+        else:
+            arg = out.pop()
+            func = out.pop()
+            out.append(App(func, arg))
+    return Term(body=out[0])
+
+def map_vars(node: Node, fn) -> Node:
+    """Rebuild `node`, replacing every (IDX, i) by fn(var, depth).
+
+    Subterms that come back unchanged are shared with the input."""
+    out: list[Node] = []
+    todo: list[tuple[Node, int, bool]] = [(node, 0, False)]
+    while todo:
+        n, depth, done = todo.pop()
+        tag = n[0]
+        if tag == IDX:
+            out.append(fn(n, depth))
+        elif tag == LAM:
+            if done:
+                body = out.pop()
+                out.append(n if body is n[1] else (LAM, body))
+            else:
+                todo.append((n, depth, True))
+                todo.append((n[1], depth + 1, False))
+        elif tag != APP:
+            # FREE, and the closed leaves other modules add (see arith)
+            out.append(n)
+        else:
+            if done:
+                arg = out.pop()
+                func = out.pop()
+                out.append(n if func is n[1] and arg is n[2] else (APP, func, arg))
+            else:
+                todo.append((n, depth, True))
+                todo.append((n[2], depth, False))
+                todo.append((n[1], depth, False))
+    return out[0]
+
+def shift(node: Node, d: int, cutoff: int = 0) -> Node:
+    """Add `d` to every index of `node` that points above `cutoff` binders."""
+    if d == 0:
+        return node
+    def fn(var, depth):
+        i = var[1]
+        return (IDX, i + d) if i >= cutoff + depth else var
+    return map_vars(node, fn)
+
+def instantiate(body: Node, arg: Node) -> Node:
+    """Substitute `arg` for the variable bound by `(LAM, body)`: one beta step."""
+    shifted: dict[int, Node] = {}
+    def fn(var, depth):
+        i = var[1]
+        if i < depth:
+            return var
+        if i == depth:
+            s = shifted.get(depth)
+            if s is None:
+                s = shifted[depth] = shift(arg, depth)
+            return s
+        return (IDX, i - 1)
+    return map_vars(body, fn)
+
+def church(n: int) -> Node:
+    """The Church numeral λf.λx.f(...f(x)) as a de Bruijn term."""
+    body: Node = (IDX, 0)
+    for _ in range(n):
+        body = (APP, (IDX, 1), body)
+    return (LAM, (LAM, body))
+
+if __name__ == "__main__":
+    from .lc import lc
+    k = lambda x: lambda y: x
+    node = to_debruijn(lc(k))
+    print(node)
+    assert node == (LAM, (LAM, (IDX, 1)))
+    assert str(from_debruijn(node)) == str(lc(k))
+    e = lambda f: lambda x: f(d(x))
+    node = to_debruijn(lc(e))
+    assert node == (LAM, (LAM, (APP, (IDX, 1), (APP, (FREE, "d"), (IDX, 0)))))
+    assert str(from_debruijn(node)) == "λx0.(λx1.(x0(d(x1))))"
+    # (λx.λy.x)[x := z] under one binder must not capture y
+    assert instantiate((LAM, (IDX, 1)), (IDX, 0)) == (LAM, (IDX, 1))
+    assert str(from_debruijn(church(2))) == "λx0.(λx1.(x0(x0(x1))))"
+    print("All tests passed.")
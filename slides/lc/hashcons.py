@@ -0,0 +1,173 @@
+from __future__ import annotations
+import ast
+from weakref import WeakValueDictionary
+from .debruijn import IDX, LAM, APP, FREE, Node, to_debruijn
+
+class Shared:
+    """A hash-consed de Bruijn node.
+
+    A `TermTable` hands out exactly one `Shared` per alpha-equivalence
+    class, so equality is identity and the hash is computed once, from
+    the structure only: variable names never enter it.
+    - IDX: `a` is the index
+    - LAM: `a` is the body
+    - APP: `a` is the function, `b` the argument
+    - FREE: `a` is the name
+    `free` is one more than the largest index pointing out of the node,
+    0 for closed terms; `size` is the number of nodes of the unshared tree.
+    """
+    __slots__ = ("tag", "a", "b", "hash", "size", "free", "__weakref__")
+    tag: int
+    a: object
+    b: Shared | None
+    hash: int
+    size: int
+    free: int
+
+    def __hash__(self):
+        return self.hash
+
+    def __repr__(self):
+        if self.tag == IDX:
+            return f"Shared(IDX, {self.a})"
+        if self.tag == FREE:
+            return f"Shared(FREE, {self.a!r})"
+        return f"Shared({('LAM', 'APP')[self.tag - LAM]}, size={self.size}, free={self.free})"
+
+    def debruijn(self, memo: dict[int, Node] | None = None) -> Node:
+        """The tuple form of this node; shared subterms stay shared.
+
+        A `memo` passed from one call to the next, by id of the nodes,
+        converts every subterm only once."""
+        done: dict[int, Node] = memo if memo is not None else {}
+        todo: list[tuple[Shared, bool]] = [(self, False)]
+        while todo:
+            node, ready = todo.pop()
+            if id(node) in done:
+                continue
+            tag = node.tag
+            if tag == IDX or tag == FREE:
+                done[id(node)] = (tag, node.a)
+            elif not ready:
+                todo.append((node, True))
+                if node.b is not None:
+                    todo.append((node.b, False))
+                todo.append((node.a, False))  # type: ignore
+            elif tag == LAM:
+                done[id(node)] = (LAM, done[id(node.a)])
+            else:
+                done[id(node)] = (APP, done[id(node.a)], done[id(node.b)])
+        return done[id(self)]
+
+class TermTable:
+    """Interning table of `Shared` nodes.
+
+    Nodes are held weakly: an entry lives as long as some term uses it."""
+    nodes: WeakValueDictionary[tuple, Shared]
+    hits: int
+    misses: int
+    def __init__(self):
+        self.nodes = WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"TermTable(nodes={len(self)}, hits={self.hits}, misses={self.misses})"
+
+    def node(self, tag: int, a: object, b: Shared | None = None) -> Shared:
+        key = (tag, a, b)
+        node = self.nodes.get(key)
+        if node is not None:
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = Shared()
+        node.tag = tag
+        node.a = a
+        node.b = b
+        if tag == IDX:
+            node.hash = hash((IDX, a))
+            node.size = 1
+            node.free = a + 1  # type: ignore
+        elif tag == FREE:
+            node.hash = hash((FREE, a))
+            node.size = 1
+            node.free = 0
+        elif tag == LAM:
+            node.hash = hash((LAM, a.hash))  # type: ignore
+            node.size = 1 + a.size  # type: ignore
+            node.free = max(a.free - 1, 0)  # type: ignore
+        else:
+            node.hash = hash((APP, a.hash, b.hash))  # type: ignore
+            node.size = 1 + a.size + b.size  # type: ignore
+            node.free = max(a.free, b.free)  # type: ignore
+        self.nodes[key] = node
+        return node
+
+    def intern(self, term: ast.AST | Node) -> Shared:
+        """The shared node of a named term or of a de Bruijn tuple."""
+        root = term if isinstance(term, tuple) else to_debruijn(term)
+        done: dict[int, Shared] = {}
+        todo: list[tuple[Node, bool]] = [(root, False)]
+        while todo:
+            node, ready = todo.pop()
+            if id(node) in done:
+                continue
+            tag = node[0]
+            if tag == IDX or tag == FREE:
+                done[id(node)] = self.node(tag, node[1])
+            elif not ready:
+                todo.append((node, True))
+                todo.extend((child, False) for child in node[:0:-1])
+            elif tag == LAM:
+                done[id(node)] = self.node(LAM, done[id(node[1])])
+            else:
+                done[id(node)] = self.node(APP, done[id(node[1])], done[id(node[2])])
+        return done[id(root)]
+
+TABLE = TermTable()
+
+def intern(term: ast.AST | Node, table: TermTable = TABLE) -> Shared:
+    return table.intern(term)
+
+if __name__ == "__main__":
+    from .lc import lc
+    I = lambda a: a
+    J = lambda b: b
+    assert intern(lc(I)) is intern(lc(J))
+    K = lambda x: lambda y: x
+    KI = lambda y: lambda x: lambda z: x
+    k = intern(lc(K))
+    ki = intern(lc(KI))
+    print(k, ki)
+    # K nested one binder deeper is still the same node
+    assert ki.a is k
+    K2 = lambda p: lambda q: p
+    K_STAR = lambda p: lambda q: q
+    assert lc(K) == lc(K2)
+    assert lc(K) != lc(K_STAR)
+    cache = {lc(I): "identity"}
+    assert cache[lc(J)] == "identity"
+    assert hash(lc(I)) == hash(lc(J))
+    # a term with a host expression is only equal to itself
+    INC = lambda x: x + 1
+    assert lc(INC) == lc(INC) and lc(INC) != lc(I)
+    assert {lc(INC): "inc"}[lc(INC)] == "inc"
+    e = lambda f: lambda x: f(d(x))
+    assert intern(lc(e)).free == 0 and k.a.a.free == 2
+    assert intern(lc(e)).debruijn() == to_debruijn(lc(e))
+    from .lc import lc_to_ast, unparse
+    memo = {}
+    i = lambda x: (lambda y: y)((lambda y: y)(x))
+    shared = lc_to_ast(lc(i), memo)
+    src = unparse(shared)
+    print(f"shared: {src}")
+    assert src == "lambda x0: (lambda x0: x0)((lambda x0: x0)(x0))"
+    assert shared.body.body.func is shared.body.body.args[0].func  # type: ignore
+    two = lambda f: lambda x: f(f(x))
+    assert eval(compile(lc_to_ast(lc(two), memo), "<lc>", "eval"))(lambda n: n + 1)(0) == 2
+    print(TABLE)
+    print("All tests passed.")
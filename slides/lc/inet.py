@@ -0,0 +1,539 @@
+from __future__ import annotations
+import ast
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+from .lc import Term
+from .debruijn import IDX, LAM, APP, FREE, Node, to_debruijn, from_debruijn
+from .stats import Stats
+from .limits import LimitExceeded
+
+# Agents of the net. Every agent owns three consecutive ports in `Net.ports`:
+# port 0 is the principal port, 1 and 2 are auxiliary.
+#   LAM: 0 = the abstraction, 1 = bound variable, 2 = body
+#   APP: 0 = function, 1 = argument, 2 = result
+#   DUP: 0 = shared value, 1 and 2 = the two copies
+#   ERA: 0 = erased value
+#   FREE: 0 = free name of the term
+#   ROOT: 1 = the whole term, never interacts
+#   BRA, CRO: 0 = toward the binder, 1 = toward the use
+# Brackets and croissants are the control agents of Lamping's algorithm:
+# an agent of a higher level that crosses a bracket goes one level up, one
+# that crosses a croissant one level down.
+A_LAM, A_APP, A_DUP, A_ERA, A_FREE, A_ROOT, A_BRA, A_CRO = range(8)
+_ARITY = (2, 2, 2, 0, 0, 0, 1, 1)
+_SHIFT = (0, 0, 0, 0, 0, 0, 1, -1)
+_CONTROL = (A_DUP, A_BRA, A_CRO)
+
+_VISIT, _LAM, _APP = range(3)
+
+class Net:
+    """An interaction net for the lambda calculus: Lamping's algorithm,
+    with the levels of Gonthier, Abadi and Lévy.
+
+    Beta reduction happens one LAM/APP interaction at a time and shared
+    arguments are copied lazily by duplicators, so work on a shared
+    subterm is never repeated. Every agent has a level, the number of
+    arguments it is nested in: two duplicators annihilate when they are
+    of the same level, which tells a copy of a sharing point apart from
+    the sharing points it copies, for any term. Brackets and croissants
+    keep the levels right as values move in and out of arguments.
+
+    `reduce` rewrites every active pair, in rounds of independent
+    rewrites; pairs inside unused copies included, so a term built with
+    `Y` never runs out of them. `readback` only rewrites the pairs the
+    normal form needs, in normal order, and finds it whenever there is
+    one: it is what `normalize` uses.
+
+    With `stats`, agents created count as allocations and the most
+    agents alive at once as the peak size.
+    """
+    kinds: list[int]
+    levels: list[int]
+    ports: list[int]
+    names: dict[int, str]
+    redexes: list[tuple[int, int]]
+    free: list[int]
+    root: int
+    interactions: int
+    betas: int
+    rounds: int
+    stats: Stats | None
+    def __init__(self, stats: Stats | None = None):
+        self.kinds = []
+        self.levels = []
+        self.ports = []
+        self.names = {}
+        self.redexes = []
+        self.free = []
+        self.interactions = 0
+        self.betas = 0
+        self.rounds = 0
+        self.stats = stats
+        self.root = self.new(A_ROOT)
+
+    def __len__(self):
+        return len(self.kinds) - len(self.free)
+
+    def new(self, kind: int, level: int = 0) -> int:
+        if self.free:
+            node = self.free.pop()
+            self.kinds[node] = kind
+            self.levels[node] = level
+        else:
+            node = len(self.kinds)
+            self.kinds.append(kind)
+            self.levels.append(level)
+            self.ports.extend((-1, -1, -1))
+        if self.stats is not None:
+            self.stats.allocations += 1
+            self.stats.size(len(self))
+        return node
+
+    def delete(self, node: int):
+        self.kinds[node] = -1
+        self.names.pop(node, None)
+        self.free.append(node)
+
+    @staticmethod
+    def interacts(ka: int, kb: int) -> bool:
+        """Whether agents of these kinds rewrite when their principal ports meet."""
+        if ka == A_ROOT or kb == A_ROOT:
+            return False
+        if ka == A_FREE:
+            return kb in _CONTROL or kb == A_ERA
+        if kb == A_FREE:
+            return ka in _CONTROL or ka == A_ERA
+        return True
+
+    def link(self, a: int, b: int):
+        ports = self.ports
+        ports[a] = b
+        ports[b] = a
+        if a % 3 == 0 and b % 3 == 0 and self.interacts(self.kinds[a // 3], self.kinds[b // 3]):
+            self.redexes.append((a // 3, b // 3))
+
+    @classmethod
+    def from_term(cls, term: ast.AST | Node, stats: Stats | None = None) -> Net:
+        node = term if isinstance(term, tuple) else to_debruijn(term)
+        net = cls(stats)
+        net.build(node)
+        return net
+
+    def build(self, node: Node):
+        """Translate a term, at level 0, below the root.
+
+        Every subterm leaves its output port and, per binder it uses, one
+        port that all the uses are merged into: a croissant at a use,
+        duplicators where uses meet at an application and a bracket where
+        they leave an argument."""
+        outs: list[tuple[int, dict[int, int]]] = []
+        todo: list[tuple[int, object, int, int]] = [(_VISIT, node, 0, 0)]
+        while todo:
+            op, n, level, depth = todo.pop()
+            if op == _LAM:
+                body, uses = outs.pop()
+                lam = self.new(A_LAM, level)
+                self.link(lam * 3 + 2, body)
+                var = uses.pop(depth, None)
+                self.link(lam * 3 + 1, self.new(A_ERA) * 3 if var is None else var)
+                outs.append((lam * 3, uses))
+            elif op == _APP:
+                arg, arg_uses = outs.pop()
+                func, uses = outs.pop()
+                app = self.new(A_APP, level)
+                self.link(app * 3, func)
+                self.link(app * 3 + 1, arg)
+                for binder, port in arg_uses.items():
+                    bra = self.new(A_BRA, level)
+                    self.link(bra * 3 + 1, port)
+                    port = bra * 3
+                    other = uses.get(binder)
+                    if other is not None:
+                        dup = self.new(A_DUP, level)
+                        self.link(dup * 3 + 1, other)
+                        self.link(dup * 3 + 2, port)
+                        port = dup * 3
+                    uses[binder] = port
+                outs.append((app * 3 + 2, uses))
+            else:
+                tag = n[0]  # type: ignore
+                if tag == IDX:
+                    cro = self.new(A_CRO, level)
+                    outs.append((cro * 3 + 1, {depth - 1 - n[1]: cro * 3}))  # type: ignore
+                elif tag == FREE:
+                    var = self.new(A_FREE)
+                    self.names[var] = n[1]  # type: ignore
+                    outs.append((var * 3, {}))
+                elif tag == LAM:
+                    todo.append((_LAM, None, level, depth))
+                    todo.append((_VISIT, n[1], level, depth + 1))  # type: ignore
+                else:
+                    todo.append((_APP, None, level, depth))
+                    todo.append((_VISIT, n[2], level + 1, depth))  # type: ignore
+                    todo.append((_VISIT, n[1], level, depth))  # type: ignore
+        self.link(self.root * 3 + 1, outs[0][0])
+
+    def reduce(self, max_interactions: int | None = None) -> Net:
+        """Rewrite active pairs until none is left.
+
+        Active pairs never share an agent, so each round is a batch of
+        independent rewrites; `rounds` is the parallel depth of the run."""
+        while self.redexes:
+            batch = self.redexes
+            self.redexes = []
+            self.rounds += 1
+            for i, (a, b) in enumerate(batch):
+                if max_interactions is not None and self.interactions >= max_interactions:
+                    self.redexes[:0] = batch[i:]
+                    return self
+                try:
+                    self.interact(a, b)
+                except LimitExceeded as e:
+                    # hooks run once the rewrite is done: the net is whole
+                    self.redexes[:0] = batch[i + 1:]
+                    e.partial = self.partial()
+                    raise
+        return self
+
+    def whnf(self, port: int):
+        """Rewrite the active pairs that the agent across from `port`
+        waits on, until it is an abstraction, a free name, a variable or
+        an application of one, or a duplicator to leave from its
+        principal port.
+
+        Applications wait on their function, duplicators, brackets and
+        croissants on their principal port, so this follows principal
+        ports from `port` and rewrites the first active pair it meets,
+        as normal order reduction does."""
+        ports, kinds = self.ports, self.kinds
+        # [port, whether the agent across has been waited on]
+        todo: list[list] = [[port, False]]
+        while todo:
+            frame = todo[-1]
+            src = frame[0]
+            node, slot = divmod(ports[src], 3)
+            if slot == 0:
+                if src % 3 == 0 and self.interacts(kinds[src // 3], kinds[node]):
+                    # the agent that src belongs to is gone
+                    self.interact(src // 3, node)
+                    todo.pop()
+                    todo[-1][1] = False
+                else:
+                    todo.pop()
+                continue
+            kind = kinds[node]
+            if frame[1] or not (kind == A_APP and slot == 2 or kind in _CONTROL):
+                todo.pop()
+                continue
+            frame[1] = True
+            todo.append([node * 3, False])
+            if len(todo) > len(kinds):
+                raise RuntimeError("The net is a vicious circle, the term has no normal form")
+
+    def interact(self, a: int, b: int):
+        kinds, levels = self.kinds, self.levels
+        ka, kb = kinds[a], kinds[b]
+        self.interactions += 1
+        beta = False
+        if ka == A_ERA or kb == A_ERA:
+            if kb == A_ERA:
+                a, b = b, a
+            self.erase(a, b)
+        elif ka == A_FREE or kb == A_FREE:
+            if kb == A_FREE:
+                a, b = b, a
+            self.copy_free(a, b)
+        elif ka in _CONTROL and kb in _CONTROL and ka == kb and levels[a] == levels[b]:
+            self.annihilate(a, b)
+        elif ka in _CONTROL or kb in _CONTROL:
+            if levels[a] == levels[b]:
+                raise RuntimeError(f"Agents {ka} and {kb} of level {levels[a]} cannot interact")
+            self.commute(a, b)
+        elif {ka, kb} == {A_LAM, A_APP} and levels[a] == levels[b]:
+            beta = True
+            self.betas += 1
+            if ka == A_APP:
+                a, b = b, a
+            self.annihilate(a, b)
+        else:
+            raise RuntimeError(f"Agents {ka} and {kb} of levels {levels[a]} and {levels[b]} cannot interact")
+        if self.stats is not None:
+            self.stats.interactions += 1
+            if beta:
+                self.stats.betas += 1
+            self.stats.step("interaction")
+
+    def annihilate(self, a: int, b: int):
+        ports = self.ports
+        for i in range(1, _ARITY[self.kinds[a]] + 1):
+            self.link(ports[a * 3 + i], ports[b * 3 + i])
+        self.delete(a)
+        self.delete(b)
+
+    def commute(self, a: int, b: int):
+        """Let two agents pass through each other: a copy of each on every
+        auxiliary port of the other. The agent of the higher level moves
+        by the shift of the other one."""
+        ports, kinds, levels = self.ports, self.kinds, self.levels
+        ka, la, kb, lb = kinds[a], levels[a], kinds[b], levels[b]
+        if la < lb:
+            lb += _SHIFT[ka]
+        else:
+            la += _SHIFT[kb]
+        copies_a = [self.new(ka, la) for _ in range(_ARITY[kb])]
+        copies_b = [self.new(kb, lb) for _ in range(_ARITY[ka])]
+        for i, copy in enumerate(copies_a):
+            self.link(copy * 3, ports[b * 3 + 1 + i])
+        for j, copy in enumerate(copies_b):
+            self.link(copy * 3, ports[a * 3 + 1 + j])
+        for i, ca in enumerate(copies_a):
+            for j, cb in enumerate(copies_b):
+                self.link(ca * 3 + 1 + j, cb * 3 + 1 + i)
+        self.delete(a)
+        self.delete(b)
+
+    def erase(self, era: int, node: int):
+        ports = self.ports
+        for i in range(1, _ARITY[self.kinds[node]] + 1):
+            self.link(self.new(A_ERA) * 3, ports[node * 3 + i])
+        self.delete(era)
+        self.delete(node)
+
+    def copy_free(self, var: int, node: int):
+        """A free name goes through a bracket or a croissant, and a
+        duplicator copies it."""
+        ports = self.ports
+        name = self.names[var]
+        if self.kinds[node] != A_DUP:
+            self.link(var * 3, ports[node * 3 + 1])
+            self.delete(node)
+            return
+        for port in (ports[node * 3 + 1], ports[node * 3 + 2]):
+            copy = self.new(A_FREE)
+            self.names[copy] = name
+            self.link(copy * 3, port)
+        self.delete(var)
+        self.delete(node)
+
+    def readback(self, stats: Stats | None = None, max_nodes: int | None = None, reduce: bool = True) -> Node:
+        """Read the normal form back, rewriting what it needs on the way
+        (see whnf), or with `reduce=False`, the term the net is now.
+
+        A path follows the wires from the root; crossing a control agent
+        changes its context, one stack per level, that tells which copy
+        to leave a duplicator by (see `enter` and `leave`). A variable is
+        bound by the innermost abstraction on its path that is the agent
+        its wire ends at, reached with the same context below its level.
+
+        A net where waiting on principal ports or crossing control agents
+        goes around a cycle forever is a vicious circle: there is no term
+        to read back, and this raises a RuntimeError. Terms without a
+        normal form rewrite forever instead, as Ω does, or unfold forever,
+        as `Y f` does into f(f(...)): reading back stops with a
+        RuntimeError past `max_nodes` nodes, or when a hook of `stats`
+        raises, as each node read back is a "readback" step and counts
+        towards its peak size."""
+        ports, kinds, levels = self.ports, self.kinds, self.levels
+        out: list[Node] = []
+        # (port, context, enclosing abstractions) or a build step; the
+        # abstractions are a linked list of (agent, context, rest)
+        todo: list[tuple] = [(self.root * 3 + 1, (), None)]
+        size = 0
+        hops = 0
+        while todo:
+            item = todo.pop()
+            if item[0] == -1:
+                if item[1] == LAM:
+                    out.append((LAM, out.pop()))
+                else:
+                    arg = out.pop()
+                    func = out.pop()
+                    out.append((APP, func, arg))
+                continue
+            port, context, lams = item
+            if reduce:
+                try:
+                    self.whnf(port)
+                except LimitExceeded as e:
+                    e.partial = self.partial()
+                    raise
+            node, slot = divmod(ports[port], 3)
+            kind = kinds[node]
+            if kind in _CONTROL:
+                hops += 1
+                if hops > 2 * len(kinds):
+                    raise RuntimeError("The net is a vicious circle, the term has no normal form")
+                if slot:
+                    todo.append((node * 3, enter(kind, levels[node], slot, context), lams))
+                else:
+                    context, exit = leave(kind, levels[node], context)
+                    todo.append((node * 3 + exit, context, lams))
+                continue
+            hops = 0
+            size += 1
+            if max_nodes is not None and size > max_nodes:
+                raise RuntimeError(f"The net reads back to more than {max_nodes} nodes")
+            if stats is not None:
+                stats.size(size)
+                stats.step("readback")
+            if kind == A_LAM and slot == 0:
+                todo.append((-1, LAM))
+                todo.append((node * 3 + 2, context, (node, context, lams)))
+            elif kind == A_APP and slot == 2:
+                todo.append((-1, APP))
+                todo.append((node * 3 + 1, context, lams))
+                todo.append((node * 3, context, lams))
+            elif kind == A_LAM and slot == 1:
+                level = levels[node]
+                below = _prefix(context, level)
+                index, scope = 0, lams
+                while scope is not None and (scope[0] != node or _prefix(scope[1], level) != below):
+                    index, scope = index + 1, scope[2]
+                if scope is None:
+                    raise RuntimeError("A variable of the net is out of the scope of its binder")
+                out.append((IDX, index))
+            elif kind == A_FREE:
+                out.append((FREE, self.names[node]))
+            else:
+                raise RuntimeError(f"Cannot read back agent {kind} at port {slot}")
+        return out[0]
+
+    def partial(self) -> Node | None:
+        """The term the net is now, as far as it reads back, for a
+        LimitExceeded."""
+        try:
+            return self.readback(max_nodes=16 * len(self.ports), reduce=False)
+        except (RuntimeError, KeyError, IndexError):
+            return None
+
+# A context has a stack per level, the levels being a tuple without its
+# trailing empty stacks. A stack is None when empty, (copy, rest) after a
+# duplicator pushed the copy a path entered it by, or (0, lower, upper)
+# when a bracket merged two levels into one.
+type Context = tuple
+
+def _prefix(context: Context, level: int) -> Context:
+    below = context[:level]
+    return below + (None,) * (level - len(below))
+
+def _trim(levels: list) -> Context:
+    while levels and levels[-1] is None:
+        levels.pop()
+    return tuple(levels)
+
+def enter(kind: int, level: int, slot: int, context: Context) -> Context:
+    """The context past a control agent, entered by an auxiliary port."""
+    levels = list(_prefix(context, level + 2)) + list(context[level + 2:])
+    if kind == A_DUP:
+        levels[level] = (slot, levels[level])
+    elif kind == A_CRO:
+        levels.insert(level, None)
+    else:
+        levels[level:level + 2] = [(0, levels[level], levels[level + 1])]
+    return _trim(levels)
+
+def leave(kind: int, level: int, context: Context) -> tuple[Context, int]:
+    """The context past a control agent, entered by its principal port,
+    and the auxiliary port to leave by."""
+    levels = list(_prefix(context, level + 1)) + list(context[level + 1:])
+    top = levels[level]
+    if kind == A_DUP:
+        if top is None or len(top) != 2:
+            raise RuntimeError("Unbalanced duplicator path in readback")
+        levels[level] = top[1]
+        return _trim(levels), top[0]
+    if kind == A_CRO:
+        del levels[level]
+    elif top is None:
+        levels.insert(level, None)
+    elif len(top) == 3:
+        levels[level:level + 1] = [top[1], top[2]]
+    else:
+        raise RuntimeError("Unbalanced bracket path in readback")
+    return _trim(levels), 1
+
+def reduce_node(node: Node, stats: Stats | None = None) -> Node:
+    return Net.from_term(node, stats).readback(stats)
+
+def normalize(term: ast.AST, stats: Stats | None = None) -> Term:
+    """Reduce a term to normal form with optimal sharing."""
+    return from_debruijn(reduce_node(to_debruijn(term), stats))
+
+def normalize_many(terms: Iterable[ast.AST], workers: int | None = None) -> Iterator[Term]:
+    """Normalize many terms, one net per worker process.
+
+    Nets are sent to the workers as picklable de Bruijn tuples. A single
+    net stays in one process: its rewrites touch neighbouring agents and
+    would cost more to synchronize across processes than to perform."""
+    nodes = [to_debruijn(term) for term in terms]
+    if workers == 1:
+        yield from (from_debruijn(reduce_node(node)) for node in nodes)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for node in pool.map(reduce_node, nodes):
+            yield from_debruijn(node)
+
+if __name__ == "__main__":
+    from .lc import lc
+    from .debruijn import church
+    from .reduce import Reducer
+    from .limits import limited
+    from .arith import numeral
+    # the LimitExceeded of lc.limits, not of __main__
+    from .limits import LimitExceeded  # type: ignore
+    EXP = lambda: (lambda a, b: b(a))(
+        lambda f: lambda x: f(f(f(x))),
+        lambda f: lambda x: f(f(f(x))),
+    )
+    net = Net.from_term(lc(EXP)).reduce()
+    print(f"EXP(THREE)(THREE): {net.betas} betas, {net.interactions} interactions, {net.rounds} rounds")
+    assert net.readback() == church(27)
+    reducer = Reducer()
+    assert reducer.run(to_debruijn(lc(EXP))) == church(27)
+    print(f"normal order: {reducer.steps} betas")
+    PRED = lambda: (lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u))(
+        lambda f: lambda x: f(f(f(f(x)))),
+    )
+    assert to_debruijn(normalize(lc(PRED))) == church(3)
+    stats = Stats()
+    net = Net.from_term(lc(EXP), stats)
+    assert net.readback(stats) == church(27)
+    print(stats)
+    assert (stats.betas, stats.interactions) == (net.betas, net.interactions)
+    FREE_VARS = lambda: (lambda x: x(x))(g)
+    assert str(normalize(lc(FREE_VARS))) == "g(g)"
+    K = lambda: (lambda x: lambda y: x)(a)(b)
+    assert to_debruijn(normalize(lc(K))) == (FREE, "a")
+    # self-application: copies of a duplicator meet copies of itself
+    SQUARE = lambda: (lambda n: n(n))(lambda f: lambda x: f(f(x)))
+    assert to_debruijn(normalize(lc(SQUARE))) == church(4)
+    SQUARE_ETA = lambda: (lambda x: x(x))(lambda y: (lambda f: lambda x: f(f(x)))(y))
+    assert to_debruijn(normalize(lc(SQUARE_ETA))) == church(4)
+    # only the needed pairs are rewritten: Y unfolds as long as FACT recurses
+    FACT = lambda: (lambda Y, IS_ZERO, ONE, MUL, PRED: Y(
+        lambda f: lambda n: IS_ZERO(n)(ONE)(MUL(n)(f(PRED(n))))
+    ))(
+        lambda f: (lambda x: f(x(x)))(lambda x: f(x(x))),
+        lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )
+    fact5 = (APP, to_debruijn(lc(FACT)), church(5))
+    net = Net.from_term(fact5)
+    assert numeral(net.readback()) == 120
+    reducer = Reducer()
+    reducer.run(fact5)
+    print(f"FACT(5): {net.betas} betas, normal order {reducer.steps}")
+    assert net.betas < reducer.steps
+    # Ω rewrites forever
+    OMEGA = lambda: (lambda x: x(x))(lambda x: x(x))
+    try:
+        normalize(lc(OMEGA), limited(fuel=10_000))
+    except LimitExceeded as e:
+        print(f"Ω: {e}")
+    else:
+        raise AssertionError("Ω has no normal form")
+    results = list(normalize_many([lc(EXP), lc(PRED)], workers=2))
+    assert [to_debruijn(t) for t in results] == [church(27), church(3)]
+    print("All tests passed.")
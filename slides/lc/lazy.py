@@ -0,0 +1,98 @@
+from __future__ import annotations
+from typing import Callable
+
+_UNSET = object()
+
+class Thunk:
+    """A delayed argument, evaluated at most once.
+
+    Calling a thunk forces it and applies its value, so compiled code
+    calls its variables the same way whether they hold a thunk or not."""
+    __slots__ = ("code", "value")
+    code: Callable[[], object] | None
+    value: object
+    def __init__(self, code: Callable[[], object]):
+        self.code = code
+        self.value = _UNSET
+
+    def __repr__(self):
+        if self.value is _UNSET:
+            return "Thunk(<delayed>)"
+        return f"Thunk({self.value!r})"
+
+    def force(self):
+        if self.value is not _UNSET:
+            return self.value
+        # a thunk can evaluate to another thunk, as `lambda x: x` returns its argument
+        chain = [self]
+        value = self.code()  # type: ignore
+        while isinstance(value, Thunk):
+            if value.value is not _UNSET:
+                value = value.value
+                break
+            chain.append(value)
+            value = value.code()  # type: ignore
+        for thunk in chain:
+            thunk.value = value
+            thunk.code = None
+        return value
+
+    def __call__(self, *args):
+        return self.force()(*args)
+
+def force(value):
+    """The value of a thunk, anything else as is."""
+    return value.force() if isinstance(value, Thunk) else value
+
+def strict(f: Callable) -> Callable:
+    """A host function that receives forced arguments, like `inc`."""
+    return lambda x: f(force(x))
+
+# the names lazily compiled code refers to, see LambdaToAst(lazy=True)
+RUNTIME = {
+    "__thunk__": Thunk,
+}
+
+if __name__ == "__main__":
+    from .lc import lc
+    def inc(n):
+        return n + 1
+    # the plain Y combinator and eager Church booleans, no hand-made thunks
+    FACT = lambda: (lambda Y, TRUE, FALSE, ONE, MUL, PRED: (lambda IS_ZERO: Y(
+        lambda f: lambda n: IS_ZERO(n)(ONE)(MUL(n)(f(PRED(n))))
+    ))(lambda n: n(lambda x: FALSE)(TRUE)))(
+        lambda f: (lambda x: f(x(x)))(lambda x: f(x(x))),
+        lambda a: lambda b: a,
+        lambda a: lambda b: b,
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )
+    FIVE = lambda f: lambda x: f(f(f(f(f(x)))))
+    fact = lc(FACT)
+    try:
+        fact.eval(lc(FIVE), inc, 0)
+    except RecursionError:
+        print("FACT(FIVE) overflows when compiled strictly")
+    else:
+        raise AssertionError("the strict Y combinator does not terminate")
+    print(f"{fact.eval(lc(FIVE), inc, 0, backend='lazy') = }")
+    assert fact.eval(lc(FIVE), inc, 0, backend="lazy") == 120
+    # x is used three times, its argument runs once
+    calls = []
+    def tick(f):
+        calls.append(f)
+        return f
+    SHARED = lambda tick: (lambda x: x(x)(x))(tick(lambda y: y))
+    assert callable(lc(SHARED).eval(tick, backend="lazy"))
+    assert len(calls) == 1
+    # an unused argument is never evaluated
+    OMEGA = lambda: (lambda x: lambda y: x)(lambda v: v)((lambda x: x(x))(lambda x: x(x)))
+    assert lc(OMEGA).eval(0, backend="lazy") == 0
+    # the shared lowering delays the same arguments
+    from .lc import lc_to_ast
+    code = compile(lc_to_ast(fact, {}, lazy=True), "<lc>", "eval")
+    assert force(eval(code, dict(RUNTIME))(lc(FIVE).eval())(strict(inc))(0)) == 120
+    thunk = Thunk(lambda: Thunk(lambda: 42))
+    assert force(thunk) == 42 and thunk.code is None and force(7) == 7
+    print("All tests passed.")
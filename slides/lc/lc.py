@@ -1,14 +1,20 @@
 from __future__ import annotations
+from collections import OrderedDict
 from functools import wraps
 from ast import dump as ast_dump, iter_fields, parse
 import ast
 _Unparser = getattr(ast, "_Unparser")
 from inspect import getsource
 from textwrap import dedent
+from types import CodeType, ModuleType
+import os
+import copy
 from pprint import pp
-from typing import cast
-from .scope import Scope
+from typing import IO, TYPE_CHECKING, Iterator, cast
+from .scope import Scope, FlatScope
 from .pretty import Pretty
+if TYPE_CHECKING:
+    from .stats import Stats
 
 def dump(node):
     return ast_dump(node, indent=4)
@@ -34,7 +40,66 @@ def pretty(printer, obj, stream, indent, allowance, context, level):
     printer._format_namespace_items(items, stream, indent, allowance, context, level)
     stream.write(')')
 
-class Var(ast.expr, metaclass=Pretty):
+# pprint shows at most this many lines of a term
+PRETTY_LINES = 64
+
+def pretty_term(printer, obj, stream, indent, allowance, context, level):
+    """Format a term for pprint in λ notation, shared subterms as `let`s.
+
+    Bounded by the width and depth of the printer and PRETTY_LINES."""
+    from .printer import format_lines
+    cls_name = obj.__class__.__name__
+    indent += len(cls_name) + 1
+    width = max(printer._width - indent - allowance, 16)
+    lines = format_lines(obj, max_depth=printer._depth, max_width=width, max_lines=PRETTY_LINES)
+    stream.write(cls_name + "(")
+    stream.write(("\n" + " " * indent).join(lines))
+    stream.write(")")
+
+# repr of a term is cut after this many characters
+REPR_LIMIT = 1 << 16
+
+def node_repr(node, limit: int = REPR_LIMIT) -> str:
+    """repr of a term, built without recursion, cut after `limit` characters."""
+    out: list[str] = []
+    size = 0
+    todo: list = [node]
+    while todo:
+        item = todo.pop()
+        if type(item) is str:
+            piece = item
+        elif isinstance(item, Var):
+            piece = f"Var(name={item.name!r})"
+        elif isinstance(item, Lam):
+            todo += [")", item.body, ", body=", item.var]
+            piece = "Lam(var="
+        elif isinstance(item, App):
+            todo += [")", item.arg, ", arg=", item.func]
+            piece = "App(func="
+        else:
+            piece = repr(item)
+        out.append(piece)
+        size += len(piece)
+        if size > limit:
+            out.append("...")
+            break
+    return "".join(out)
+
+class Node(metaclass=Pretty):
+    """Base of the term nodes.
+
+    Nodes are compact `__slots__` objects rather than `ast.expr`
+    subclasses, so they carry no `__dict__` nor source locations. They
+    still speak enough of the `ast` protocol (`_fields`, `_attributes`)
+    for `ast.iter_fields` and `ast.NodeVisitor` to walk them; `lc_to_ast`
+    lowers them to real `ast` nodes when `compile` needs them.
+    """
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    _attributes: tuple[str, ...] = ()
+
+class Var(Node):
+    __slots__ = ("id", "name")
     _pretty_fields = ("name",)
     def __init__(self, id: int):
         self.id = id
@@ -51,67 +116,152 @@ class Var(ast.expr, metaclass=Pretty):
     def __pretty__(printer, self, stream, indent, allowance, context, level):
         pretty(printer, self, stream, indent, allowance, context, level)
 
-class Lam(ast.expr, metaclass=Pretty):
+class Lam(Node):
+    __slots__ = ("var", "body")
     _fields = ("var", "body")
     _pretty_fields = _fields
-    def __init__(self, var: Var, body: ast.expr):
+    def __init__(self, var: Var, body: Node | ast.expr):
         self.var = var
         self.body = body
 
     def __repr__(self):
-        return f"Lam(var={self.var!r}, body={self.body!r})"
+        return node_repr(self)
 
     def __str__(self):
         return unparse(self)
 
     @staticmethod
     def __pretty__(printer, self, stream, indent, allowance, context, level):
-        pretty(printer, self, stream, indent, allowance, context, level)
+        pretty_term(printer, self, stream, indent, allowance, context, level)
 
 
-class App(ast.expr, metaclass=Pretty):
+class App(Node):
+    __slots__ = ("func", "arg")
     _fields = ("func", "arg")
     _pretty_fields = _fields
-    def __init__(self, func: ast.expr, arg: ast.expr):
+    def __init__(self, func: Node | ast.expr, arg: Node | ast.expr):
         self.func = func
         self.arg = arg
 
     def __repr__(self):
-        return f"App(func={self.func!r}, arg={self.arg!r})"
+        return node_repr(self)
 
     def __str__(self):
         return unparse(self)
 
     @staticmethod
     def __pretty__(printer, self, stream, indent, allowance, context, level):
-        pretty(printer, self, stream, indent, allowance, context, level)
+        pretty_term(printer, self, stream, indent, allowance, context, level)
 
 class Term(ast.Expression, metaclass=Pretty):
     _pretty_fields = ("body",)
 
     def __repr__(self):
-        return repr(self.body)
+        return node_repr(self.body)
 
     def __str__(self):
         return str(self.body)
 
+    def __eq__(self, other):
+        if not isinstance(other, Term):
+            return NotImplemented
+        try:
+            return self.shared() is other.shared()
+        except TypeError:
+            # host expressions, like x + 1, have no shared node
+            return self.body is other.body
+
+    def __hash__(self):
+        try:
+            return hash(self.shared())
+        except TypeError:
+            return hash(id(self.body))
+
     @staticmethod
     def __pretty__(printer, self, stream, indent, allowance, context, level):
-        pretty(printer, self, stream, indent, allowance, context, level)
-
-    def compile(self):
-        code = compile(self, "<lc>", mode="eval")
-        return code
+        pretty_term(printer, self, stream, indent, allowance, context, level)
+
+    def shared(self):
+        """The hash-consed node of this term, the same for alpha-equivalent terms."""
+        from .hashcons import intern
+        cached = getattr(self, "_shared", None)
+        if cached is not None and cached[0] is self.body:
+            return cached[1]
+        node = intern(self.body)
+        self._shared = (self.body, node)
+        return node
+
+    def optimize(self, **options) -> Term:
+        """A term that does the same with fewer calls, see lc.optimize."""
+        from .optimize import optimize
+        return optimize(self, **options)
+
+    def compile(self, backend: str = "ast", optimize: bool = False, counted: bool = False):
+        """Compile to a code object that evaluates to the term as a Python function.
+
+        The "ast" backend goes through Python's ast and compiler, the
+        "closure" backend assembles the function from closure templates.
+        The "lazy" backend is the "ast" one with call-by-need arguments,
+        the "trampoline" backend runs in continuation-passing style on a
+        flat stack. Their code needs the globals `eval` below gives it.
+        With `optimize`, the default passes of lc.optimize run first.
+        With `counted`, the functions report their calls to a Stats, see
+        `eval`."""
+        term = self.optimize() if optimize else self
+        if counted:
+            return compile(term, "<lc>", mode="eval", backend=backend, counted=True)
+        return compile(term, "<lc>", mode="eval", backend=backend)
+
+    def eval(self, *args, env: dict | None = None, backend: str = "ast", optimize: bool = False,
+             stats: Stats | None = None):
+        """Compile, evaluate with `env` as globals, and apply to `args`.
+
+        Arguments and values of `env` that are Terms are compiled with the
+        same backend and `optimize`. With the "lazy" backend, other
+        callables are host functions, like `inc`, and get forced
+        arguments; the result is forced.
+
+        With `stats`, the code is compiled `counted`: every call of one of
+        its lambdas is a beta and runs the hooks. Host functions and the
+        forcing of thunks are not counted. The Stats of lc.limits.limited
+        therefore stop the code past its fuel or deadline; `max_nodes`
+        does not apply, and the LimitExceeded has no partial result, as
+        compiled code has no term to show. A RecursionError becomes a
+        LimitExceeded("recursion") too."""
+        from .cache import runtime
+        lazy = backend == "lazy"
+        if lazy:
+            from .lazy import force, strict
+        scope = dict(env or {})
+        def host(value):
+            if isinstance(value, Term):
+                return value.eval(env=env, backend=backend, optimize=optimize, stats=stats)
+            if lazy and callable(value):
+                return strict(value)
+            return value
+        for name, value in scope.items():
+            scope[name] = host(value)
+        scope.update(runtime(backend, stats))
+        try:
+            value = eval(self.compile(backend, optimize, counted=stats is not None), scope)
+            for arg in args:
+                value = force(value)(host(arg)) if lazy else value(host(arg))
+            return force(value) if lazy else value
+        except RecursionError:
+            if stats is None:
+                raise
+            from .limits import LimitExceeded
+            raise LimitExceeded("recursion", stats) from None
 
 class CreateLambdaTerm(ast.NodeVisitor):
     term: ast.expr
-    vars: Scope[str, Var]
+    vars: Scope[str, Var] | FlatScope[str, Var]
     max_var: int
     first: bool
     ast: ast.AST
     def __init__(self, vars=None):
         self.term = None  # type: ignore
-        self.vars = vars or Scope()
+        self.vars = vars or FlatScope()
         self.max_var = 0
         self.first = True
         self.ast = None  # type: ignore
@@ -149,6 +299,14 @@ class CreateLambdaTerm(ast.NodeVisitor):
         self.term = body
         self.vars.exit()
 
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        # def f(a): return e is the same as f = lambda a: e
+        match node.body:
+            case [ast.Return(value=ast.expr() as value)]:
+                self.visit_Lambda(ast.Lambda(args=node.args, body=value))
+            case _:
+                self.generic_visit(node)
+
     def visit_Name(self, node):
         # print(f"visit_Name({dump(node)})")
         if node.id in self.vars:
@@ -171,8 +329,32 @@ class CreateLambdaTerm(ast.NodeVisitor):
         ast.fix_missing_locations(self.term)
         return Term(body=self.term)
 
-def lc(f) -> Term:
-    """Convert a Python lambda function to a lambda calculus term."""
+def is_term(node) -> bool:
+    """Whether `node` is made only of Lam, App, Var and free names."""
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, Lam):
+            todo.append(node.body)
+        elif isinstance(node, App):
+            todo.append(node.func)
+            todo.append(node.arg)
+        elif not isinstance(node, (Var, ast.Name)):
+            return False
+    return True
+
+def mtime(filename: str) -> float | None:
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+# code object -> (mtime of its file, term), least recently used first
+_lc_cache: OrderedDict[CodeType, tuple[float | None, Term]] = OrderedDict()
+# conversions kept in _lc_cache
+LC_CACHE_SIZE = 1024
+
+def _lc(f) -> Term:
     src = dedent(getsource(f))
     tree = parse(src)
     visitor = CreateLambdaTerm()
@@ -181,115 +363,280 @@ def lc(f) -> Term:
     # print(visitor.vars)
     return visitor.result()
 
+def lc(f) -> Term:
+    """Convert a Python lambda function to a lambda calculus term.
+
+    Conversions are cached by code object until the source file changes,
+    the least recently used past LC_CACHE_SIZE of them are dropped.
+    Every call returns a new Term, but the nodes under it are shared."""
+    code = getattr(f, "__code__", None)
+    if code is None:
+        return _lc(f)
+    stamp = mtime(code.co_filename)
+    cached = _lc_cache.get(code)
+    if cached is None or cached[0] != stamp:
+        cached = _lc_cache[code] = (stamp, _lc(f))
+        while len(_lc_cache) > LC_CACHE_SIZE:
+            _lc_cache.popitem(last=False)
+    else:
+        _lc_cache.move_to_end(code)
+    return Term(body=cached[1].body)
+
+def lc_module(module: ModuleType) -> dict[str, Term]:
+    """Convert every top-level definition of a module that is a lambda term.
+
+    The source is parsed once. Covers `NAME = <expr>` and single-return
+    `def`s; when a name is defined several times, the last one wins, like
+    at runtime."""
+    tree = parse(getsource(module))
+    terms: dict[str, Term] = {}
+    for stmt in tree.body:
+        match stmt:
+            case ast.Assign(targets=[ast.Name(id=name)], value=value):
+                pass
+            case ast.FunctionDef(name=name):
+                value = stmt
+            case _:
+                continue
+        visitor = CreateLambdaTerm()
+        visitor.visit(value)
+        if is_term(visitor.term):
+            terms[name] = visitor.result()
+        else:
+            terms.pop(name, None)
+    return terms
+
 class Unparser(_Unparser):
     def traverse(self, node):
         if isinstance(node, (Lam, App, Var)):
-            method = "visit_" + node.__class__.__name__
-            visit = getattr(self, method)
-            visit(node)
-            return "".join(self._source)
+            self._source.extend(iter_unparse(node))
+            return
         return super().traverse(node)
 
-    def visit_Lam(self, node):
-        self.write("λ")
-        self.traverse(node.var)
-        self.write(".(")
+    def visit_Term(self, node):
         self.traverse(node.body)
-        self.write(")")
-
-    def visit_App(self, node):
-        self.traverse(node.func)
-        self.write("(")
-        self.traverse(node.arg)
-        self.write(")")
 
-    def visit_Var(self, node):
-        self.write(str(node))
-
-def unparse(term: ast.AST) -> str:
-    unparser = Unparser()
-    return unparser.visit(term)
-
-class LambdaToAst(ast.NodeVisitor):
+def iter_unparse(term: Term | Node, chunk_size: int = 1 << 16) -> Iterator[str]:
+    """Unparse a term into chunks of about `chunk_size` characters.
+
+    Uses an explicit stack, so the depth of the term does not matter."""
+    todo: list = [term.body if isinstance(term, Term) else term]
+    buffer: list[str] = []
+    size = 0
+    while todo:
+        item = todo.pop()
+        if type(item) is str:
+            piece = item
+        elif isinstance(item, Var):
+            piece = item.name
+        elif isinstance(item, Lam):
+            todo.append(")")
+            todo.append(item.body)
+            todo.append(".(")
+            todo.append(item.var)
+            piece = "λ"
+        elif isinstance(item, App):
+            todo.append(")")
+            todo.append(item.arg)
+            todo.append("(")
+            todo.append(item.func)
+            continue
+        elif isinstance(item, ast.Name):
+            piece = item.id
+        else:
+            piece = Unparser().visit(item)
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+def unparse(term: ast.AST | Node, stream: IO[str] | None = None) -> str:
+    """Print a term as λx0.(...), or write it to `stream` chunk by chunk."""
+    if isinstance(term, (Term, Node)):
+        chunks = iter_unparse(term)
+    else:
+        chunks = iter((Unparser().visit(term),))
+    if stream is None:
+        return "".join(chunks)
+    for chunk in chunks:
+        stream.write(chunk)
+    return ""
+
+_LOAD = ast.Load()
+_LOCATION = {"lineno": 1, "col_offset": 0, "end_lineno": 1, "end_col_offset": 0}
+
+def _name(id: str) -> ast.Name:
+    return ast.Name(id=id, ctx=_LOAD, **_LOCATION)
+
+def _lambda(param: str, body: ast.expr) -> ast.Lambda:
+    args = ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg(arg=param, **_LOCATION)],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+    return ast.Lambda(args=args, body=body, **_LOCATION)
+
+def _call(func: ast.expr, arg: ast.expr) -> ast.Call:
+    return ast.Call(func=func, args=[arg], keywords=[], **_LOCATION)
+
+def _is_counted(expr: ast.expr) -> bool:
+    return isinstance(expr, ast.Call) and isinstance(expr.func, ast.Name) and expr.func.id == "__counted__"
+
+def _delay(arg: ast.expr) -> ast.expr:
+    """`__thunk__(lambda: arg)`, unless arg is already a value."""
+    if isinstance(arg, (ast.Name, ast.Lambda, ast.Constant)) or _is_counted(arg):
+        return arg
+    args = ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[])
+    return _call(_name("__thunk__"), ast.Lambda(args=args, body=arg, **_LOCATION))
+
+class LambdaToAst(ast.NodeTransformer):
+    """Lower Lam, App and Var to ast.Lambda, ast.Call and ast.Name.
+
+    Terms are lowered in a single pass over an explicit stack into new
+    nodes, the term itself is never modified. With a `memo` dict, the term
+    is lowered from its hash-consed form instead and every shared subterm
+    is lowered once: binders are then named after their depth (x0 is the
+    outermost) so that a closed subterm can be reused at any depth.
+
+    With `lazy`, the code is call-by-need: every argument that is not
+    already a value is passed as a memoizing thunk, see lc.lazy. The code
+    then needs the names of lc.lazy.RUNTIME in its globals.
+
+    With `counted`, every lambda is wrapped as `__counted__(lambda x: ...)`,
+    see lc.stats.counting, for the code to report its calls.
+    """
     ast: ast.AST
-    first: bool
-    def __init__(self):
+    memo: dict | None
+    lazy: bool
+    counted: bool
+    def __init__(self, memo: dict | None = None, lazy: bool = False, counted: bool = False):
         self.ast = None  # type: ignore
-        self.first = True
+        self.memo = memo
+        self.lazy = lazy
+        self.counted = counted
 
-    def visit(self, node: ast.AST):
-        if self.first:
-            self.first = False
-            self.ast = node
-        return super().visit(node)
+    def function(self, param: str, body: ast.expr) -> ast.expr:
+        lam = _lambda(param, body)
+        return _call(_name("__counted__"), lam) if self.counted else lam
 
-    def update_parent(self, parent: ast.AST, child: ast.AST, field: str, index: int | None = None):
-        if field is not None:
-            if index is not None:
-                getattr(parent, field)[index] = child
-            else:
-                setattr(parent, field, child)
+    def visit(self, node):
+        # the outermost call gives the result, not the host expressions
+        # visited while lowering it
+        outermost = self.ast is None
+        if outermost:
+            self.ast = node
+        if isinstance(node, Term):
+            new = ast.Expression(body=self.lower(node.body))
+        elif isinstance(node, Node):
+            new = ast.Expression(body=self.lower(node))
+        else:
+            # other Python code that embeds terms, lowered in place
+            new = super().visit(node)
+        if outermost:
+            self.ast = new
+        return new
 
     def generic_visit(self, node):
-        # print(f"generic_visit({unparse(node)})")
         for field, value in iter_fields(node):
             if isinstance(value, list):
-                for index, item in enumerate(value):
-                    if isinstance(item, ast.AST):
-                        new = self.visit(item)
-                        if new is not None:
-                            # if we updated the child, update the parent
-                            # and only visit the new node
-                            self.update_parent(node, new, field=field, index=index)
-                            return self.generic_visit(new)
+                value[:] = [self.lower(item) if isinstance(item, Node) else
+                            self.visit(item) if isinstance(item, ast.AST) else item
+                            for item in value]
+            elif isinstance(value, Node):
+                setattr(node, field, self.lower(value))
             elif isinstance(value, ast.AST):
-                new = self.visit(value)
-                if new is not None:
-                    # if we updated the child, update the parent
-                    # and only visit the new node
-                    self.update_parent(node, new, field=field)
-                    return self.generic_visit(new)
-
-
-    def visit_Var(self, node: Var):
-        # print(f"visit_Var({node})")
-        new = ast.Name(id=node.name, ctx=ast.Load())
-        self.generic_visit(new)
-        return new
-
-    def visit_Lam(self, node: Lam):
-        # print(f"visit_Lam({node})")
-        new = ast.Lambda(
-            args=ast.arguments(
-                posonlyargs=[],
-                args=[ast.arg(arg=node.var.name)],
-                kwonlyargs=[],
-                kw_defaults=[],
-                defaults=[],
-            ),
-            body=node.body,
-        )
-        self.generic_visit(new)
-        return new
-
-    def visit_App(self, node: App):
-        # print(f"visit_App({node})")
-        new = ast.Call(
-            func=node.func,
-            args=[node.arg],
-            keywords=[],
-        )
-        self.generic_visit(new)
-        return new
+                setattr(node, field, self.visit(value))
+        return node
+
+    def lower(self, node: Node | ast.expr) -> ast.expr:
+        if self.memo is not None:
+            from .hashcons import intern
+            return self.lower_shared(intern(node))
+        out: list[ast.expr] = []
+        todo: list[tuple[object, bool]] = [(node, False)]
+        while todo:
+            n, ready = todo.pop()
+            if isinstance(n, Var):
+                out.append(_name(n.name))
+            elif isinstance(n, Lam):
+                if ready:
+                    out.append(self.function(n.var.name, out.pop()))
+                else:
+                    todo.append((n, True))
+                    todo.append((n.body, False))
+            elif isinstance(n, App):
+                if ready:
+                    arg = out.pop()
+                    if self.lazy:
+                        arg = _delay(arg)
+                    out.append(_call(out.pop(), arg))
+                else:
+                    todo.append((n, True))
+                    todo.append((n.arg, False))
+                    todo.append((n.func, False))
+            elif isinstance(n, ast.Name):
+                out.append(_name(n.id))
+            elif isinstance(n, ast.expr):
+                out.append(ast.fix_missing_locations(self.visit(copy.deepcopy(n))))
+            else:
+                raise TypeError(f"Cannot lower {n!r}")
+        return out[0]
+
+    def lower_shared(self, root, depth: int = 0) -> ast.expr:
+        from .debruijn import IDX, LAM, FREE
+        memo = cast(dict, self.memo)
+        out: list[ast.expr] = []
+        todo: list[tuple[object, int, bool]] = [(root, depth, False)]
+        while todo:
+            n, depth, ready = todo.pop()
+            if n.free == 0:  # type: ignore
+                depth = 0
+            key = (n, depth, self.lazy, self.counted)
+            if not ready:
+                expr = memo.get(key)
+                if expr is not None:
+                    out.append(expr)
+                    continue
+            tag = n.tag  # type: ignore
+            if tag == IDX:
+                expr = _name(f"x{depth - 1 - n.a}")  # type: ignore
+            elif tag == FREE:
+                expr = _name(n.a)  # type: ignore
+            elif not ready:
+                todo.append((n, depth, True))
+                if tag == LAM:
+                    todo.append((n.a, depth + 1, False))  # type: ignore
+                else:
+                    todo.append((n.b, depth, False))  # type: ignore
+                    todo.append((n.a, depth, False))  # type: ignore
+                continue
+            elif tag == LAM:
+                expr = self.function(f"x{depth}", out.pop())
+            else:
+                arg = out.pop()
+                if self.lazy:
+                    arg = _delay(arg)
+                expr = _call(out.pop(), arg)
+            memo[key] = expr
+            out.append(expr)
+        return out[0]
 
     def result(self) -> ast.Expression:
-        expr = cast(ast.Expression, self.ast)
-        ast.fix_missing_locations(expr)
-        return ast.Expression(body=expr.body)
+        return cast(ast.Expression, self.ast)
 
 
-def lc_to_ast(term: ast.AST) -> ast.Expression:
-    visitor = LambdaToAst()
+def lc_to_ast(term: ast.AST | Node, memo: dict | None = None, lazy: bool = False,
+              counted: bool = False) -> ast.Expression:
+    """Lower a term to a Python ast.Expression, leaving the term untouched."""
+    visitor = LambdaToAst(memo, lazy, counted)
+    if not isinstance(term, (Term, Node)):
+        term = copy.deepcopy(term)
     visitor.visit(term)
     res = visitor.result()
     return res
@@ -297,6 +644,9 @@ def lc_to_ast(term: ast.AST) -> ast.Expression:
 _compile = compile
 @wraps(_compile)
 def compile(obj, *args, **kwargs):
+    if isinstance(obj, (Term, Node)):
+        from .cache import COMPILE_CACHE
+        return COMPILE_CACHE.compile(obj, *args, **kwargs)
     if isinstance(obj, ast.AST):
         obj = lc_to_ast(obj)
     return _compile(obj, *args, **kwargs)
@@ -328,6 +678,7 @@ def test_front():
     assert_lc(f, "λx0.(λx1.(x0(x1)))")
     g = lambda x, y, z: x(y, z)
     assert_lc(g, "λx0.(λx1.(λx2.(x0(x1)(x2))))")
+    assert unparse(lc(g)) == "λx0.(λx1.(λx2.(x0(x1)(x2))))"
     print("Testing compilation...")
     h = lambda x, y, z: x(y, z)
     term = lc(h)
@@ -336,6 +687,59 @@ def test_front():
     tree = lc_to_ast(term)
     print(f"tree: {dump(tree)}")
 
+def test_cache():
+    print("Testing the lc cache...")
+    i = lambda x: x
+    assert lc(i) is not lc(i)
+    assert lc(i).body is lc(i).body
+    global LC_CACHE_SIZE
+    size, LC_CACHE_SIZE = LC_CACHE_SIZE, 2
+    try:
+        k = lambda x: lambda y: x
+        s = lambda x: lambda y: y
+        lc(k), lc(s)
+        assert len(_lc_cache) == 2 and i.__code__ not in _lc_cache
+    finally:
+        LC_CACHE_SIZE = size
+    import importlib.util, tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "defs.py")
+        with open(path, "w") as file:
+            file.write(dedent("""\
+                TRUE = lambda a: lambda b: a
+                ZERO = lambda f: lambda x: x
+                ZERO = lambda f: lambda x: x(f)
+                SUCC = lambda n: (lambda f: lambda x: f(n(f)(x)))
+                ONE = SUCC(ZERO)
+                def FALSE(a):
+                    return lambda b: b
+                inc = lambda x: x + 1
+            """))
+        spec = importlib.util.spec_from_file_location("defs", path)
+        module = importlib.util.module_from_spec(spec)  # type: ignore
+        spec.loader.exec_module(module)  # type: ignore
+        terms = lc_module(module)
+        print({name: str(term.body) for name, term in terms.items() if name != "ONE"})
+        assert list(terms) == ["TRUE", "ZERO", "SUCC", "ONE", "FALSE"]
+        assert str(terms["ZERO"]) == "λx0.(λx1.(x1(x0)))"
+        assert str(terms["FALSE"]) == "λx0.(λx1.(x1))"
+        assert unparse(terms["ONE"]) == "SUCC(ZERO)"
+
+def test_unparse():
+    print("Testing unparse on deep terms...")
+    import io
+    n = 100_000
+    body = Var(1)
+    for _ in range(n):
+        body = App(Var(0), body)
+    numeral = Term(body=Lam(Var(0), Lam(Var(1), body)))
+    src = unparse(numeral)
+    assert src == "λx0.(λx1.(" + "x0(" * n + "x1" + ")" * n + "))"
+    stream = io.StringIO()
+    unparse(numeral, stream)
+    assert stream.getvalue() == src
+    assert len(list(iter_unparse(numeral, chunk_size=1024))) > 1
+
 def compare_ast(term: ast.AST, expected: str):
     tree = lc_to_ast(term)
     src = unparse(tree)
@@ -347,8 +751,26 @@ def test_back():
     g = lambda x, y, z: x(y, z)
     term = lc(g)
     compare_ast(term, "lambda x0: lambda x1: lambda x2: x0(x1)(x2)")
+    body = term.body
+    compare_ast(term, "lambda x0: lambda x1: lambda x2: x0(x1)(x2)")
+    assert term.body is body, "lowering must not modify the term"
+    i = lambda x: (lambda y: y)((lambda y: y)(x))
+    compare_ast(lc(i), "lambda x0: (lambda x1: x1)((lambda x2: x2)(x0))")
+    # a host expression in the term is kept as it is
+    one = lambda f: f(1)
+    compare_ast(lc(one), "lambda x0: x0(1)")
+    assert eval(_compile(lc_to_ast(lc(one)), "<lc>", "eval"))(lambda n: n + 1) == 2
+    n = 100_000
+    deep = Var(0)
+    for _ in range(n):
+        deep = Lam(Var(0), deep)
+    assert isinstance(lc_to_ast(deep).body, ast.Lambda)
 
 if __name__ == "__main__":
-    test_front()
-    test_back()
+    # the printer and de Bruijn conversion know the classes of lc.lc, not of __main__
+    from . import lc as module
+    module.test_front()
+    module.test_back()
+    module.test_cache()
+    module.test_unparse()
     print("All tests passed.")
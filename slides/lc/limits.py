@@ -0,0 +1,227 @@
+from __future__ import annotations
+import ast
+import time
+from .lc import Term
+from .debruijn import Node, to_debruijn, from_debruijn
+from .stats import Stats
+
+class LimitExceeded(Exception):
+    """An evaluation ran out of fuel, time, memory or stack.
+
+    `partial` is the term as far as it got, when the evaluator can tell,
+    with the reductions done so far in place; it is a de Bruijn node that
+    may still hold the native values of arith. `stats` has the counters
+    at the time of the stop."""
+    limit: str
+    partial: Node | None
+    stats: Stats | None
+    elapsed: float | None
+    def __init__(self, limit: str, stats: Stats | None = None, elapsed: float | None = None,
+                 partial: Node | None = None):
+        self.limit = limit
+        self.stats = stats
+        self.elapsed = elapsed
+        self.partial = partial
+        super().__init__(limit)
+
+    def __str__(self):
+        detail = f" after {self.elapsed:.3f} s" if self.elapsed is not None else ""
+        if self.stats is not None:
+            detail += f", {self.stats}"
+        return f"{self.limit} limit exceeded{detail}"
+
+    def diagnostics(self) -> dict:
+        return {
+            "limit": self.limit,
+            "elapsed": self.elapsed,
+            "stats": self.stats.to_dict() if self.stats is not None else None,
+            "partial": self.partial is not None,
+        }
+
+    def term(self) -> Term | None:
+        """The partial result as a Term."""
+        if self.partial is None:
+            return None
+        from .arith import expand
+        return from_debruijn(expand(self.partial))
+
+class Limits:
+    """A `Stats` hook that stops an evaluation past its limits.
+
+    - fuel: steps (betas, deltas and interactions together)
+    - timeout: seconds of wall-clock time from `start`
+    - max_nodes: ceiling on the peak size, a proxy for memory: term
+      nodes for the reducers, live agents or nodes read back for inet
+
+    The clock starts at the first step, or at `start`, not when the
+    limits are made; fuel counts the steps from there, so a Stats that
+    already counted some can be reused.
+    """
+    fuel: int | None
+    timeout: float | None
+    max_nodes: int | None
+    started: float | None
+    spent: int
+    def __init__(self, fuel: int | None = None, timeout: float | None = None, max_nodes: int | None = None):
+        self.fuel = fuel
+        self.timeout = timeout
+        self.max_nodes = max_nodes
+        self.started = None
+        self.spent = 0
+
+    def __repr__(self):
+        return f"Limits(fuel={self.fuel}, timeout={self.timeout}, max_nodes={self.max_nodes})"
+
+    def start(self, stats: Stats | None = None):
+        """Start the clock, and the fuel from the steps `stats` counted."""
+        self.started = time.monotonic()
+        if stats is not None:
+            self.spent = _steps(stats)
+
+    def elapsed(self) -> float:
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    def __call__(self, kind: str, stats: Stats):
+        if self.started is None:
+            self.start(stats)
+            self.spent -= 1  # this step
+        if self.fuel is not None and _steps(stats) - self.spent > self.fuel:
+            raise LimitExceeded("fuel", stats, self.elapsed())
+        if self.max_nodes is not None and stats.peak_size > self.max_nodes:
+            raise LimitExceeded("memory", stats, self.elapsed())
+        if self.timeout is not None and self.elapsed() > self.timeout:
+            raise LimitExceeded("deadline", stats, self.elapsed())
+
+def _steps(stats: Stats) -> int:
+    return stats.betas + stats.deltas + stats.interactions
+
+def limited(fuel: int | None = None, timeout: float | None = None, max_nodes: int | None = None,
+            stats: Stats | None = None) -> Stats:
+    """`stats`, or new Stats, that raise LimitExceeded past the given limits.
+
+    Pass the result as the `stats` of any evaluator, or of Term.eval for
+    compiled code, where only fuel and timeout apply."""
+    stats = stats if stats is not None else Stats()
+    stats.on_step(Limits(fuel, timeout, max_nodes))
+    return stats
+
+METHODS = ("normal", "applicative", "head", "arith", "inet", "nbe", "krivine", "cek")
+
+def normalize(term: ast.AST | Node, method: str = "normal", fuel: int | None = None,
+              timeout: float | None = None, max_nodes: int | None = None,
+              stats: Stats | None = None) -> Term:
+    """Normalize with any evaluator, raising LimitExceeded past the limits.
+
+    A RecursionError, which the closure and arith evaluators can hit on
+    deep terms, is turned into LimitExceeded("recursion") too. Pass
+    `stats` to read the counters afterwards; the limits are only on it
+    for the time of the call."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    node = term if isinstance(term, tuple) else to_debruijn(term)
+    hooks = stats.hooks[:] if stats is not None else None
+    stats = limited(fuel, timeout, max_nodes, stats)
+    limits = stats.hooks[-1]
+    limits.start(stats)  # type: ignore
+    try:
+        if method == "arith":
+            from .arith import ArithReducer, recognize, expand
+            return from_debruijn(expand(ArithReducer("normal", stats).run(recognize(node))))
+        if method == "inet":
+            from .inet import reduce_node
+            return from_debruijn(reduce_node(node, stats))
+        if method == "nbe":
+            from .nbe import evaluate, readback
+            return readback(evaluate(node, stats=stats), stats)
+        if method == "krivine" or method == "cek":
+            from .machine import Machine
+            return from_debruijn(Machine("name" if method == "krivine" else "value", stats).normalize(node))
+        from .reduce import Reducer
+        return from_debruijn(Reducer(method, stats).run(node))
+    except RecursionError:
+        raise LimitExceeded("recursion", stats, limits.elapsed()) from None  # type: ignore
+    finally:
+        if hooks is not None:
+            stats.hooks = hooks
+
+if __name__ == "__main__":
+    from .lc import lc
+    # the evaluators raise the LimitExceeded of lc.limits, not of __main__
+    from .limits import LimitExceeded, normalize  # type: ignore
+    OMEGA = lambda: (lambda x: x(x))(lambda x: x(x))
+    Y_F = lambda f: (lambda x: f(x(x)))(lambda x: f(x(x)))
+    for method in METHODS:
+        # inet reduces Y f to a net that reads back as f(f(...)) forever
+        term = lc(Y_F) if method == "inet" else lc(OMEGA)
+        try:
+            normalize(term, method, fuel=100, timeout=5, max_nodes=1000)
+        except LimitExceeded as e:
+            print(f"{method}: {e}")
+            assert e.limit in ("fuel", "recursion", "memory") and e.stats is not None
+        else:
+            raise AssertionError("no normal form")
+    # the partial result keeps what was reduced: λf. f(f(f(...(Y f))))
+    try:
+        normalize(lc(Y_F), fuel=3)
+    except LimitExceeded as e:
+        print(f"partial: {e.term()}")
+        assert e.partial is not None and e.stats.betas == 4  # type: ignore
+        assert str(e.term()).startswith("λx0.(x0(x0(x0(")
+        print(e.diagnostics())
+    else:
+        raise AssertionError("Y f has no normal form")
+    # its normal order reduct keeps growing under the binder
+    GROW = lambda: (lambda x: x(x))(lambda x: lambda y: x(x)(y(y)))
+    try:
+        normalize(lc(GROW), max_nodes=100, timeout=5)
+    except LimitExceeded as e:
+        print(f"memory: {e}")
+        assert e.limit == "memory"
+    else:
+        raise AssertionError("expected a LimitExceeded")
+    try:
+        normalize(lc(OMEGA), timeout=0.05)
+    except LimitExceeded as e:
+        assert e.limit == "deadline" and e.elapsed >= 0.05  # type: ignore
+    else:
+        raise AssertionError("expected a LimitExceeded")
+    TWO = lambda f: lambda x: f(f(x))
+    assert str(normalize(lc(TWO), "arith", fuel=10)) == str(lc(TWO))
+    # the clock starts with the evaluation, not with the limits
+    ID_TWO = lambda: (lambda x: x)(lambda f: lambda x: f(f(x)))
+    early = limited(timeout=0.05)
+    time.sleep(0.1)
+    assert str(normalize(lc(ID_TWO), stats=early)) == str(lc(TWO))
+    # one Stats through many calls: the limits do not pile up
+    stats = Stats()
+    for _ in range(3):
+        normalize(lc(ID_TWO), fuel=1, stats=stats)
+    assert stats.hooks == [] and stats.betas == 3
+    # fuel counts from the first step, not from the steps counted before
+    used = Stats()
+    normalize(lc(ID_TWO), stats=used)
+    assert str(normalize(lc(ID_TWO), stats=limited(fuel=1, stats=used))) == str(lc(TWO))
+    try:
+        normalize(lc(OMEGA), fuel=10, stats=stats)
+    except LimitExceeded:
+        assert stats.hooks == []
+    else:
+        raise AssertionError("Ω has no normal form")
+    # compiled code: fuel, deadline, and the stack of the direct backends
+    from .cache import BACKENDS
+    for backend in BACKENDS:
+        try:
+            lc(OMEGA).eval(backend=backend, stats=limited(fuel=100))
+        except LimitExceeded as e:
+            assert e.limit == "fuel" and e.partial is None
+        else:
+            raise AssertionError("Ω has no value")
+        try:
+            lc(OMEGA).eval(backend=backend, stats=limited(timeout=0.05))
+        except LimitExceeded as e:
+            print(f"{backend}: {e}")
+            assert e.limit in ("deadline", "recursion")
+        else:
+            raise AssertionError("Ω has no value")
+    assert lc(TWO).eval(lambda n: n + 1, 0, backend="trampoline", stats=limited(fuel=10)) == 2
+    print("All tests passed.")
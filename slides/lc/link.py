@@ -0,0 +1,318 @@
+from __future__ import annotations
+import ast
+import linecache
+from types import CodeType, FunctionType, ModuleType
+from .lc import Var, Lam, App, Term, Node, CreateLambdaTerm, is_term, lc_module, mtime
+
+def _fix() -> Lam:
+    """Z = λf.(λx.f(λv.x(x)(v)))(λx.f(λv.x(x)(v))), the fixed point
+    combinator that also works call-by-value, so linked terms still run
+    on the eager backends."""
+    f, x, v = Var(0), Var(1), Var(2)
+    half = Lam(x, App(f, Lam(v, App(App(x, x), v))))
+    return Lam(f, App(half, half))
+
+FIX = _fix()
+
+# filename -> (mtime, line -> the lambdas and defs that start on it)
+_sources: dict[str, tuple[float | None, dict[int, list[ast.Lambda | ast.FunctionDef]]]] = {}
+
+def _functions(filename: str) -> dict[int, list[ast.Lambda | ast.FunctionDef]]:
+    stamp = mtime(filename)
+    cached = _sources.get(filename)
+    if cached is None or cached[0] != stamp:
+        linecache.checkcache(filename)
+        index: dict[int, list] = {}
+        try:
+            tree = ast.parse("".join(linecache.getlines(filename)))
+        except SyntaxError:
+            tree = ast.Module(body=[], type_ignores=[])
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Lambda):
+                index.setdefault(node.lineno, []).append(node)
+            elif isinstance(node, ast.FunctionDef):
+                line = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+                index.setdefault(line, []).append(node)
+        cached = _sources[filename] = (stamp, index)
+    return cached[1]
+
+def _code_names(code: CodeType) -> set[str]:
+    """Names a function reads from outside: globals and closure cells."""
+    names = set(code.co_names) | set(code.co_freevars)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _code_names(const) - set(code.co_varnames) - set(code.co_cellvars)
+    return names
+
+def free_names(node: Node) -> set[str]:
+    names = set()
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, Lam):
+            todo.append(node.body)
+        elif isinstance(node, App):
+            todo.append(node.func)
+            todo.append(node.arg)
+        elif isinstance(node, ast.Name):
+            names.add(node.id)
+    return names
+
+def _spans(code: CodeType) -> set[tuple[int, int, int, int]]:
+    """Where the instructions of `code` come from, without the ones the
+    compiler adds at column 0, like RESUME."""
+    return {position for position in code.co_positions()  # type: ignore
+            if None not in position and position[2:] != (0, 0)}
+
+def _body_span(node: ast.Lambda | ast.FunctionDef) -> tuple[int, int, int, int]:
+    """Where the value a function returns comes from: the body of a
+    lambda, the return statement of a def."""
+    body = node.body[-1] if isinstance(node, ast.FunctionDef) else node.body
+    return (body.lineno, body.end_lineno, body.col_offset, body.end_col_offset)  # type: ignore
+
+def source_term(f: FunctionType) -> Node | None:
+    """The term of the lambda or def that `f` was made from, or None.
+
+    Unlike `lc`, which converts the whole statement around a lambda, this
+    finds the lambda itself in the file: one that starts on the first line
+    of `f`'s code, with the same parameters and the same free names, and
+    whose body is where an instruction of `f` comes from, which tells
+    apart lambdas on the same line and nested ones. That is what makes
+    closures work, like ONE = SUCC(ZERO), whose code is the lambda inside
+    SUCC. When more than one lambda still fits, there is no telling
+    which: None."""
+    code = f.__code__
+    params = code.co_varnames[:code.co_argcount]
+    names = _code_names(code)
+    spans = _spans(code)
+    found = []
+    for node in _functions(code.co_filename).get(code.co_firstlineno, ()):
+        if tuple(arg.arg for arg in node.args.args) != params or _body_span(node) not in spans:
+            continue
+        visitor = CreateLambdaTerm()
+        visitor.visit(node)
+        if isinstance(node, ast.FunctionDef) and visitor.term is node:
+            continue  # not a single return
+        if is_term(visitor.term) and free_names(visitor.term) == names:  # type: ignore
+            found.append(visitor.term)
+    return found[0] if len(found) == 1 else None
+
+def _max_var(node: Node) -> int:
+    top = -1
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, Lam):
+            top = max(top, node.var.id)
+            todo.append(node.body)
+        elif isinstance(node, App):
+            todo.append(node.func)
+            todo.append(node.arg)
+    return top
+
+def _substitute(node: Node, values: dict[str, Node]) -> Node:
+    """A copy of `node` with the free names in `values` replaced."""
+    out: list[Node] = []
+    todo: list[tuple[object, bool]] = [(node, False)]
+    while todo:
+        n, ready = todo.pop()
+        if isinstance(n, Lam):
+            if ready:
+                out.append(Lam(n.var, out.pop()))
+            else:
+                todo.append((n, True))
+                todo.append((n.body, False))
+        elif isinstance(n, App):
+            if ready:
+                arg = out.pop()
+                out.append(App(out.pop(), arg))
+            else:
+                todo.append((n, True))
+                todo.append((n.arg, False))
+                todo.append((n.func, False))
+        elif isinstance(n, ast.Name):
+            out.append(values.get(n.id, n))
+        else:
+            out.append(n)  # type: ignore
+    return out[0]
+
+class Linker:
+    """Link Python functions into closed terms, one definition at a time.
+
+    A free name of a function is looked up in its closure cells, then in
+    its globals, as Python would at call time. A function found there is
+    linked in turn, once per Linker: every term that refers to it shares
+    the same node, so the terms of a program form one DAG. A function
+    that refers to itself is linked as FIX(λname.body). Names that are
+    not lambda terms, like `inc`, and names in larger cycles, like mutually
+    recursive definitions, stay free names. Term values are linked as
+    their body."""
+    linked: dict[int, Node | None]  # id of a value -> its linked node
+    values: dict[int, object]  # keeps the values alive, so ids are not reused
+    def __init__(self):
+        self.linked = {}
+        self.values = {}
+
+    def link(self, value) -> Term:
+        node = self.node(value)
+        if node is None:
+            raise TypeError(f"Not a lambda term: {value!r}")
+        return Term(body=node)
+
+    def node(self, root) -> Node | None:
+        """The linked node of a value, None if it is not a lambda term."""
+        active: set[int] = set()
+        sources: dict[int, tuple[Node, dict[str, object]]] = {}
+        todo: list[tuple[object, bool]] = [(root, False)]
+        while todo:
+            value, ready = todo.pop()
+            key = id(value)
+            if key in self.linked or key in active and not ready:
+                continue
+            if ready:
+                active.discard(key)
+                self.linked[key] = self._link(value, *sources.pop(key), active)
+                continue
+            self.values[key] = value
+            if isinstance(value, Term):
+                self.linked[key] = value.body  # type: ignore
+                continue
+            term = source_term(value) if isinstance(value, FunctionType) else None
+            if term is None:
+                self.linked[key] = None
+                continue
+            resolved = self._resolve(value, free_names(term))  # type: ignore
+            sources[key] = (term, resolved)
+            active.add(key)
+            todo.append((value, True))
+            todo.extend((dep, False) for dep in resolved.values())
+        return self.linked[id(root)]
+
+    @staticmethod
+    def _resolve(f: FunctionType, names: set[str]) -> dict[str, object]:
+        resolved: dict[str, object] = {}
+        cells = dict(zip(f.__code__.co_freevars, f.__closure__ or ()))
+        for name in names:
+            if name in cells:
+                try:
+                    resolved[name] = cells[name].cell_contents
+                except ValueError:  # an empty cell
+                    pass
+            elif name in f.__globals__:
+                resolved[name] = f.__globals__[name]
+        return resolved
+
+    def _link(self, f: FunctionType, term: Node, resolved: dict[str, object], active: set[int]) -> Node:
+        values: dict[str, Node] = {}
+        recursive = []
+        for name, value in resolved.items():
+            if value is f:
+                var = Var(_max_var(term) + 1)
+                values[name] = var
+                recursive.append((name, var))
+            elif id(value) not in active:
+                node = self.linked.get(id(value))
+                if node is not None:
+                    values[name] = node
+        node = _substitute(term, values)
+        for name, var in recursive:
+            node = App(FIX, Lam(var, node))
+        return node
+
+def link(f) -> Term:
+    """Convert a function and everything it refers to into a single term.
+
+    See Linker: free names are resolved through closures and globals,
+    self-recursion goes through FIX, names that cannot be linked stay
+    free."""
+    return Linker().link(f)
+
+def link_module(module: ModuleType) -> dict[str, Term]:
+    """Link the top-level lambda terms of a module, see `lc_module`.
+
+    Each name is linked from its current value, and all the terms share
+    the nodes of the definitions they have in common."""
+    linker = Linker()
+    terms: dict[str, Term] = {}
+    for name in lc_module(module):
+        node = linker.node(getattr(module, name, None))
+        if node is not None:
+            terms[name] = Term(body=node)
+    return terms
+
+if __name__ == "__main__":
+    import importlib.util
+    import os
+    import tempfile
+    from textwrap import dedent
+    from .lc import lc, unparse
+    from .debruijn import APP, church, to_debruijn
+    from .arith import numeral
+    from .limits import normalize
+    # check against the classes of lc.link, not of __main__
+    from .link import FIX, link, link_module, Linker  # type: ignore
+    ZERO = lambda f: lambda x: x
+    SUCC = lambda n: lambda f: lambda x: f(n(f)(x))
+    TWO = SUCC(SUCC(ZERO))
+    # lc converts the statement, link the closure and what its cells hold
+    assert unparse(lc(TWO)) == "λx0.(λx1.(λx2.(x1(x0(x1)(x2)))))"
+    assert numeral(to_debruijn(normalize(link(TWO)))) == 2
+    TRUE = lambda a: lambda b: a
+    FALSE = lambda a: lambda b: b
+    IS_ZERO = lambda n: n(lambda x: FALSE)(TRUE)
+    ONE = SUCC(ZERO)
+    MUL = lambda a: lambda b: lambda f: b(a(f))
+    PRED = lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u)
+    FACT = lambda n: IS_ZERO(n)(ONE)(MUL(n)(FACT(PRED(n))))
+    print(f"lc(FACT)   = {lc(FACT)}")
+    fact = link(FACT)
+    print(f"link(FACT) = {fact}")
+    assert not free_names(fact.body) and fact.body.func is FIX  # type: ignore
+    assert numeral(to_debruijn(normalize((APP, to_debruijn(fact), church(3)), "arith"))) == 6
+    def inc(x):
+        return x + 1
+    assert fact.eval(link(TWO), inc, 0, backend="lazy") == 2
+    # definitions are linked once and shared
+    linker = Linker()
+    one = linker.node(ONE)
+    assert linker.node(FACT) is linker.linked[id(FACT)] and one is linker.node(ONE)
+    todo: list = [linker.node(FACT)]
+    found = False
+    while todo and not found:
+        node = todo.pop()
+        found = node is one
+        todo += [node.body] if isinstance(node, Lam) else [node.func, node.arg] if isinstance(node, App) else []
+    assert found
+    # what is not a term, and larger cycles, stay names
+    COUNT = lambda n: n(inc)
+    assert str(link(COUNT)) == "λx0.(x0(inc))"
+    EVEN = lambda n: IS_ZERO(n)(TRUE)(ODD(PRED(n)))
+    ODD = lambda n: IS_ZERO(n)(FALSE)(EVEN(PRED(n)))
+    assert free_names(link(EVEN).body) == {"EVEN"}
+    # lambdas on one line are told apart by their columns
+    YES, NO = (lambda a: lambda b: a), (lambda a: lambda b: b)
+    assert str(link(YES)) == "λx0.(λx1.(x0))" and str(link(NO)) == "λx0.(λx1.(x1))"
+    K = lambda x: lambda y: x; I = lambda x: lambda y: y  # noqa: E702
+    assert str(link(K)) == "λx0.(λx1.(x0))" and str(link(I)) == "λx0.(λx1.(x1))"
+    SHADOW = lambda x: lambda x: x
+    assert str(link(SHADOW)) == "λx0.(λx1.(x1))" and str(link(SHADOW(0))) == "λx0.(x0)"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "defs.py")
+        with open(path, "w") as file:
+            file.write(dedent("""\
+                ZERO = lambda f: lambda x: x
+                SUCC = lambda n: lambda f: lambda x: f(n(f)(x))
+                ONE = SUCC(ZERO)
+                TWO = SUCC(ONE)
+                def inc(x):
+                    return x + 1
+            """))
+        spec = importlib.util.spec_from_file_location("defs", path)
+        module = importlib.util.module_from_spec(spec)  # type: ignore
+        spec.loader.exec_module(module)  # type: ignore
+        terms = link_module(module)
+        print({name: str(term) for name, term in terms.items()})
+        assert list(terms) == ["ZERO", "SUCC", "ONE", "TWO"]
+        assert terms["TWO"].body.body.body.arg.func.func is terms["ONE"].body  # type: ignore
+        assert numeral(to_debruijn(normalize(terms["TWO"]))) == 2
+    print("All tests passed.")
@@ -0,0 +1,263 @@
+from __future__ import annotations
+import ast
+from .lc import Node as NamedNode, Term
+from .debruijn import IDX, LAM, APP, FREE, Node, to_debruijn, from_debruijn
+from .nbe import Neutral
+from .stats import Stats
+
+# An environment is a linked list of frames, (value, rest) or None for
+# the empty one: extending it allocates one frame and shares the rest,
+# so closures made under the same binders share their environments.
+# Index i is the value i frames down.
+type Env = tuple | None
+
+class Closure:
+    """A term with the environment of its free indices.
+
+    Call-by-value closures are always abstractions. Under call-by-name,
+    arguments are closures of any term, evaluated when looked up."""
+    __slots__ = ("term", "env")
+    term: Node
+    env: Env
+    def __init__(self, term: Node, env: Env):
+        self.term = term
+        self.env = env
+
+    def __repr__(self):
+        return f"Closure({('IDX', 'LAM', 'APP', 'FREE')[self.term[0]]}, {'empty' if self.env is None else 'env'})"
+
+STRATEGIES = ("name", "value")
+
+# continuation frames of the CEK machine
+_ARG, _CALL = range(2)
+# readback operations
+_VALUE, _LAM, _SPINE = range(3)
+
+class Machine:
+    """An environment machine: a Krivine machine for call-by-name, a CEK
+    machine for call-by-value.
+
+    The state is explicit: the control, a term; its environment; and the
+    continuation, a stack of pending arguments (Krivine) or of frames
+    that evaluate an argument or call a function (CEK). Nothing recurses
+    in Python, so the depth of a term or of an evaluation is bounded by
+    memory only. `run` stops at weak head normal form; `normalize` then
+    reads the value back under binders, evaluating as it goes, for the
+    full normal form. `steps` counts machine transitions; pass `stats`
+    for betas, allocations, the deepest continuation and limits."""
+    strategy: str
+    steps: int
+    stats: Stats | None
+    def __init__(self, strategy: str = "value", stats: Stats | None = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.strategy = strategy
+        self.steps = 0
+        self.stats = stats
+
+    def run(self, term: Node, env: Env = None) -> Closure | Neutral:
+        """Evaluate to a value: an abstraction's closure, or a Neutral for
+        a free name or a variable of readback applied to arguments."""
+        if self.strategy == "name":
+            return self._krivine(term, env)
+        return self._cek(term, env)
+
+    def _krivine(self, term: Node, env: Env) -> Closure | Neutral:
+        stats = self.stats
+        stack: list[Closure | Neutral] = []  # arguments, the next one last
+        steps = 0
+        while True:
+            steps += 1
+            tag = term[0]
+            if tag == APP:
+                arg = term[2]
+                if arg[0] == IDX:  # type: ignore
+                    # pass what the variable holds, not a closure of it:
+                    # chains of those would make lookups ever longer
+                    frame = env
+                    for _ in range(arg[1]):  # type: ignore
+                        frame = frame[1]  # type: ignore
+                    stack.append(frame[0])  # type: ignore
+                else:
+                    stack.append(Closure(arg, env))  # type: ignore
+                    if stats is not None:
+                        stats.allocations += 1
+                term = term[1]  # type: ignore
+                if stats is not None:
+                    stats.depth(len(stack))
+            elif tag == LAM:
+                if not stack:
+                    value: Closure | Neutral = Closure(term, env)
+                    break
+                env = (stack.pop(), env)
+                term = term[1]  # type: ignore
+                if stats is not None:
+                    stats.betas += 1
+                    stats.allocations += 1
+                    stats.step("beta")
+            elif tag == IDX:
+                frame = env
+                for _ in range(term[1]):  # type: ignore
+                    frame = frame[1]  # type: ignore
+                found = frame[0]  # type: ignore
+                if type(found) is Closure:
+                    term, env = found.term, found.env
+                    continue
+                value = found
+                break
+            else:
+                value = Neutral(term[1])  # type: ignore
+                break
+        self.steps += steps
+        # stuck on a variable: the remaining arguments are its spine
+        while stack:
+            value = Neutral(value.head, (stack.pop(), value.spine), value.size + 1)  # type: ignore
+        return value
+
+    def _cek(self, term: Node, env: Env) -> Closure | Neutral:
+        stats = self.stats
+        kont: list[tuple] = []
+        steps = 0
+        while True:
+            steps += 1
+            tag = term[0]
+            if tag == APP:
+                # the function first, then the argument, as Python does
+                kont.append((_ARG, term[2], env))
+                term = term[1]  # type: ignore
+                if stats is not None:
+                    stats.depth(len(kont))
+                continue
+            if tag == LAM:
+                value: Closure | Neutral = Closure(term, env)
+                if stats is not None:
+                    stats.allocations += 1
+            elif tag == IDX:
+                frame = env
+                for _ in range(term[1]):  # type: ignore
+                    frame = frame[1]  # type: ignore
+                value = frame[0]  # type: ignore
+            else:
+                value = Neutral(term[1])  # type: ignore
+            # return `value` to the continuation
+            while True:
+                if not kont:
+                    self.steps += steps
+                    return value
+                steps += 1
+                frame = kont.pop()
+                if frame[0] == _ARG:
+                    kont.append((_CALL, value))
+                    term, env = frame[1], frame[2]
+                    break
+                func = frame[1]
+                if type(func) is Closure:
+                    env = (value, func.env)
+                    term = func.term[1]
+                    if stats is not None:
+                        stats.betas += 1
+                        stats.allocations += 1
+                        stats.step("beta")
+                    break
+                value = Neutral(func.head, (value, func.spine), func.size + 1)
+
+    def normalize(self, term: Node) -> Node:
+        """The normal form of a closed term, as a de Bruijn node.
+
+        Abstractions are read back by running their body on a Neutral for
+        the bound variable; arguments of a Neutral are read back in turn.
+        Under call-by-name, that evaluates the arguments left unevaluated,
+        and this is normal order reduction."""
+        out: list[Node] = []
+        todo: list[tuple] = [(_VALUE, self.run(term), 0)]
+        while todo:
+            op, x, level = todo.pop()
+            if op == _VALUE:
+                if type(x) is Closure and x.term[0] != LAM:
+                    x = self.run(x.term, x.env)
+                if type(x) is Closure:
+                    todo.append((_LAM, None, level))
+                    todo.append((_VALUE, self.run(x.term[1], (Neutral(level), x.env)), level + 1))
+                else:
+                    head = x.head
+                    out.append((FREE, head) if isinstance(head, str) else (IDX, level - head - 1))
+                    todo.append((_SPINE, x.size, level))
+                    for arg in x.args()[::-1]:
+                        todo.append((_VALUE, arg, level))
+            elif op == _LAM:
+                out.append((LAM, out.pop()))
+            else:
+                start = len(out) - x
+                args = out[start:]
+                del out[start:]
+                node = out.pop()
+                for arg in args:
+                    node = (APP, node, arg)
+                out.append(node)
+        return out[0]
+
+def _node(term: ast.AST | NamedNode | Node) -> Node:
+    if isinstance(term, NamedNode):
+        term = Term(body=term)
+    return term if isinstance(term, tuple) else to_debruijn(term)
+
+def evaluate(term: ast.AST | NamedNode | Node, strategy: str = "value", stats: Stats | None = None) -> Closure | Neutral:
+    """Weak head normal form of a closed term on the machine."""
+    return Machine(strategy, stats).run(_node(term))
+
+def normalize(term: ast.AST | NamedNode | Node, strategy: str = "value", stats: Stats | None = None) -> Term:
+    """Normal form of a closed term on the machine, see Machine.normalize."""
+    return from_debruijn(Machine(strategy, stats).normalize(_node(term)))
+
+if __name__ == "__main__":
+    from .lc import lc
+    from .debruijn import church
+    from .arith import numeral
+    from .limits import LimitExceeded, limited
+    # check against the classes of lc.machine, not of __main__
+    from .machine import Closure, Machine  # type: ignore
+    I = (LAM, (IDX, 0))
+    machine = Machine("value")
+    assert isinstance(machine.run((APP, I, I)), Closure) and machine.steps == 6
+    machine = Machine("name")
+    assert isinstance(machine.run((APP, I, I)), Closure) and machine.steps == 4
+    FACT = lambda: (lambda Z, IS_ZERO, ONE, MUL, PRED: Z(
+        lambda f: lambda n: IS_ZERO(n)(lambda _: ONE)(lambda _: MUL(n)(f(PRED(n))))(lambda i: i)
+    ))(
+        lambda f: (lambda x: f(lambda v: x(x)(v)))(lambda x: f(lambda v: x(x)(v))),
+        lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )
+    fact5 = (APP, to_debruijn(lc(FACT)), church(5))
+    for strategy in STRATEGIES:
+        stats = Stats()
+        machine = Machine(strategy, stats)
+        assert numeral(machine.normalize(fact5)) == 120
+        print(f"FACT(5) by {strategy}: {machine.steps} steps, {stats}")
+    # call-by-name skips an unused Ω, call-by-value does not
+    OMEGA = (APP, (LAM, (APP, (IDX, 0), (IDX, 0))), (LAM, (APP, (IDX, 0), (IDX, 0))))
+    K_I_OMEGA = (APP, (APP, (LAM, (LAM, (IDX, 1))), I), OMEGA)
+    assert normalize(K_I_OMEGA, "name") == from_debruijn(I)
+    try:
+        normalize(K_I_OMEGA, "value", limited(fuel=1_000))
+    except LimitExceeded as e:
+        assert e.limit == "fuel"
+    else:
+        raise AssertionError("Ω has no value")
+    # free names stay, applied to their arguments
+    TWO = lambda f: lambda x: f(f(x))
+    assert normalize(lc(TWO), "value") == lc(TWO)
+    assert str(normalize((APP, (FREE, "f"), (APP, I, (FREE, "y"))), "name")) == "f(y)"
+    # deep: 2^17 successors of zero, and a numeral as big
+    n = 1 << 17
+    succ = (LAM, (LAM, (LAM, (APP, (IDX, 1), (APP, (APP, (IDX, 2), (IDX, 1)), (IDX, 0))))))
+    node: Node = church(0)
+    for _ in range(n):
+        node = (APP, succ, node)
+    for strategy in STRATEGIES:
+        machine = Machine(strategy)
+        assert numeral(machine.normalize(node)) == n
+        print(f"SUCC^{n}(0) by {strategy}: {machine.steps} steps")
+    print("All tests passed.")
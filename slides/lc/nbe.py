@@ -0,0 +1,194 @@
+from __future__ import annotations
+import ast
+from .lc import Node as NamedNode, Lam, App, Term
+from .debruijn import IDX, LAM, APP, FREE, Node, from_debruijn
+from .hashcons import intern
+from .closures import builder
+from .stats import Stats, nodes
+
+class Neutral:
+    """A value stuck on a variable: the variable applied to arguments.
+
+    Readback feeds these to functions to look inside them. `head` is the
+    level of a bound variable, counted from the outermost binder, or the
+    name of a free one; `spine` links the arguments, last one first."""
+    __slots__ = ("head", "spine", "size")
+    head: int | str
+    spine: tuple | None
+    size: int
+    def __init__(self, head: int | str, spine: tuple | None = None, size: int = 0):
+        self.head = head
+        self.spine = spine
+        self.size = size
+
+    def __call__(self, *args):
+        # a thunk forced on a variable, as in `a()` of the lazy booleans
+        neutral = self
+        for arg in args:
+            neutral = Neutral(neutral.head, (arg, neutral.spine), neutral.size + 1)
+        return neutral
+
+    def __repr__(self):
+        return f"Neutral({self.head!r}, {self.size} args)"
+
+    def args(self) -> list:
+        args = []
+        spine = self.spine
+        while spine is not None:
+            args.append(spine[0])
+            spine = spine[1]
+        args.reverse()
+        return args
+
+class _Scope(dict):
+    # names that are not given read back as free names
+    def __missing__(self, name: str) -> Neutral:
+        return Neutral(name)
+
+def _host_names(term: Term) -> set[str]:
+    """The names a term with host expressions reads, in them too."""
+    names: set[str] = set()
+    todo: list = [term.body]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, Lam):
+            todo.append(node.body)
+        elif isinstance(node, App):
+            todo.append(node.func)
+            todo.append(node.arg)
+        elif isinstance(node, ast.AST):
+            names.update(n.id for n in ast.walk(node) if isinstance(n, ast.Name))
+    return names
+
+def evaluate(term: ast.AST | NamedNode | Node, env: dict | None = None, stats: Stats | None = None):
+    """Run a closed term as Python closures; names missing from `env` stay free.
+
+    A term that embeds Python code, like x + 1, has no closure template:
+    it runs as the ast backend compiles it."""
+    if isinstance(term, NamedNode):
+        term = Term(body=term)
+    try:
+        root = term.shared() if isinstance(term, Term) else intern(term)
+    except TypeError:
+        if not isinstance(term, Term):
+            raise
+        from .cache import runtime
+        scope = {name: Neutral(name) for name in _host_names(term)}
+        scope.update(env or {})
+        scope.update(runtime("ast", stats))
+        return eval(term.compile(counted=stats is not None), scope)
+    if root.free:
+        raise ValueError("Cannot evaluate a term with unbound de Bruijn indices")
+    return builder(root, _Scope(env or {}), stats)(None)
+
+def force(value):
+    """Call zero-argument thunks until something else comes out."""
+    while True:
+        code = getattr(value, "__code__", None)
+        if code is None or code.co_argcount or code.co_flags & 0x04:  # CO_VARARGS
+            return value
+        value = value()
+
+_VALUE, _LAM, _SPINE = range(3)
+
+def reify(value, stats: Stats | None = None) -> Node:
+    """The de Bruijn normal form of a value made of one-argument functions."""
+    out: list[Node] = []
+    todo: list[tuple] = [(_VALUE, value, 0)]
+    while todo:
+        if stats is not None:
+            stats.depth(len(todo) + len(out))
+        op, x, level = todo.pop()
+        if op == _VALUE:
+            x = force(x)
+            if isinstance(x, Neutral):
+                head = x.head
+                out.append((FREE, head) if isinstance(head, str) else (IDX, level - head - 1))
+                todo.append((_SPINE, x.size, level))
+                for arg in reversed(x.args()):
+                    todo.append((_VALUE, arg, level))
+            elif callable(x):
+                todo.append((_LAM, None, level))
+                todo.append((_VALUE, x(Neutral(level)), level + 1))
+            else:
+                raise TypeError(f"Cannot read back {x!r}, it is not a lambda term")
+        elif op == _LAM:
+            out.append((LAM, out.pop()))
+        else:
+            start = len(out) - x
+            args = out[start:]
+            del out[start:]
+            node = out.pop()
+            for arg in args:
+                node = (APP, node, arg)
+            out.append(node)
+    if stats is not None:
+        stats.size(len(nodes(out[0])))
+    return out[0]
+
+def readback(value, stats: Stats | None = None) -> Term:
+    """Read a Python function back as a normal-form Term.
+
+    Works on any function that only applies its argument and returns
+    functions, like the compiled terms and the definitions of the slides,
+    thunks included."""
+    return from_debruijn(reify(value, stats))
+
+def normalize(term: ast.AST | NamedNode | Node, env: dict | None = None, stats: Stats | None = None) -> Term:
+    """Normal form of `term`, by evaluation and readback."""
+    return readback(evaluate(term, env, stats), stats)
+
+if __name__ == "__main__":
+    import time
+    from .lc import lc
+    from .debruijn import to_debruijn, church
+    from .reduce import Reducer
+    from .arith import numeral
+    TWO = lambda f: lambda x: f(f(x))
+    K_FREE = lambda x: lambda y: x(d)
+    assert str(normalize(lc(TWO))) == str(lc(TWO))
+    assert to_debruijn(normalize(lc(K_FREE))) == to_debruijn(lc(K_FREE))
+    # live closures, with the lazy booleans and Z of slide_05
+    def TRUE(a):
+        return lambda b: a()
+    def FALSE(a):
+        return lambda b: b()
+    ONE = lambda f: lambda x: f(x)
+    FIVE = lambda f: lambda x: f(f(f(f(f(x)))))
+    MUL = lambda a: lambda b: lambda f: b(a(f))
+    PRED = lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u)
+    IS_ZERO = lambda n: n(lambda f: FALSE)(TRUE)
+    Z = lambda f: (lambda x: f(lambda v: x(x)(v)))(lambda x: f(lambda v: x(x)(v)))
+    FACT = Z(lambda f: lambda n: IS_ZERO(n)(lambda: ONE)(lambda: MUL(n)(f(PRED(n)))))
+    assert reify(FACT(FIVE)) == church(120)
+    print(f"TRUE = {readback(TRUE)}")
+    assert reify(TRUE) == (LAM, (LAM, (IDX, 1)))
+    assert reify(lambda: TWO) == church(2)
+    try:
+        readback(lambda x: x + 1)
+    except TypeError as e:
+        print(f"TypeError: {e}")
+    else:
+        raise AssertionError("expected a TypeError")
+    # 2^12 has a big normal form: evaluation against substitution
+    EXP = lambda: (lambda a: lambda b: b(a))(lambda f: lambda x: f(f(x)))(lambda f: lambda x: f(f(f(f(f(f(f(f(f(f(f(f(x)))))))))))))
+    start = time.perf_counter()
+    node = reify(evaluate(lc(EXP)))
+    fast = time.perf_counter() - start
+    start = time.perf_counter()
+    assert numeral(Reducer().run(to_debruijn(lc(EXP)))) == numeral(node) == 4096
+    slow = time.perf_counter() - start
+    print(f"EXP(TWO)(TWELVE): nbe {fast:.4f} s, substitution {slow:.4f} s")
+    # host expressions run as compiled Python
+    APPLY_ONE = lambda f: lambda x: f(x)(1)
+    assert evaluate(lc(APPLY_ONE))(lambda a: lambda b: a + b)(2) == 3
+    DROP_ONE = lambda x: k(x)(1)
+    assert str(normalize(lc(DROP_ONE), {"k": lambda a: lambda b: a})) == "λx0.(x0)"
+    # names missing from env stay free
+    FREE_ONE = lambda x: k(h)(1)
+    assert str(normalize(lc(FREE_ONE), {"k": lambda a: lambda b: a})) == "λx0.(h)"
+    stats = Stats()
+    assert to_debruijn(normalize(lc(TWO), stats=stats)) == church(2)
+    print(stats)
+    assert stats.betas == 2 and stats.max_depth > 0
+    print("All tests passed.")
@@ -0,0 +1,230 @@
+from __future__ import annotations
+import ast
+import time
+from typing import Callable, NamedTuple
+from .lc import Node as NamedNode, Term
+from .debruijn import IDX, LAM, APP, FREE, Node, to_debruijn, from_debruijn, shift, instantiate
+from .hashcons import intern
+from .stats import occurrences
+
+# A pass rewrites one node whose children are already rewritten, and
+# returns it unchanged when it does not apply. Passes only ever substitute
+# values, so they are safe for the strict backends; with strict=False,
+# they also assume that evaluating an argument has no effect but its
+# value, as the reducers do.
+type Rule = Callable[[Node], Node]
+
+class PassReport(NamedTuple):
+    name: str
+    round: int
+    seconds: float
+    before: int  # size of the term, as a tree
+    after: int
+
+def is_value(node: Node) -> bool:
+    """Whether evaluating `node` is immediate: a variable, a free name, an
+    abstraction, or an abstraction applied to fewer values than it has
+    binders."""
+    args = 0
+    while node[0] == APP:
+        if node[2][0] == APP:  # type: ignore
+            return False
+        node = node[1]  # type: ignore
+        args += 1
+    if args == 0:
+        return True
+    while args >= 0:
+        if node[0] != LAM:
+            return False
+        node = node[1]  # type: ignore
+        args -= 1
+    return True
+
+def rewrite(node: Node, rule: Rule) -> Node:
+    """Apply `rule` bottom-up to every abstraction and application, once.
+
+    Unchanged subterms are shared with the input, and a subterm shared
+    in the input is rewritten once."""
+    done: dict[int, Node] = {}
+    todo: list[tuple[Node, bool]] = [(node, False)]
+    while todo:
+        n, ready = todo.pop()
+        if id(n) in done:
+            continue
+        tag = n[0]
+        if tag == LAM:
+            if not ready:
+                todo.append((n, True))
+                todo.append((n[1], False))  # type: ignore
+                continue
+            body = done[id(n[1])]
+            done[id(n)] = rule(n if body is n[1] else (LAM, body))
+        elif tag == APP:
+            if not ready:
+                todo.append((n, True))
+                todo.append((n[2], False))  # type: ignore
+                todo.append((n[1], False))  # type: ignore
+                continue
+            func = done[id(n[1])]
+            arg = done[id(n[2])]
+            done[id(n)] = rule(n if func is n[1] and arg is n[2] else (APP, func, arg))
+        else:
+            done[id(n)] = n
+    return done[id(node)]
+
+def eta(strict: bool = True, **_) -> Rule:
+    """λx.M(x) → M when x is not free in M. With `strict`, only when M is
+    a value: eta-reducing λv.x(x)(v) in Z would make it loop."""
+    def rule(n: Node) -> Node:
+        if n[0] != LAM:
+            return n
+        body = n[1]
+        if body[0] != APP or body[2][0] != IDX or body[2][1] != 0:  # type: ignore
+            return n
+        func = body[1]  # type: ignore
+        if strict and not is_value(func) or occurrences(func):
+            return n
+        return shift(func, -1)
+    return rule
+
+def dead(strict: bool = True, **_) -> Rule:
+    """(λx.B)(A) → B when x is not used in B. With `strict`, only when A is
+    a value, whose evaluation cannot be skipped by mistake."""
+    def rule(n: Node) -> Node:
+        if n[0] != APP or n[1][0] != LAM:  # type: ignore
+            return n
+        body = n[1][1]  # type: ignore
+        if strict and not is_value(n[2]) or occurrences(body):  # type: ignore
+            return n
+        return shift(body, -1)
+    return rule
+
+def contract(**_) -> Rule:
+    """(λx.B)(A) → B[x:=A] when A is a value and copying it costs nothing:
+    A is a variable or a free name, or x is used once."""
+    def rule(n: Node) -> Node:
+        if n[0] != APP or n[1][0] != LAM:  # type: ignore
+            return n
+        body, arg = n[1][1], n[2]  # type: ignore
+        if arg[0] == IDX or arg[0] == FREE or is_value(arg) and occurrences(body) == 1:
+            return instantiate(body, arg)
+        return n
+    return rule
+
+def inline(inline_size: int = 16, **_) -> Rule:
+    """(λx.B)(C) → B[x:=C] when C is a small combinator: a closed
+    abstraction of at most `inline_size` nodes."""
+    def rule(n: Node) -> Node:
+        if n[0] != APP or n[1][0] != LAM or n[2][0] != LAM:  # type: ignore
+            return n
+        shared = intern(n[2])
+        if shared.free or shared.size > inline_size:
+            return n
+        return instantiate(n[1][1], n[2])  # type: ignore
+    return rule
+
+PASSES: dict[str, Callable[..., Rule]] = {
+    "dead": dead,
+    "contract": contract,
+    "inline": inline,
+    "eta": eta,
+}
+PIPELINE = tuple(PASSES)
+
+def optimize(term: ast.AST | Node, passes: tuple[str, ...] = PIPELINE, rounds: int = 4,
+             strict: bool = True, inline_size: int = 16, report: list[PassReport] | None = None) -> Term:
+    """Run `passes` over a term, in order, until nothing changes or for
+    `rounds` rounds.
+
+    The result does the same with fewer calls: definitions bound by
+    let-style redexes are inlined into their uses, unused ones dropped,
+    and eta-expanded wrappers removed. Pass a list as `report` to get a
+    PassReport per pass run. A term that embeds Python code, like x + 1,
+    has no de Bruijn form and comes back as it is."""
+    unknown = [name for name in passes if name not in PASSES]
+    if unknown:
+        raise ValueError(f"Unknown passes {unknown}, expected some of {PIPELINE}")
+    rules = [(name, PASSES[name](strict=strict, inline_size=inline_size)) for name in passes]
+    try:
+        node = term if isinstance(term, tuple) else to_debruijn(term)
+    except TypeError:
+        if isinstance(term, Term):
+            return term
+        if isinstance(term, NamedNode):
+            return Term(body=term)
+        raise
+    for i in range(rounds):
+        start = node
+        for name, rule in rules:
+            if report is None:
+                node = rewrite(node, rule)
+                continue
+            before = intern(node).size
+            clock = time.perf_counter()
+            node = rewrite(node, rule)
+            seconds = time.perf_counter() - clock
+            report.append(PassReport(name, i, seconds, before, intern(node).size))
+        if node is start:
+            break
+    return from_debruijn(node)
+
+if __name__ == "__main__":
+    import sys
+    from .lc import lc, unparse
+    from .debruijn import church
+    from .arith import numeral
+    IF = lambda c: lambda a: lambda b: c(a)(b)
+    # c(a) could loop when c is unknown, only a lazy caller may eta-reduce it
+    assert optimize(lc(IF)) == lc(IF)
+    assert unparse(optimize(lc(IF), strict=False)) == "λx0.(x0)"
+    # Z's inner λv.x(x)(v) is not a value, strict eta leaves it alone
+    Z = lambda f: (lambda x: f(lambda v: x(x)(v)))(lambda x: f(lambda v: x(x)(v)))
+    assert optimize(lc(Z)) == lc(Z)
+    assert unparse(optimize(lc(Z), strict=False)) == "λx0.(λx1.(x0(x1(x1)))(λx2.(x0(x2(x2)))))"
+    # unused values go, unused computations stay when strict
+    DROP_VALUE = lambda y: (lambda x: y)(lambda z: z)
+    DROP_CALL = lambda y: (lambda x: y)(y(y))
+    assert unparse(optimize(lc(DROP_VALUE))) == "λx0.(x0)"
+    assert unparse(optimize(lc(DROP_CALL))) == "λx0.(λx1.(x0)(x0(x0)))"
+    assert unparse(optimize(lc(DROP_CALL), strict=False)) == "λx0.(x0)"
+    # a let-style program: the definitions are inlined, the strict branches stay delayed
+    FACT = lambda: (lambda Z, IS_ZERO, ONE, MUL, PRED: Z(
+        lambda f: lambda n: IS_ZERO(n)(lambda _: ONE)(lambda _: MUL(n)(f(PRED(n))))(lambda i: i)
+    ))(
+        lambda f: (lambda x: f(lambda v: x(x)(v)))(lambda x: f(lambda v: x(x)(v))),
+        lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )
+    report: list[PassReport] = []
+    fact = optimize(lc(FACT), report=report)
+    for r in report:
+        print(f"round {r.round} {r.name:<9} {r.before:>4} -> {r.after:>4} nodes {r.seconds * 1e3:.3f} ms")
+    print(f"FACT: {fact}")
+    assert report[-1].after < report[0].before
+
+    def calls(term: Term) -> tuple[int, int]:
+        count = 0
+        def profile(frame, event, arg):
+            nonlocal count
+            count += event == "call"
+        value = eval(term.compile(), {})
+        five = eval(from_debruijn(church(5)).compile(), {})
+        sys.setprofile(profile)
+        try:
+            result = value(five)(lambda n: n + 1)(0)
+        finally:
+            sys.setprofile(None)
+        return result, count
+    before, after = calls(lc(FACT)), calls(fact)
+    print(f"FACT(5): {before[1]} calls, optimized {after[1]} calls")
+    assert before[0] == after[0] == 120 and after[1] < before[1]
+    assert lc(FACT).eval(from_debruijn(church(4)), lambda n: n + 1, 0, optimize=True) == 24
+    assert numeral(to_debruijn(optimize(from_debruijn(church(100_000))))) == 100_000
+    # host expressions are left alone
+    G = lambda f: lambda x: f(x + 1)
+    g = lc(G)
+    assert optimize(g) is g.optimize() is g
+    assert lc(G).eval(lambda n: n * 2, 3, optimize=True) == lc(G).eval(lambda n: n * 2, 3)
+    print("All tests passed.")
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import ast
+import re
+from itertools import chain
+from typing import IO, Iterable, Iterator
+from .lc import Var, Lam, App, Term
+
+# A token is one of λ \ . ( ) or a newline, or a name: any other run of
+# non-blank characters, so free names like `inc` read back as they print.
+_TOKEN = re.compile(r"[ \t\r\f\v]*([λ\\.()\n]|[^ \t\r\f\v\nλ\\.()]+)")
+_PUNCTUATION = frozenset("λ\\.()\n")
+_LOAD = ast.Load()
+
+SYNTAXES = ("lc", "light")
+
+def _chunks(source: str | IO[str] | Iterable[str], size: int = 1 << 16) -> Iterator[str]:
+    if isinstance(source, str):
+        yield source
+    elif hasattr(source, "read"):
+        while chunk := source.read(size):  # type: ignore
+            yield chunk
+    else:
+        yield from source
+
+def tokens(source: str | IO[str] | Iterable[str]) -> Iterator[tuple[str, list[str]]]:
+    """(text, tokens) of every chunk of a string, a text file or an
+    iterable of chunks; a name cut by the end of a chunk goes with the next."""
+    rest = ""
+    for chunk in _chunks(source):
+        text = rest + chunk
+        found = _TOKEN.findall(text)
+        rest = ""
+        if found and found[-1] not in _PUNCTUATION and text.endswith(found[-1]):
+            rest = found.pop()
+        yield text[:len(text) - len(rest)], found
+    if rest:
+        yield rest, [rest]
+
+def _offset(text: str, i: int) -> int:
+    # where the i-th token of a chunk starts, for error messages
+    for n, match in enumerate(_TOKEN.finditer(text)):
+        if n == i:
+            return match.start(1)
+    return len(text)
+
+# kinds of the frames of the parser stack
+_GROUP, _BODY, _LAM = range(3)
+
+def iter_parse(source: str | IO[str] | Iterable[str], syntax: str = "lc") -> Iterator[Term]:
+    """Parse terms, one per line, as they come.
+
+    syntax="lc" reads what `unparse` prints: `λx0.(x0(x1))`, a binder's
+    body being the parenthesized group after the dot. syntax="light" also
+    takes `\\x y. x y`: application by juxtaposition, parentheses only to
+    group, and a body that extends as far right as it can. In both,
+    binders get fresh variables numbered in binder order, as `lc` does,
+    and unbound names become `ast.Name`s. The parser keeps its own stack,
+    so nesting depth is not limited."""
+    if syntax not in SYNTAXES:
+        raise ValueError(f"Unknown syntax {syntax!r}, expected one of {SYNTAXES}")
+    light = syntax == "light"
+    scope: dict[str, list[Var]] = {}
+    count = 0
+    # the frame being read: a group, the body of a binder, or in light
+    # syntax a binder whose body runs to the end of its group; `term` is
+    # what it has read so far, the frames around it are on `stack`
+    kind, name, var, term = _GROUP, "", None, None
+    stack: list[tuple] = []
+    binders: list[str] = []  # names of a \\x y. being read
+    state = 0  # 0: term, 1: after λ, 2: after the dot in lc syntax
+    groups = 0  # open parentheses
+    base = 0  # offset of the chunk
+    text = ""
+    i = 0
+
+    def error(message: str):
+        return ValueError(f"{message} at {base + _offset(text, i)}")
+
+    # a newline at the end closes the last term like any other
+    for text, found in chain(tokens(source), [("", ["\n"])]):
+        for i, token in enumerate(found):
+            if state == 0:
+                if token not in _PUNCTUATION:
+                    bound = scope.get(token)
+                    arg = bound[-1] if bound else ast.Name(id=token, ctx=_LOAD)
+                    if term is None:
+                        term = arg
+                    elif light:
+                        term = App(term, arg)
+                    else:
+                        raise error(f"Unexpected name {token!r} after a term")
+                    continue
+                if token == "(":
+                    if not light and term is None:
+                        raise error("Unexpected '('")
+                    groups += 1
+                    stack.append((kind, name, var, term))
+                    kind, name, var, term = _GROUP, "", None, None
+                    continue
+                if token == "λ" or token == "\\":
+                    if not light and term is not None:
+                        raise error("Unexpected λ after a term")
+                    state = 1
+                    continue
+                if token == "." or token == "\n" and groups:
+                    if token == ".":
+                        raise error("Unexpected '.'")
+                    continue
+                while kind == _LAM:
+                    # light syntax: a body ends with the group around it
+                    if term is None:
+                        raise error(f"Empty body for λ{name}")
+                    scope[name].pop()
+                    arg = Lam(var, term)  # type: ignore
+                    kind, name, var, term = stack.pop()
+                    term = arg if term is None else App(term, arg)
+                if token == "\n":
+                    if term is not None:
+                        yield Term(body=term)
+                        term = None
+                        count = 0
+                    continue
+                # token == ")"
+                if not groups:
+                    raise error("Unexpected ')'")
+                if term is None:
+                    raise error("Empty parentheses")
+                groups -= 1
+                arg = term
+                kind, name, var, term = stack.pop()
+                if kind == _BODY:
+                    # the group was the body of λ in lc syntax
+                    scope[name].pop()
+                    arg = Lam(var, arg)  # type: ignore
+                    kind, name, var, term = stack.pop()
+                term = arg if term is None else App(term, arg)
+            elif state == 1:
+                if token == ".":
+                    if not binders:
+                        raise error("Expected a name after λ")
+                    for binder in binders:
+                        stack.append((kind, name, var, term))
+                        kind, name, var, term = _LAM if light else _BODY, binder, Var(count), None
+                        count += 1
+                        scope.setdefault(name, []).append(var)  # type: ignore
+                    binders.clear()
+                    state = 0 if light else 2
+                elif token in _PUNCTUATION:
+                    if token != "\n":
+                        raise error(f"Expected a name or '.' after λ, got {token!r}")
+                elif not light and binders:
+                    raise error(f"Expected '.' after λ{binders[0]}, got {token!r}")
+                else:
+                    binders.append(token)
+            elif token == "(":
+                state = 0
+                groups += 1
+                stack.append((kind, name, var, term))
+                kind, name, var, term = _GROUP, "", None, None
+            elif token != "\n":
+                raise error(f"Expected '(' after the dot of λ{name}, got {token!r}")
+        base += len(text)
+    if state:
+        raise ValueError("Unexpected end of input after λ")
+    if stack:
+        raise ValueError("Unexpected end of input, missing ')'")
+
+def parse(source: str | IO[str] | Iterable[str], syntax: str = "lc") -> Term:
+    """Parse a single term, see `iter_parse`."""
+    terms = list(iter_parse(source, syntax))
+    if len(terms) != 1:
+        raise ValueError(f"Expected one term, got {len(terms)}")
+    return terms[0]
+
+if __name__ == "__main__":
+    import io
+    import time
+    from .lc import lc, unparse
+    from .debruijn import church, from_debruijn
+    TWO = lambda f: lambda x: f(f(x))
+    K_FREE = lambda x: lambda y: x(inc)
+    for f in (TWO, K_FREE):
+        assert unparse(parse(unparse(lc(f)))) == unparse(lc(f))
+    assert parse(unparse(lc(TWO))) == lc(TWO)
+    assert isinstance(parse("λx0.(x0(inc))").body.body.arg, ast.Name)  # type: ignore
+    # a λ applied: the body is the group after the dot
+    assert str(parse("λx0.(x0)(y)")) == "λx0.(x0)(y)"
+    assert isinstance(parse("λx0.(x0)(y)").body, App)
+    # binders are renumbered in binder order
+    assert str(parse("λx7.(λx3.(x7(x3)))")) == "λx0.(λx1.(x0(x1)))"
+    assert str(parse(r"\f x. f (f x)", "light")) == unparse(lc(TWO))
+    assert str(parse(r"(\x. x) y z", "light")) == "λx0.(x0)(y)(z)"
+    assert str(parse(r"\x. \y. y x", "light")) == "λx0.(λx1.(x1(x0)))"
+    # one term per line, from a file
+    stream = io.StringIO("λx0.(x0)\n\nλx0.(λx1.(x1))\n")
+    assert [str(t) for t in iter_parse(stream)] == ["λx0.(x0)", "λx0.(λx1.(x1))"]
+    for bad in ("λx0.x0", "λx0.(x0", "x0)", "()", "λ.(x)", "f g", r"\x.", "λx0 x1.(x0)"):
+        try:
+            parse(bad)
+        except ValueError as e:
+            print(f"{bad!r}: {e}")
+        else:
+            raise AssertionError(f"{bad!r} should not parse")
+    for bad in (r"\x.", r"(\x. x", r"\x. )"):
+        try:
+            parse(bad, "light")
+        except ValueError as e:
+            print(f"{bad!r}: {e}")
+        else:
+            raise AssertionError(f"{bad!r} should not parse")
+    # deep and big: a numeral, in small chunks
+    n = 200_000
+    text = unparse(from_debruijn(church(n)))
+    chunks = [text[i:i + 1000] for i in range(0, len(text), 1000)]
+    start = time.perf_counter()
+    term = parse(chunks)
+    seconds = time.perf_counter() - start
+    print(f"church({n}): {2 * n + 3} nodes in {seconds:.3f} s, {(2 * n + 3) / seconds / 1e6:.2f} M nodes/s")
+    assert unparse(term) == text
+    print("All tests passed.")
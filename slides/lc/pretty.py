@@ -1,8 +1,10 @@
-import sys
-from functools import wraps
 from pprint import PrettyPrinter
 
 def register_pretty(cls, pretty, convert=None):
+    """Register how `pprint` formats instances of `cls` that do not fit a line.
+
+    With `convert`, `pretty` is given convert(obj) in place of the instance.
+    Only the dispatch table of PrettyPrinter changes, `repr` stays as it is."""
     if isinstance(cls, type):
         __repr__ = cls.__repr__
     else:
@@ -11,16 +13,13 @@ def register_pretty(cls, pretty, convert=None):
     if isinstance(pretty, type):
         pretty = pretty.__pretty__
     assert callable(pretty)
-    PrettyPrinter._dispatch[__repr__] = pretty  # type: ignore
     if convert:
-        _repr = sys.modules['builtins'].repr
+        inner = pretty
 
-        @wraps(_repr)
-        def repr(obj):
-            if isinstance(obj, cls):
-                obj = convert(obj)
-            return _repr(obj)
-        setattr(sys.modules['builtins'], 'repr', repr)
+        def converted(printer, obj, stream, indent, allowance, context, level):
+            inner(printer, convert(obj), stream, indent, allowance, context, level)
+        pretty = converted
+    PrettyPrinter._dispatch[__repr__] = pretty  # type: ignore
 
 class Pretty(type):
     def __new__(cls, name, bases, scope, **kw):
@@ -35,3 +34,21 @@ class Pretty(type):
 
     def __repr__(cls):
         return cls.__name__
+
+if __name__ == "__main__":
+    from pprint import pformat
+
+    class Pair:
+        def __init__(self, *items):
+            self.items = items
+
+        def __repr__(self):
+            return f"Pair{self.items!r}"
+
+    def pretty(printer, obj, stream, indent, allowance, context, level):
+        stream.write(f"<{len(obj)} items>")
+    register_pretty(Pair, pretty, convert=lambda pair: list(pair.items))
+    long = Pair(*range(100))
+    assert pformat(long) == "<100 items>"
+    assert repr(long).startswith("Pair(0, 1")
+    print("All tests passed.")
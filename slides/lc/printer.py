@@ -0,0 +1,195 @@
+from __future__ import annotations
+import ast
+from typing import Iterator
+from .lc import Node as NamedNode, Term, iter_unparse, unparse
+from .debruijn import IDX, LAM, APP, FREE, Node
+from .hashcons import Shared, intern
+
+ELLIPSIS = "…"
+
+def _shared(term: ast.AST | NamedNode | Node | Shared) -> Shared:
+    if isinstance(term, Shared):
+        return term
+    if isinstance(term, Term):
+        return term.shared()
+    return intern(term)  # type: ignore
+
+def _unparsed(term: ast.AST | NamedNode) -> Iterator[str]:
+    if isinstance(term, (Term, NamedNode)):
+        return iter_unparse(term, chunk_size=256)
+    return iter((unparse(term),))
+
+def bindings(root: Shared, min_size: int = 4) -> list[Shared]:
+    """Closed subterms used more than once, dependencies first.
+
+    Only subterms of at least `min_size` nodes are worth a name."""
+    parents: dict[int, int] = {id(root): 0}
+    nodes: list[Shared] = [root]
+    todo = [root]
+    while todo:
+        node = todo.pop()
+        for child in (node.a, node.b) if node.tag == APP else (node.a,) if node.tag == LAM else ():
+            key = id(child)
+            if key in parents:
+                parents[key] += 1
+            else:
+                parents[key] = 1
+                nodes.append(child)  # type: ignore
+                todo.append(child)  # type: ignore
+    named = {id(n) for n in nodes
+             if n is not root and parents[id(n)] > 1 and n.free == 0 and n.tag != IDX and n.tag != FREE and n.size >= min_size}
+    # post-order over the named nodes, so a binding comes after the ones it uses
+    order: list[Shared] = []
+    done: set[int] = set()
+    stack: list[tuple[Shared, bool]] = [(root, False)]
+    while stack:
+        node, ready = stack.pop()
+        if ready:
+            if id(node) in named:
+                order.append(node)
+            continue
+        if id(node) in done:
+            continue
+        done.add(id(node))
+        stack.append((node, True))
+        if node.tag == APP:
+            stack.append((node.b, False))  # type: ignore
+            stack.append((node.a, False))  # type: ignore
+        elif node.tag == LAM:
+            stack.append((node.a, False))  # type: ignore
+    return order
+
+def iter_pieces(root: Shared, names: dict[int, str], max_depth: int | None = None) -> Iterator[str]:
+    """The text of one term, piece by piece, in the notation of `unparse`.
+
+    Subterms in `names` print as their name; past `max_depth` nested
+    abstractions and applications a subterm prints as an ellipsis."""
+    counter = 0
+    binders: list[str] = []
+    # items: a node and its depth, a string, or None to close a binder
+    todo: list = [(root, 0)]
+    while todo:
+        item = todo.pop()
+        if item is None:
+            binders.pop()
+            yield ")"
+            continue
+        if type(item) is str:
+            yield item
+            continue
+        node, depth = item
+        name = names.get(id(node))
+        if name is not None and depth > 0:
+            yield name
+        elif node.tag == IDX:
+            yield binders[-1 - node.a]  # type: ignore
+        elif node.tag == FREE:
+            yield node.a  # type: ignore
+        elif max_depth is not None and depth >= max_depth:
+            yield ELLIPSIS
+        elif node.tag == LAM:
+            var = f"x{counter}"
+            counter += 1
+            binders.append(var)
+            todo.append(None)
+            todo.append((node.a, depth + 1))
+            yield f"λ{var}.("
+        else:
+            todo.append(")")
+            todo.append((node.b, depth + 1))
+            todo.append("(")
+            todo.append((node.a, depth + 1))
+
+def _line(pieces: Iterator[str], max_width: int | None) -> str:
+    if max_width is None:
+        return "".join(pieces)
+    out: list[str] = []
+    size = 0
+    for piece in pieces:
+        size += len(piece)
+        if size > max_width:
+            out.append(piece[:max(0, len(piece) - (size - max_width) - 1)])
+            out.append(ELLIPSIS)
+            break
+        out.append(piece)
+    return "".join(out)
+
+def format_lines(term: ast.AST | NamedNode | Node | Shared, max_depth: int | None = None,
+                 max_width: int | None = None, max_lines: int | None = None,
+                 share: bool = True, min_size: int = 4) -> list[str]:
+    """Lines of `format_term`."""
+    try:
+        root = _shared(term)
+    except TypeError:
+        # host expressions, like x + 1, have no shared node: print the
+        # term as `unparse` does, without bindings or depth limit
+        return [_line(_unparsed(term), max_width)]
+    lets = bindings(root, min_size) if share else []
+    names = {id(node): f"t{i}" for i, node in enumerate(lets)}
+    skipped = 0
+    if max_lines is not None and len(lets) >= max_lines:
+        # keep the bindings closest to the body
+        skipped = len(lets) - max(max_lines - 2, 0)
+        lets = lets[skipped:]
+    lines = [f"… {skipped} more bindings"] if skipped else []
+    for node in lets:
+        name = names[id(node)]
+        prefix = f"let {name} = "
+        width = None if max_width is None else max(max_width - len(prefix) - 3, 1)
+        lines.append(prefix + _line(iter_pieces(node, names, max_depth), width) + " in")
+    lines.append(_line(iter_pieces(root, names, max_depth), max_width))
+    return lines
+
+def format_term(term: ast.AST | NamedNode | Node | Shared, max_depth: int | None = None,
+                max_width: int | None = None, max_lines: int | None = None,
+                share: bool = True, min_size: int = 4) -> str:
+    """Print a term with its shared closed subterms as `let` bindings.
+
+    A DAG prints in the size of the DAG, not of the tree it unfolds to.
+    Lines are cut at `max_width` characters, subterms deeper than
+    `max_depth` print as an ellipsis, and past `max_lines` only the last
+    bindings are kept. All of it is iterative."""
+    return "\n".join(format_lines(term, max_depth, max_width, max_lines, share, min_size))
+
+if __name__ == "__main__":
+    import io
+    import time
+    from pprint import pp, pformat
+    from .lc import lc, unparse
+    from .debruijn import church, from_debruijn
+    TWO = lambda f: lambda x: f(f(x))
+    assert format_term(lc(TWO)) == unparse(lc(TWO))
+    # K is used twice: λf.f K K
+    k = (LAM, (LAM, (IDX, 1)))
+    kk = (LAM, (APP, (APP, (IDX, 0), k), k))
+    print(format_term(kk, min_size=1))
+    assert format_term(kk, min_size=1) == "let t0 = λx0.(λx1.(x0)) in\nλx0.(x0(t0)(t0))"
+    assert format_term(kk) == "λx0.(x0(λx1.(λx2.(x1)))(λx3.(λx4.(x3))))"
+    assert format_term(church(3), max_depth=4) == "λx0.(λx1.(x0(x0(…))))"
+    assert format_term(church(100), max_width=20) == "λx0.(λx1.(x0(x0(x0(…"
+    # a tree of 2^40 leaves as a DAG of 41 nodes
+    node: Node = (LAM, (IDX, 0))
+    for _ in range(40):
+        node = (APP, (APP, (FREE, "pair"), node), node)
+    start = time.perf_counter()
+    text = format_term(node, min_size=1, max_lines=10)
+    print(text)
+    assert time.perf_counter() - start < 1 and len(text.splitlines()) == 10
+    # pprint: terms print in λ notation, big ones are cut short
+    stream = io.StringIO()
+    pp(lc(TWO), stream=stream)
+    assert stream.getvalue() == f"Term({unparse(lc(TWO))})\n"
+    big = from_debruijn(church(100_000))
+    big.shared()  # computed once per term, then cached
+    start = time.perf_counter()
+    text = pformat(big, width=40)
+    print(text[:200])
+    assert time.perf_counter() - start < 1 and len(text.splitlines()) == 1 and text.endswith(f"{ELLIPSIS})")
+    # host expressions print as they are, without sharing
+    APPLY_ONE = lambda f: lambda x: f(x)(1)
+    assert format_term(lc(APPLY_ONE)) == unparse(lc(APPLY_ONE)) == "λx0.(λx1.(x0(x1)(1)))"
+    assert format_term(lc(APPLY_ONE), max_width=8) == "λx0.(λx…"
+    stream = io.StringIO()
+    pp(lc(APPLY_ONE), stream=stream)
+    assert stream.getvalue() == f"Term({unparse(lc(APPLY_ONE))})\n"
+    print("All tests passed.")
@@ -0,0 +1,200 @@
+from __future__ import annotations
+import ast
+from .lc import Term
+from .debruijn import IDX, LAM, APP, Node, to_debruijn, from_debruijn, instantiate
+from .stats import Stats
+from .limits import LimitExceeded
+
+STRATEGIES = ("normal", "applicative", "head")
+
+_EVAL, _LAM, _SPINE, _APPLY = range(4)
+
+def rebuild(head: Node, args: list[Node]) -> Node:
+    for arg in args:
+        head = (APP, head, arg)
+    return head
+
+def drain(partial: Node, todo: list, out: list[Node]) -> Node:
+    """Finish the stacks of a stopped reduction without reducing: the term so far."""
+    out.append(partial)
+    while todo:
+        op, x = todo.pop()
+        if op == _EVAL:
+            out.append(x)
+        elif op == _LAM:
+            out.append((LAM, out.pop()))
+        elif op == _SPINE:
+            start = len(out) - x
+            args = out[start:]
+            del out[start:]
+            out.append(rebuild(out.pop(), args))
+        else:
+            arg = out.pop()
+            func = out.pop()
+            out.append((APP, func, arg))
+    return out[0]
+
+class Reducer:
+    """Reduce de Bruijn terms without recursion, counting beta steps.
+
+    - normal: leftmost-outermost, finds the normal form whenever one exists
+    - applicative: leftmost-innermost, arguments are normalized before the call
+    - head: only head redexes, arguments are left as they are
+
+    With `stats`, every step is also recorded there. When a hook of
+    `stats` stops the reduction with LimitExceeded, the exception gets the
+    term as reduced so far; a RecursionError becomes LimitExceeded too.
+    """
+    strategy: str
+    steps: int
+    stats: Stats | None
+    def __init__(self, strategy: str = "normal", stats: Stats | None = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.strategy = strategy
+        self.steps = 0
+        self.stats = stats
+
+    def beta(self, body: Node, arg: Node) -> Node:
+        self.steps += 1
+        result = instantiate(body, arg)
+        if self.stats is not None:
+            self.stats.beta(body, arg, result)
+        return result
+
+    def whnf(self, node: Node) -> tuple[Node, list[Node]]:
+        """Reduce to weak head normal form, returning the head and its arguments."""
+        args = []
+        try:
+            while True:
+                tag = node[0]
+                if tag == APP:
+                    args.append(node[2])
+                    node = node[1]
+                elif tag == LAM and args:
+                    node = self.beta(node[1], args[-1])
+                    args.pop()
+                else:
+                    break
+        except LimitExceeded as e:
+            e.partial = rebuild(node, args[::-1])
+            raise
+        args.reverse()
+        return node, args
+
+    def run(self, node: Node) -> Node:
+        try:
+            if self.strategy == "applicative":
+                return self.applicative(node)
+            return self.normal(node, self.strategy == "head")
+        except RecursionError:
+            raise LimitExceeded("recursion", self.stats) from None
+
+    def normal(self, node: Node, head_only: bool = False) -> Node:
+        out: list[Node] = []
+        todo: list[tuple[int, object]] = [(_EVAL, node)]
+        stats = self.stats
+        try:
+            while todo:
+                if stats is not None:
+                    stats.depth(len(todo) + len(out))
+                op, x = todo.pop()
+                if op == _EVAL:
+                    head, args = self.whnf(x)  # type: ignore
+                    if head[0] == LAM:
+                        todo.append((_LAM, None))
+                        todo.append((_EVAL, head[1]))
+                    elif head_only:
+                        out.append(rebuild(head, args))
+                    else:
+                        out.append(head)
+                        todo.append((_SPINE, len(args)))
+                        for arg in reversed(args):
+                            todo.append((_EVAL, arg))
+                elif op == _LAM:
+                    out.append((LAM, out.pop()))
+                else:
+                    start = len(out) - x  # type: ignore
+                    args = out[start:]
+                    del out[start:]
+                    out.append(rebuild(out.pop(), args))
+        except LimitExceeded as e:
+            e.partial = drain(e.partial if e.partial is not None else x, todo, out)  # type: ignore
+            raise
+        return out[0]
+
+    def applicative(self, node: Node) -> Node:
+        out: list[Node] = []
+        todo: list[tuple[int, Node | None]] = [(_EVAL, node)]
+        stats = self.stats
+        pending = None
+        try:
+            while todo:
+                if stats is not None:
+                    stats.depth(len(todo) + len(out))
+                op, x = todo.pop()
+                if op == _EVAL:
+                    tag = x[0]  # type: ignore
+                    if tag == LAM:
+                        todo.append((_LAM, None))
+                        todo.append((_EVAL, x[1]))  # type: ignore
+                    elif tag == APP:
+                        todo.append((_APPLY, None))
+                        todo.append((_EVAL, x[2]))  # type: ignore
+                        todo.append((_EVAL, x[1]))  # type: ignore
+                    else:
+                        out.append(x)  # type: ignore
+                elif op == _LAM:
+                    out.append((LAM, out.pop()))
+                else:
+                    arg = out.pop()
+                    func = out.pop()
+                    if func[0] == LAM:
+                        pending = (APP, func, arg)
+                        todo.append((_EVAL, self.beta(func[1], arg)))
+                    else:
+                        out.append((APP, func, arg))
+        except LimitExceeded as e:
+            e.partial = drain(pending, todo, out)  # type: ignore
+            raise
+        return out[0]
+
+def normalize(term: ast.AST, strategy: str = "normal", stats: Stats | None = None) -> Term:
+    """Reduce a lambda calculus term with the given strategy."""
+    return from_debruijn(Reducer(strategy, stats).run(to_debruijn(term)))
+
+if __name__ == "__main__":
+    from .lc import lc
+    from .debruijn import church
+    ADD = lambda: (lambda a, b: lambda f: lambda x: a(f)(b(f)(x)))(
+        lambda f: lambda x: f(f(x)),
+        lambda f: lambda x: f(f(f(x))),
+    )
+    for strategy in STRATEGIES:
+        term = normalize(lc(ADD), strategy)
+        print(f"{strategy}: {term}")
+    assert to_debruijn(normalize(lc(ADD))) == church(5)
+    assert to_debruijn(normalize(lc(ADD), "applicative")) == church(5)
+    # head reduction stops at λf.λx.f(...) and leaves the argument alone
+    head = to_debruijn(normalize(lc(ADD), "head"))
+    assert head[1][1][1] == (IDX, 1) and head != church(5)
+    # the argument of K diverges, only normal order gets past it
+    K_OMEGA = lambda: (lambda x: lambda y: x)(lambda z: z)((lambda w: w(w))(lambda w: w(w)))
+    assert str(normalize(lc(K_OMEGA))) == "λx0.(x0)"
+    FACT = lambda: (lambda Y, IS_ZERO, ONE, MUL, PRED: Y(lambda f: lambda n: IS_ZERO(n)(ONE)(MUL(n)(f(PRED(n))))))(
+        lambda f: (lambda x: f(x(x)))(lambda x: f(x(x))),
+        lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )(lambda f: lambda x: f(f(f(x))))
+    reducer = Reducer()
+    node = reducer.run(to_debruijn(lc(FACT)))
+    print(f"FACT(THREE) = {from_debruijn(node)} in {reducer.steps} steps")
+    assert node == church(6)
+    stats = Stats()
+    assert to_debruijn(normalize(lc(FACT), stats=stats)) == church(6)
+    print(stats)
+    assert stats.betas == reducer.steps and stats.substitutions > stats.betas // 2
+    assert stats.allocations > 0 and stats.peak_size > 0 and stats.max_depth > 0
+    print("All tests passed.")
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from collections.abc import Iterator, Mapping
 type Env[K, V] = dict[K, V]
 
 def repr_env(env: Env) -> str:
@@ -86,8 +87,102 @@ class Scope[K, V]:
         # print(f"{self}[{key}] = {value}")
         self.scope.env[key] = value
 
-if __name__ == "__main__":
-    s = Scope[str, int]()
+_MISSING = object()
+
+class FrameEnv[K, V](Mapping[K, V]):
+    """The bindings of the innermost frame of a FlatScope, those made
+    since the last `enter`. Writes go through the undo log."""
+    owner: FlatScope[K, V]
+    def __init__(self, owner: FlatScope[K, V]):
+        self.owner = owner
+
+    def bound(self) -> dict[K, None]:
+        owner = self.owner
+        if not owner.marks:
+            return dict.fromkeys(owner.env)
+        return dict.fromkeys(key for key, _ in owner.undo[owner.marks[-1]:])
+
+    def __getitem__(self, key: K) -> V:
+        if key not in self.bound():
+            raise KeyError(key)
+        return self.owner.env[key]
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.bound())
+
+    def __len__(self) -> int:
+        return len(self.bound())
+
+    def __setitem__(self, key: K, value: V):
+        self.owner[key] = value
+
+class FlatFrame[K, V]:
+    """What `Scope.scope` is for a Scope: `env` is the innermost frame."""
+    env: FrameEnv[K, V]
+    def __init__(self, owner: FlatScope[K, V]):
+        self.env = FrameEnv(owner)
+
+    def __repr__(self):
+        return f"FlatFrame({repr_env(dict(self.env))})"
+
+class FlatScope[K, V]:
+    """A `Scope` kept in one dict, with an undo log to restore on `exit`.
+
+    Lookups do not depend on the nesting depth. `__setitem__` logs the
+    value it shadows, `exit` puts back everything logged since `enter`."""
+    env: Env[K, V]
+    undo: list[tuple[K, object]]
+    marks: list[int]
+    def __init__(self):
+        self.env = {}
+        self.undo = []
+        self.marks = []
+
+    def __repr__(self):
+        return f"FlatScope(depth={len(self.marks)}, {repr_env(self.env)})"
+
+    @property
+    def scope(self) -> FlatFrame[K, V]:
+        """The innermost frame, as in `Scope`."""
+        return FlatFrame(self)
+
+    def enter(self):
+        self.marks.append(len(self.undo))
+
+    def exit(self):
+        if not self.marks:
+            raise RuntimeError("Cannot exit from root scope")
+        mark = self.marks.pop()
+        env = self.env
+        undo = self.undo
+        while len(undo) > mark:
+            key, old = undo.pop()
+            if old is _MISSING:
+                del env[key]
+            else:
+                env[key] = old  # type: ignore
+
+    def to_dict(self) -> Env[K, V]:
+        return dict(self.env)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.env
+
+    def __getitem__(self, key: K) -> V:
+        try:
+            return self.env[key]
+        except KeyError:
+            raise KeyError(f"Key not found: {key}") from None
+
+    def __setitem__(self, key: K, value: V):
+        old = self.env.get(key, _MISSING)
+        if old is value:
+            return
+        if self.marks:
+            self.undo.append((key, old))
+        self.env[key] = value
+
+def check_frames(s: Scope[str, int] | FlatScope[str, int]):
     print(s.to_dict())  # {}
     s.enter()
     d = s.to_dict()  # {}
@@ -105,6 +200,7 @@ if __name__ == "__main__":
     d = s.to_dict()  # {'x': 1, 'y': 2}
     print(d)
     assert d == {"x": 1, "y": 2}
+    assert dict(s.scope.env) == {"y": 2} and "x" not in s.scope.env
     s.exit()
     d = s.to_dict()  # {'x': 1}
     print(d)
@@ -122,4 +218,31 @@ if __name__ == "__main__":
     d = s.to_dict()  # {}
     print(d)
     assert d == {}
+    assert dict(s.scope.env) == {}
+
+if __name__ == "__main__":
+    # FlatScope reads and writes its innermost frame like a Scope
+    for s in (Scope[str, int](), FlatScope[str, int]()):
+        check_frames(s)
+    for scope in (Scope[str, int](), FlatScope[str, int]()):
+        scope["g"] = 0
+        scope.enter()
+        scope["x"] = 1
+        scope.enter()
+        scope["x"] = 2
+        scope["x"] = 3
+        scope["y"] = 4
+        print(scope)
+        assert scope["x"] == 3 and "y" in scope
+        assert scope.to_dict() == {"g": 0, "x": 3, "y": 4}
+        scope.exit()
+        assert scope["x"] == 1 and "y" not in scope
+        scope.exit()
+        assert scope.to_dict() == {"g": 0}
+        try:
+            scope.exit()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected a RuntimeError")
     print("All tests passed.")
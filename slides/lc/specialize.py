@@ -0,0 +1,133 @@
+from __future__ import annotations
+import ast
+from collections import OrderedDict
+from types import FunctionType
+from typing import Callable
+from .lc import Term
+from .debruijn import APP, Node, to_debruijn
+from .hashcons import Shared, intern
+from .limits import METHODS, LimitExceeded, normalize
+
+# (application, method, fuel, max_nodes) -> residual term, most recent last
+_residuals: OrderedDict[tuple, Term] = OrderedDict()
+CACHE_SIZE = 1024
+
+def as_node(value) -> Node:
+    """The de Bruijn form of a term, or of a Python function.
+
+    A function is linked from its source when it can be, see lc.link,
+    which keeps recursion as a fixed point; otherwise, like a compiled
+    term, it is read back from its behavior, see lc.nbe."""
+    if isinstance(value, tuple):
+        return value
+    if isinstance(value, Shared):
+        return value.debruijn()
+    if isinstance(value, ast.AST):
+        return to_debruijn(value)
+    if callable(value):
+        if isinstance(value, FunctionType):
+            from .link import Linker
+            node = Linker().node(value)
+            if node is not None:
+                return to_debruijn(node)
+        from .nbe import reify
+        try:
+            return reify(value)
+        except RecursionError:
+            raise ValueError(f"Cannot read back {value!r}, it does not normalize") from None
+    raise TypeError(f"Not a lambda term: {value!r}")
+
+def residual(term, *static_args, method: str = "normal", fuel: int | None = 10_000,
+             timeout: float | None = None, max_nodes: int | None = 100_000) -> Term:
+    """`term` applied to `static_args`, with the work that only depends on
+    them done.
+
+    The application is normalized within the limits, see
+    limits.normalize; when they are exceeded, as for a recursive
+    function whose unfolding does not stop without its dynamic
+    arguments, the safe passes of lc.optimize run instead. Results are
+    cached by the structure of the application, so alpha-equivalent
+    calls share one, except when a timeout stopped them."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    node = as_node(term)
+    for arg in static_args:
+        node = (APP, node, as_node(arg))
+    key = (intern(node), method, fuel, max_nodes)
+    result = _residuals.get(key)
+    if result is not None:
+        _residuals.move_to_end(key)
+        return result
+    try:
+        result = normalize(node, method, fuel, timeout, max_nodes)
+    except LimitExceeded as e:
+        from .optimize import optimize
+        result = optimize(node)
+        if e.limit == "deadline":
+            return result
+    _residuals[key] = result
+    if len(_residuals) > CACHE_SIZE:
+        _residuals.popitem(last=False)
+    return result
+
+def specialize(term, *static_args, env: dict | None = None, backend: str = "ast",
+               method: str = "normal", fuel: int | None = 10_000, timeout: float | None = None,
+               max_nodes: int | None = 100_000) -> Callable:
+    """Apply `term` to its first arguments ahead of time: the compiled
+    `residual`, a Python function that takes the remaining arguments.
+
+    `term` and `static_args` can be Terms, de Bruijn nodes or Python
+    functions. `env` and `backend` are as in Term.eval."""
+    term = residual(term, *static_args, method=method, fuel=fuel, timeout=timeout, max_nodes=max_nodes)
+    return term.eval(env=env, backend=backend)
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from .lc import lc, unparse
+    from .debruijn import church, from_debruijn
+    THREE = lambda f: lambda x: f(f(f(x)))
+    ADD = lambda a: lambda b: lambda f: lambda x: a(f)(b(f)(x))
+    add3 = residual(ADD, THREE)
+    print(f"ADD(THREE) = {add3}")
+    assert unparse(add3) == "λx0.(λx1.(λx2.(x1(x1(x1(x0(x1)(x2)))))))"
+    assert residual(lc(ADD), church(3)) is add3
+    inc = lambda n: n + 1
+    assert specialize(ADD, THREE)(THREE)(inc)(0) == 6
+    # a compiled term reads back
+    two = from_debruijn(church(2)).eval()
+    assert specialize(ADD, two, THREE)(inc)(0) == 5
+    # recursion does not unfold without its argument: the optimized term comes back
+    TRUE = lambda a: lambda b: a
+    FALSE = lambda a: lambda b: b
+    ONE = lambda f: lambda x: f(x)
+    IS_ZERO = lambda n: n(lambda x: FALSE)(TRUE)
+    MUL = lambda a: lambda b: lambda f: b(a(f))
+    PRED = lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u)
+    Z = lambda f: (lambda x: f(lambda v: x(x)(v)))(lambda x: f(lambda v: x(x)(v)))
+    FACT = Z(lambda f: lambda n: IS_ZERO(n)(lambda _: ONE)(lambda _: MUL(n)(f(PRED(n))))(lambda i: i))
+    fact = specialize(FACT, fuel=2_000)
+    assert fact(THREE)(inc)(0) == 6
+    # MUL(SIX) specialized once, then called many times
+    SIX = lambda f: lambda x: f(f(f(f(f(f(x))))))
+    mul6 = specialize(MUL, SIX)
+    generic = lc(MUL).eval()
+    count = 0
+    def profile(frame, event, arg):
+        global count
+        count += event == "call"
+    calls = []
+    for use in (lambda: generic(SIX)(THREE), lambda: mul6(THREE)):
+        count = 0
+        sys.setprofile(profile)
+        value = use()(inc)(0)
+        sys.setprofile(None)
+        calls.append(count)
+        assert value == 18
+    print(f"MUL(SIX)(THREE): {calls[0]} calls, specialized {calls[1]}")
+    assert calls[1] < calls[0]
+    start = time.perf_counter()
+    for _ in range(1000):
+        specialize(MUL, SIX)
+    print(f"specialize, cached: {(time.perf_counter() - start) * 1e3:.1f} µs per call")
+    print("All tests passed.")
@@ -0,0 +1,138 @@
+from __future__ import annotations
+import json
+from typing import Callable
+from .debruijn import IDX, LAM, APP, Node
+
+type Hook = Callable[[str, "Stats"], None]
+
+class Stats:
+    """What an evaluation did, step by step.
+
+    Evaluators take `stats=None` and only touch it when one is given, so
+    an evaluation without one pays a single `is None` test per step.
+    - betas: beta reductions
+    - deltas: native operations (see arith)
+    - interactions: active pairs rewritten (see inet)
+    - substitutions: variable occurrences replaced by an argument
+    - allocations: term nodes, agents or closures created
+    - peak_size: largest term a step produced, or most live agents
+    - max_depth: deepest the evaluator's own stack went
+    Hooks are called as hook(kind, stats) after every step, kind being
+    "beta", "delta", "interaction" or "readback"."""
+    __slots__ = ("betas", "deltas", "interactions", "substitutions", "allocations",
+                 "peak_size", "max_depth", "hooks")
+    betas: int
+    deltas: int
+    interactions: int
+    substitutions: int
+    allocations: int
+    peak_size: int
+    max_depth: int
+    hooks: list[Hook]
+    def __init__(self, *hooks: Hook):
+        self.betas = 0
+        self.deltas = 0
+        self.interactions = 0
+        self.substitutions = 0
+        self.allocations = 0
+        self.peak_size = 0
+        self.max_depth = 0
+        self.hooks = list(hooks)
+
+    def __repr__(self):
+        return "Stats(" + ", ".join(f"{k}={v}" for k, v in self.to_dict().items()) + ")"
+
+    def on_step(self, hook: Hook) -> Hook:
+        """Register a hook; usable as a decorator."""
+        self.hooks.append(hook)
+        return hook
+
+    def step(self, kind: str):
+        for hook in self.hooks:
+            hook(kind, self)
+
+    def size(self, size: int):
+        if size > self.peak_size:
+            self.peak_size = size
+
+    def depth(self, depth: int):
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def beta(self, body: Node, arg: Node, result: Node):
+        """Account for result = body[0 := arg]."""
+        self.betas += 1
+        self.substitutions += occurrences(body)
+        old = nodes(body)
+        old.update(nodes(arg))
+        new = nodes(result)
+        self.allocations += len(new.keys() - old.keys())
+        self.size(len(new))
+        self.step("beta")
+
+    def to_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__ if name != "hooks"}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+def counting(stats: Stats) -> Callable[[Callable], Callable]:
+    """The wrapper compiled code puts around its lambdas to count them."""
+    def counted(f: Callable) -> Callable:
+        stats.allocations += 1
+        def apply(*args):
+            stats.betas += 1
+            stats.step("beta")
+            return f(*args)
+        return apply
+    return counted
+
+def nodes(node: Node) -> dict[int, Node]:
+    """The distinct tuples of a term, by id; len() is its size as a DAG."""
+    seen: dict[int, Node] = {}
+    todo = [node]
+    while todo:
+        n = todo.pop()
+        if id(n) in seen:
+            continue
+        seen[id(n)] = n
+        if n[0] == LAM:
+            todo.append(n[1])
+        elif n[0] == APP:
+            todo.append(n[1])
+            todo.append(n[2])
+    return seen
+
+def occurrences(body: Node) -> int:
+    """How many times the body of an abstraction uses its variable."""
+    count = 0
+    todo = [(body, 0)]
+    while todo:
+        n, depth = todo.pop()
+        tag = n[0]
+        if tag == IDX:
+            count += n[1] == depth
+        elif tag == LAM:
+            todo.append((n[1], depth + 1))
+        elif tag == APP:
+            todo.append((n[1], depth))
+            todo.append((n[2], depth))
+    return count
+
+if __name__ == "__main__":
+    from .debruijn import instantiate
+    stats = Stats()
+    kinds = []
+    stats.on_step(lambda kind, stats: kinds.append(kind))
+    # (λx.x x)(λy.y): two uses of x
+    body = (APP, (IDX, 0), (IDX, 0))
+    arg = (LAM, (IDX, 0))
+    stats.beta(body, arg, instantiate(body, arg))
+    print(stats)
+    assert stats.substitutions == 2 and stats.allocations == 1 and kinds == ["beta"]
+    x = (IDX, 0)
+    assert len(nodes((APP, x, x))) == 2 and len(nodes(body)) == 3
+    assert json.loads(stats.to_json())["betas"] == 1
+    double = counting(stats)(lambda n: 2 * n)
+    assert double(double(1)) == 4 and stats.betas == 3 and stats.allocations == 2
+    print("All tests passed.")
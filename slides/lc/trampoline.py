@@ -0,0 +1,193 @@
+from __future__ import annotations
+import ast
+import copy
+from types import CodeType
+from .lc import Node, Var, Lam, App, Term, _name, _call, _compile, _LOCATION
+
+# Compiled code returns bounces instead of calling: (k, value) passes a
+# value to a continuation, (code, x, k) enters a lambda. `run` is the only
+# loop that calls them, so the Python stack stays flat however deep the
+# evaluation goes.
+
+class Done:
+    """The end of a run, returned by the last continuation."""
+    __slots__ = ("value",)
+    value: object
+    def __init__(self, value):
+        self.value = value
+
+class CpsLam:
+    """A compiled lambda: `code(x, k)` returns a bounce.
+
+    Host code calls it like any function, which runs it to the end."""
+    __slots__ = ("code",)
+    def __init__(self, code):
+        self.code = code
+
+    def __repr__(self):
+        return f"CpsLam({self.code!r})"
+
+    def __call__(self, x):
+        return run((self.code, x, Done))
+
+def run(bounce):
+    while type(bounce) is tuple:
+        if len(bounce) == 2:
+            bounce = bounce[0](bounce[1])
+        else:
+            bounce = bounce[0](bounce[1], bounce[2])
+    return bounce.value  # type: ignore
+
+def apply(f, x, k):
+    if type(f) is CpsLam:
+        return (f.code, x, k)
+    # a host function, called directly
+    return (k, f(x))
+
+RUNTIME = {
+    "__cpslam__": CpsLam,
+    "__apply__": apply,
+    "__run__": run,
+    "__halt__": Done,
+}
+
+_CPS, _VALUE, _THEN, _APPLY, _RETURN, _LAM = range(6)
+
+def _params(*names: str) -> ast.arguments:
+    return ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg(arg=name, **_LOCATION) for name in names],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+
+def _is_value(node) -> bool:
+    return not isinstance(node, (App, ast.Call))
+
+def cps_to_ast(term: ast.AST | Node, counted: bool = False) -> ast.Expression:
+    """Lower a term to continuation-passing Python run by a trampoline.
+
+    `λx.M` becomes `__cpslam__(lambda x, k: <M passing its value to k>)`
+    and an application evaluates the function, then the argument, then
+    returns a bounce to `__apply__`. The expression needs the names of
+    RUNTIME in its globals. Python code embedded in the term is left as
+    is and runs with direct calls. With `counted`, the code of every
+    lambda is wrapped as `__counted__(lambda x, k: ...)`, see
+    lc.stats.counting.
+
+    Continuations nest as deep as the chains of applications, so large
+    terms reach the nesting limit of Python's compiler sooner than with
+    `lc_to_ast`; only the evaluation is freed from the stack."""
+    if isinstance(term, Term):
+        term = term.body
+    fresh = 0
+    out: list[ast.expr] = []
+    # (op, node, continuation); `node` is a term, or the name of an
+    # intermediate value for the parts of an application already evaluated
+    todo: list[tuple[int, object, object]] = [(_CPS, term, _name("__halt__"))]
+    while todo:
+        op, n, k = todo.pop()
+        if op == _CPS:
+            if isinstance(n, App):
+                func, arg = n.func, n.arg
+            elif isinstance(n, tuple):
+                func, arg = n
+            else:
+                todo.append((_RETURN, None, k))
+                todo.append((_VALUE, n, None))
+                continue
+            if not _is_value(func):
+                todo.append((_THEN, func, f"__v{fresh}"))
+                todo.append((_CPS, (f"__v{fresh}", arg), k))
+                fresh += 1
+            elif not _is_value(arg):
+                todo.append((_THEN, arg, f"__v{fresh}"))
+                todo.append((_CPS, (func, f"__v{fresh}"), k))
+                fresh += 1
+            else:
+                todo.append((_APPLY, None, k))
+                todo.append((_VALUE, arg, None))
+                todo.append((_VALUE, func, None))
+        elif op == _VALUE:
+            if isinstance(n, str):
+                out.append(_name(n))
+            elif isinstance(n, Var):
+                out.append(_name(n.name))
+            elif isinstance(n, Lam):
+                todo.append((_LAM, n, f"__k{fresh}"))
+                todo.append((_CPS, n.body, _name(f"__k{fresh}")))
+                fresh += 1
+            elif isinstance(n, ast.Name):
+                out.append(_name(n.id))
+            elif isinstance(n, ast.expr):
+                out.append(ast.fix_missing_locations(copy.deepcopy(n)))
+            else:
+                raise TypeError(f"Cannot lower {n!r}")
+        elif op == _THEN:
+            # evaluate n, then go on with the code already lowered
+            rest = ast.Lambda(args=_params(k), body=out.pop(), **_LOCATION)  # type: ignore
+            todo.append((_CPS, n, rest))
+        elif op == _APPLY:
+            arg = out.pop()
+            func = out.pop()
+            out.append(ast.Call(func=_name("__apply__"), args=[func, arg, k], keywords=[], **_LOCATION))
+        elif op == _RETURN:
+            out.append(ast.Tuple(elts=[k, out.pop()], ctx=ast.Load(), **_LOCATION))
+        else:
+            code = ast.Lambda(args=_params(n.var.name, k), body=out.pop(), **_LOCATION)  # type: ignore
+            if counted:
+                code = _call(_name("__counted__"), code)
+            out.append(_call(_name("__cpslam__"), code))
+    return ast.Expression(body=_call(_name("__run__"), out[0]))
+
+def compile_cps(term: Term, filename: str = "<lc>", mode: str = "eval", *args,
+                counted: bool = False, **kwargs) -> CodeType:
+    return _compile(cps_to_ast(term, counted), filename, mode, *args, **kwargs)
+
+if __name__ == "__main__":
+    import sys
+    from .lc import lc, unparse
+    # the compiled code runs with the CpsLam of lc.trampoline, not of __main__
+    from .trampoline import CpsLam  # type: ignore
+    from .debruijn import APP, to_debruijn, from_debruijn, church
+    def inc(n):
+        return n + 1
+    K = lambda x: lambda y: x
+    print(unparse(cps_to_ast(lc(K))))
+    assert unparse(cps_to_ast(lc(K))) == \
+        "__run__((__halt__, __cpslam__(lambda x0, __k0: (__k0, __cpslam__(lambda x1, __k1: (__k1, x0))))))"
+    TWO = lambda f: lambda x: f(f(x))
+    assert lc(TWO).eval(inc, 0, backend="trampoline") == 2
+    # Z, with the branches delayed behind a dummy binder, as in benchmarks.suite
+    FACT = lambda: (lambda Z, IS_ZERO, ONE, MUL, PRED: Z(
+        lambda f: lambda n: IS_ZERO(n)(lambda _: ONE)(lambda _: MUL(n)(f(PRED(n))))(lambda i: i)
+    ))(
+        lambda f: (lambda x: f(lambda v: x(x)(v)))(lambda x: f(lambda v: x(x)(v))),
+        lambda n: n(lambda x: lambda a: lambda b: b)(lambda a: lambda b: a),
+        lambda f: lambda x: f(x),
+        lambda a: lambda b: lambda f: b(a(f)),
+        lambda n: lambda f: lambda x: n(lambda g: lambda h: h(g(f)))(lambda u: x)(lambda u: u),
+    )
+    fact = from_debruijn((APP, to_debruijn(lc(FACT)), church(5)))
+    assert fact.eval(inc, 0, backend="trampoline") == 120
+    # 2^10 successors built at run time, counted as 1024 nested calls of inc
+    COUNT = lambda: (lambda SUCC, ZERO, TWO, TEN: TEN(TWO)(SUCC)(ZERO))(
+        lambda n: lambda f: lambda x: f(n(f)(x)),
+        lambda f: lambda x: x,
+        lambda f: lambda x: f(f(x)),
+        lambda f: lambda x: f(f(f(f(f(f(f(f(f(f(x)))))))))),
+    )
+    try:
+        lc(COUNT).eval(inc, 0)
+    except RecursionError:
+        print("2^10 successors overflow with direct calls")
+    else:
+        raise AssertionError(f"expected a RecursionError at the recursion limit of {sys.getrecursionlimit()}")
+    print(f"{lc(COUNT).eval(inc, 0, backend='trampoline') = }")
+    assert lc(COUNT).eval(inc, 0, backend="trampoline") == 1024
+    # a lambda passed to the host is called like a function
+    double = lc(TWO).eval(backend="trampoline")
+    assert isinstance(double, CpsLam) and double(inc)(5) == 7
+    assert lc(TWO).eval(lambda n: n * 3, 1, backend="trampoline") == 9
+    print("All tests passed.")